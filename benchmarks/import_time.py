@@ -0,0 +1,86 @@
+"""Measure import time of lapspython and guard against regressions.
+
+Run from the repository root:
+
+    python -m benchmarks.import_time --max-seconds 1.0
+
+Each repetition imports the pipeline and loads a checkpoint in a fresh
+interpreter. The best time is reported together with the slowest modules
+of python -X importtime. The benchmark fails if the best time exceeds
+--max-seconds or if any module of HEAVY, e.g. torch, was imported.
+"""
+
+import argparse
+import json
+import subprocess  # noqa: S404
+import sys
+
+HEAVY = ('torch', 'nltk', 'scipy', 'dreamcoder.dreamcoder',
+         'dreamcoder.recognition')
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import lapspython.pipeline
+imported = time.perf_counter()
+from lapspython.utils import load_checkpoint
+load_checkpoint({checkpoint!r}, light=True)
+loaded = time.perf_counter()
+heavy = sorted(m for m in {heavy!r} if m in sys.modules)
+print(json.dumps([imported - start, loaded - imported, heavy]))
+"""
+
+
+def measure(checkpoint: str) -> tuple:
+    """Return import seconds, load seconds, heavy modules and slowest ones.
+
+    The slowest modules are (cumulative microseconds, name) pairs parsed
+    from the stderr of python -X importtime.
+    """
+    script = SCRIPT.format(checkpoint=checkpoint, heavy=HEAVY)
+    process = subprocess.run(  # noqa: S603
+        [sys.executable, '-X', 'importtime', '-c', script],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True
+    )
+    import_seconds, load_seconds, heavy = json.loads(process.stdout)
+    slowest = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        slowest.append((int(cumulative), name.strip()))
+    slowest.sort(reverse=True)
+    return import_seconds, load_seconds, heavy, slowest
+
+
+def main() -> None:
+    """Parse arguments, run repetitions and check thresholds."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--checkpoint', default='re2_test')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=0.0,
+                        help='Fail if the best import time is slower.')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Number of slowest modules to print.')
+    args = parser.parse_args()
+
+    runs = [measure(args.checkpoint) for _ in range(args.repeat)]
+    import_seconds, load_seconds, heavy, slowest = min(runs)
+    print(f'import lapspython.pipeline:\t{import_seconds:.3f}s')
+    print(f'load {args.checkpoint}:\t{load_seconds:.3f}s')
+    for cumulative, name in slowest[:args.top]:
+        print(f'{cumulative / 1e6:.3f}s\t{name}')
+
+    failures = []
+    if heavy:
+        failures.append(f'Heavy modules imported: {", ".join(heavy)}')
+    if 0 < args.max_seconds < import_seconds:
+        failures.append(f'Import took {import_seconds:.3f}s, more than '
+                        f'{args.max_seconds:.3f}s.')
+    if failures:
+        sys.exit('\n'.join(failures))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Measure memory retained by extracted frontiers of a checkpoint.
+
+Run from the repository root:
+
+    python -m benchmarks.memory --output before.json
+    python -m benchmarks.memory --compare before.json
+
+The first command stores the bytes per frontier of the current tree, the
+second one reports the bytes saved per frontier relative to a stored run.
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+
+from lapspython.extraction import GrammarParser, ProgramExtractor
+from lapspython.translation import Translator
+from lapspython.utils import load_checkpoint
+
+
+def retained_bytes(checkpoint: str, parsed_grammar, jobs: int) -> float:
+    """Return bytes per frontier retained by an extracted result.
+
+    Allocations are traced from loading the checkpoint until the checkpoint
+    and the translator are discarded, so only the CompactResult and what it
+    keeps alive of the checkpoint remain.
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = load_checkpoint(checkpoint)
+    translator = Translator(parsed_grammar)
+    compact_result = ProgramExtractor(result, translator, jobs).compact_result
+    del result, translator
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    frontiers = len(compact_result.hit_frontiers)
+    frontiers += len(compact_result.miss_frontiers)
+    return retained / frontiers
+
+
+def main() -> None:
+    """Parse arguments and print retained bytes per frontier."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--checkpoint', default='re2_test')
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--output', help='Store results in this JSON file.')
+    parser.add_argument('--compare', help='Report savings over JSON file.')
+    args = parser.parse_args()
+
+    result = load_checkpoint(args.checkpoint)
+    parsed_grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+
+    baseline = {}
+    if args.compare is not None:
+        with open(args.compare, 'r') as json_file:
+            baseline = json.load(json_file)
+
+    measured = {}
+    print(f'{len(result.allFrontiers)} frontiers from {args.checkpoint}')
+    for jobs in args.jobs:
+        per_frontier = retained_bytes(args.checkpoint, parsed_grammar, jobs)
+        measured[str(jobs)] = per_frontier
+        line = f'jobs={jobs}:\t{per_frontier:.0f} bytes/frontier'
+        if str(jobs) in baseline:
+            saved = baseline[str(jobs)] - per_frontier
+            line += f'\t{saved:.0f} bytes/frontier saved'
+        print(line)
+
+    if args.output is not None:
+        with open(args.output, 'w') as json_file:
+            json.dump(measured, json_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Load-test a running translation service with concurrent connections.
+
+Start the service and run the load test from the repository root:
+
+    python -m lapspython.service re2_test --socket /tmp/lapspython.sock
+    python -m benchmarks.service_load --socket /tmp/lapspython.sock
+
+Programs and examples are taken from the frontiers of the checkpoint, and
+the throughput and latency percentiles of all requests are reported.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+from lapspython.utils import load_checkpoint
+
+
+def collect_requests(result, verify: bool) -> list:
+    """Return one request per program of all non-empty frontiers."""
+    requests = []
+    for frontier in result.allFrontiers.values():
+        for entry in frontier.entries:
+            request = {'program': str(entry.program),
+                       'name': frontier.task.name}
+            if verify:
+                request['examples'] = frontier.task.examples
+            requests.append(request)
+    return requests
+
+
+async def open_connection(args) -> tuple:
+    """Connect to the Unix socket or the HTTP port of the service."""
+    if args.socket != '':
+        return await asyncio.open_unix_connection(args.socket)
+    return await asyncio.open_connection('127.0.0.1', args.port)
+
+
+async def send(reader, writer, payload, http: bool):
+    """Send one payload and return the decoded response."""
+    data = json.dumps(payload).encode('utf-8')
+    if not http:
+        writer.write(data + b'\n')
+        return json.loads(await reader.readline())
+
+    header = (f'POST /translate HTTP/1.1\r\nHost: localhost\r\n'
+              f'Content-Length: {len(data)}\r\n\r\n')
+    writer.write(header.encode('latin-1') + data)
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line.strip() == b'':
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        if key.lower() == 'content-length':
+            length = int(value)
+    return json.loads(await reader.readexactly(length))
+
+
+async def client(args, payloads, latencies: list) -> int:
+    """Send payloads one after another, return number of errors."""
+    reader, writer = await open_connection(args)
+    errors = 0
+    for payload in payloads:
+        start = time.perf_counter()
+        responses = await send(reader, writer, payload, args.socket == '')
+        latencies.append(time.perf_counter() - start)
+        if not isinstance(responses, list):
+            responses = [responses]
+        errors += sum('error' in response for response in responses)
+    writer.close()
+    return errors
+
+
+async def load_test(args, requests: list) -> None:
+    """Distribute requests over connections and print statistics."""
+    cycle = itertools.cycle(requests)
+    payloads = []
+    for _ in range(args.requests // args.per_message):
+        payloads.append(list(itertools.islice(cycle, args.per_message)))
+    if args.per_message == 1:
+        payloads = [payload[0] for payload in payloads]
+
+    latencies: list = []
+    start = time.perf_counter()
+    errors = await asyncio.gather(*(
+        client(args, payloads[i::args.connections], latencies)
+        for i in range(args.connections)
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    translated = len(payloads) * args.per_message
+    print(f'{translated} programs in {elapsed:.2f}s:\t'
+          f'{translated / elapsed:.1f} programs/s, {sum(errors)} errors')
+    for percentile in (50, 95, 99):
+        index = min(len(latencies) - 1, len(latencies) * percentile // 100)
+        print(f'p{percentile} latency:\t{latencies[index] * 1000:.2f} ms')
+
+
+def main() -> None:
+    """Parse arguments and run the load test."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--socket', default='', help='Unix socket path.')
+    parser.add_argument('--port', type=int, default=0, help='HTTP port.')
+    parser.add_argument('--checkpoint', default='re2_test')
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--per-message', type=int, default=1,
+                        help='Requests sent as one JSON list.')
+    parser.add_argument('--verify', action='store_true',
+                        help='Send examples to verify translations.')
+    args = parser.parse_args()
+    if args.socket == '' and args.port == 0:
+        parser.error('Either --socket or --port is required.')
+
+    result = load_checkpoint(args.checkpoint, lazy=True)
+    requests = collect_requests(result, args.verify)
+    print(f'{len(requests)} programs from {args.checkpoint}')
+    asyncio.run(load_test(args, requests))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,389 @@
+"""Time parsing, translation, verification and the whole pipeline.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --compare before.json
+
+Besides the programs of the checkpoint, programs are sampled from its
+grammar with Grammar.sample() for each maximum depth and library size, and
+the pipeline is run on synthetic results of increasing task count. Each
+measurement is the best of --repeat runs. Results are stored as JSON, and
+--compare reports the speedup of each measurement over a stored run.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import signal
+import subprocess  # noqa: S404
+import time
+from typing import Callable, List
+
+from dreamcoder.frontier import Frontier, FrontierEntry
+from dreamcoder.grammar import Grammar
+from dreamcoder.program import Abstraction, Application, Invented
+from dreamcoder.task import Task
+from lapspython.extraction import GrammarParser
+from lapspython.pipeline import Pipeline
+from lapspython.translation import Translator
+from lapspython.utils import ECResultShim, load_checkpoint
+from lapspython.verification import VerificationTimeoutError
+
+BENCHMARKS = ('parse', 'translate', 'verify', 'pipeline')
+
+
+def best_time(function: Callable, repeat: int) -> float:
+    """Return the fastest of repeat calls of function in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def depth(program) -> int:
+    """Return the nesting depth of applications in a program."""
+    if isinstance(program, Application):
+        return 1 + max(depth(program.f), depth(program.x))
+    if isinstance(program, Abstraction):
+        return depth(program.body)
+    return 0
+
+
+def used_primitives(program) -> set:
+    """Return primitives used by program, including those of inventions."""
+    used = set()
+    for _, child in program.walk():
+        if isinstance(child, Invented):
+            used |= used_primitives(child.body)
+        elif child.isPrimitive:
+            used.add(child)
+    return used
+
+
+def library(grammar: Grammar, size: int, seed: int) -> Grammar:
+    """Return grammar restricted to size random primitives.
+
+    Invented primitives are kept if all primitives they use are kept, so
+    that the restricted grammar can be parsed on its own.
+    """
+    primitives = [p for _, _, p in grammar.productions if not p.isInvented]
+    size = min(size, len(primitives))
+    kept = set(random.Random(seed).sample(primitives, size))
+    productions = []
+    for log_probability, request, program in grammar.productions:
+        if isinstance(program, Invented):
+            if not used_primitives(program.body) <= kept:
+                continue
+        elif program not in kept:
+            continue
+        productions.append((log_probability, request, program))
+    return Grammar(grammar.logVariable, productions,
+                   continuationType=grammar.continuationType)
+
+
+def sample_programs(grammar: Grammar, tasks: List[Task], count: int,
+                    maximum_depth: int, seed: int) -> list:
+    """Sample distinct programs with at least one application.
+
+    Each program is evaluated on the inputs of a checkpoint task of the
+    same type to obtain examples for verification. Programs that fail on
+    any input are kept for translation, but without examples.
+
+    :returns: (program, examples) tuples, examples are None on failure.
+    :rtype: list
+    """
+    random.seed(seed)
+    samples: dict = {}
+    attempts = 0
+    while len(samples) < count and attempts < 50 * count:
+        attempts += 1
+        task = tasks[attempts % len(tasks)]
+        program = grammar.sample(task.request, maximumDepth=maximum_depth,
+                                 maxAttempts=100)
+        if program is None or depth(program) == 0 or str(program) in samples:
+            continue
+        samples[str(program)] = (program, evaluate(program, task.examples))
+    return list(samples.values())
+
+
+def evaluate(program, examples: list, timeout: float = 0.1):
+    """Return examples with the outputs of program, None on failure.
+
+    Evaluation fails once it exceeds timeout CPU seconds. The timer is
+    repeated, because primitives like _rsplit catch all exceptions and
+    may loop endlessly on patterns matching the empty string.
+    """
+    expired = []
+
+    def abort(signum, frame):
+        expired.append(signum)
+        raise VerificationTimeoutError()
+
+    previous = signal.signal(signal.SIGPROF, abort)
+    signal.setitimer(signal.ITIMER_PROF, timeout, timeout)
+    try:
+        function = program.evaluate([])
+        outputs = []
+        for inputs, _ in examples:
+            output = function
+            for argument in inputs:
+                output = output(argument)
+            outputs.append((inputs, output))
+    except Exception:
+        return None
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, previous)
+    if expired:
+        return None
+    return outputs
+
+
+def synthetic_result(grammar: Grammar, samples: list) -> ECResultShim:
+    """Wrap samples with examples into a result with one task each."""
+    result = ECResultShim()
+    result.grammars = [grammar]
+    result.allFrontiers = {}
+    result.taskLanguage = {}
+    for i, (program, examples) in enumerate(samples):
+        task = Task(f'synthetic_{i}', program.infer(), examples)
+        entry = FrontierEntry(program, logPrior=0.0, logLikelihood=0.0)
+        result.allFrontiers[task] = Frontier([entry], task)
+        result.taskLanguage[task.name] = [str(program)]
+    return result
+
+
+def bench_parse(grammar: Grammar, repeat: int) -> float:
+    """Time GrammarParser.parse() of a grammar."""
+    return best_time(lambda: GrammarParser(grammar), repeat)
+
+
+def bench_translate(parsed_grammar, programs: list, repeat: int) -> float:
+    """Time Translator.translate() of programs without memoization."""
+    def run():
+        translator = Translator(parsed_grammar, memoize=False)
+        for i, program in enumerate(programs):
+            str(translator.translate(program, f'f{i}'))
+    return best_time(run, repeat)
+
+
+def bench_verify(parsed_grammar, samples: list, repeat: int) -> tuple:
+    """Time ParsedProgram.verify() of translations with examples.
+
+    Translations are compiled before timing, so only their execution on
+    the examples is measured.
+
+    :returns: Seconds, number of verified and of valid translations.
+    :rtype: tuple
+    """
+    translator = Translator(parsed_grammar, memoize=False)
+    pending = []
+    for i, (program, examples) in enumerate(samples):
+        if examples is None:
+            continue
+        translation = translator.translate(program, f'f{i}')
+        with contextlib.suppress(Exception):
+            translation.compile_function()
+            pending.append((translation, examples))
+
+    valid = 0
+
+    def run():
+        nonlocal valid
+        valid = 0
+        for translation, examples in pending:
+            with contextlib.suppress(BaseException):
+                valid += translation.verify(examples)
+    seconds = best_time(run, repeat)
+    return seconds, len(pending), valid
+
+
+def bench_pipeline(result, repeat: int) -> float:
+    """Time Pipeline.extract_translate() without caches and output."""
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            Pipeline.extract_translate(result, verbose=False,
+                                       use_cache=False)
+    return best_time(run, repeat)
+
+
+def git_commit() -> str:
+    """Return the current commit hash, empty outside of a repository."""
+    try:
+        return subprocess.check_output(  # noqa: S603, S607
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+            universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+class Suite:
+    """Collect measurements as records of a machine-readable report."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        """Load checkpoint and store arguments."""
+        self.args = args
+        self.records: List[dict] = []
+        result = load_checkpoint(args.checkpoint)
+        self.result = result
+        self.grammar = result.grammars[-1]
+        self.tasks = [f.task for f in result.allFrontiers.values()]
+        self.frontiers = [f for f in result.allFrontiers.values()
+                          if not f.empty]
+
+    def record(self, benchmark: str, workload: str, parameter: str,
+               value: int, items: int, seconds: float, **extra) -> None:
+        """Store and print a measurement."""
+        record = {'benchmark': benchmark, 'workload': workload,
+                  'parameter': parameter, 'value': value, 'items': items,
+                  'seconds': seconds,
+                  'items_per_second': items / seconds}
+        record.update(extra)
+        self.records.append(record)
+        print(f'{benchmark}\t{workload}\t{parameter}={value}\t{items} items'
+              f'\t{seconds:.4f}s\t{record["items_per_second"]:.1f} items/s')
+
+    def run(self) -> None:
+        """Run the selected benchmarks on all workloads."""
+        args = self.args
+        parsed_grammar = GrammarParser(self.grammar).parsed_grammar
+        checkpoint_samples = [(entry.program, frontier.task.examples)
+                              for frontier in self.frontiers
+                              for entry in frontier.entries]
+        size = len(parsed_grammar.primitives) + len(parsed_grammar.invented)
+
+        if 'parse' in args.benchmarks:
+            self.record('parse', 'checkpoint', 'library_size', size, size,
+                        bench_parse(self.grammar, args.repeat))
+            for library_size in args.library_sizes:
+                grammar = library(self.grammar, library_size, args.seed)
+                items = len(grammar.productions)
+                self.record('parse', 'synthetic', 'library_size', items,
+                            items, bench_parse(grammar, args.repeat))
+
+        self.run_programs('checkpoint', 'library_size', size, parsed_grammar,
+                          checkpoint_samples)
+        for maximum_depth in args.depths:
+            samples = sample_programs(self.grammar, self.tasks, args.programs,
+                                      maximum_depth, args.seed)
+            self.run_programs('synthetic', 'depth', maximum_depth,
+                              parsed_grammar, samples)
+        for library_size in args.library_sizes:
+            grammar = library(self.grammar, library_size, args.seed)
+            samples = sample_programs(grammar, self.tasks, args.programs,
+                                      args.sample_depth, args.seed)
+            self.run_programs('synthetic', 'library_size',
+                              len(grammar.productions),
+                              GrammarParser(grammar).parsed_grammar, samples)
+
+        if 'pipeline' in args.benchmarks:
+            self.run_pipeline()
+
+    def run_programs(self, workload: str, parameter: str, value: int,
+                     parsed_grammar, samples: list) -> None:
+        """Run translate and verify benchmarks on sampled programs."""
+        args = self.args
+        if len(samples) == 0:
+            return
+        mean_depth = sum(depth(p) for p, _ in samples) / len(samples)
+        if 'translate' in args.benchmarks:
+            programs = [program for program, _ in samples]
+            seconds = bench_translate(parsed_grammar, programs, args.repeat)
+            self.record('translate', workload, parameter, value,
+                        len(programs), seconds, mean_depth=mean_depth)
+        if 'verify' in args.benchmarks:
+            seconds, verified, valid = bench_verify(parsed_grammar, samples,
+                                                    args.repeat)
+            self.record('verify', workload, parameter, value, verified,
+                        seconds, valid=valid)
+
+    def run_pipeline(self) -> None:
+        """Run the pipeline on the checkpoint and on synthetic results."""
+        args = self.args
+        items = len(self.frontiers)
+        self.record('pipeline', 'checkpoint', 'tasks', items, items,
+                    bench_pipeline(self.result, args.repeat))
+        samples = sample_programs(self.grammar, self.tasks,
+                                  max(args.task_counts), args.sample_depth,
+                                  args.seed)
+        samples = [sample for sample in samples if sample[1] is not None]
+        for task_count in args.task_counts:
+            result = synthetic_result(self.grammar, samples[:task_count])
+            items = len(result.allFrontiers)
+            self.record('pipeline', 'synthetic', 'tasks', items, items,
+                        bench_pipeline(result, args.repeat))
+
+    def report(self) -> dict:
+        """Return environment, arguments and records."""
+        return {
+            'environment': {
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S')
+            },
+            'arguments': vars(self.args),
+            'records': self.records
+        }
+
+
+def compare(records: List[dict], baseline: List[dict]) -> None:
+    """Print speedup of each measurement over the baseline."""
+    def key(record):
+        return (record['benchmark'], record['workload'], record['parameter'],
+                record['value'])
+
+    previous = {key(record): record for record in baseline}
+    print('\nbenchmark\tworkload\tparameter\tspeedup')
+    for record in records:
+        if key(record) not in previous:
+            continue
+        speedup = record['items_per_second']
+        speedup /= previous[key(record)]['items_per_second']
+        print(f'{record["benchmark"]}\t{record["workload"]}\t'
+              f'{record["parameter"]}={record["value"]}\t{speedup:.2f}x')
+
+
+def main() -> None:
+    """Parse arguments, run the suite and store or compare results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--checkpoint', default='re2_test')
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS,
+                        default=list(BENCHMARKS))
+    parser.add_argument('--depths', type=int, nargs='+', default=[3, 5, 7],
+                        help='Maximum depths passed to Grammar.sample().')
+    parser.add_argument('--sample-depth', type=int, default=7,
+                        help='Maximum depth for library sizes and tasks.')
+    parser.add_argument('--library-sizes', type=int, nargs='+',
+                        default=[10, 20, 30],
+                        help='Numbers of primitives kept in the grammar.')
+    parser.add_argument('--task-counts', type=int, nargs='+',
+                        default=[25, 50, 100, 200],
+                        help='Numbers of synthetic tasks of the pipeline.')
+    parser.add_argument('--programs', type=int, default=100,
+                        help='Programs sampled per depth and library size.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Store results in this JSON file.')
+    parser.add_argument('--compare', help='Report speedup over JSON file.')
+    args = parser.parse_args()
+
+    suite = Suite(args)
+    suite.run()
+
+    if args.compare is not None:
+        with open(args.compare, 'r') as json_file:
+            compare(suite.records, json.load(json_file)['records'])
+    if args.output is not None:
+        with open(args.output, 'w') as json_file:
+            json.dump(suite.report(), json_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
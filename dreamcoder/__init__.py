@@ -10,9 +10,11 @@ generated from before the EC codebase refactor. New files added to the codebase
 need to be added to the mapping, but if the existing modules are moved, then this the
 mapping needs to be updated to reflect the move or rename.
 
-The mapping uses the following pattern:
+The mapping registers an import hook that resolves each old module path to its new
+module on first import, so that importing e.g. dreamcoder.program does not import all
+modules (including torch) up front:
 
-    sys.modules[<old module path>] = <new module reference>
+    _LEGACY_MODULES[<old module path>] = <new module path>
 
 This is because the previous structure of the codebase was completely flat, and when refactoring
 to a hierarchical files, loading previous pickle files no longer works properly. It is important
@@ -23,81 +25,73 @@ could be a future improvement to this project. Until then, we use the module map
 
 For more info, see this StackOverflow answer: https://stackoverflow.com/a/2121918/2573242
 """
+
+import importlib
+import importlib.abc
+import importlib.util
 import sys
 
-from dreamcoder import differentiation
-from dreamcoder import dreamcoder
-from dreamcoder import enumeration
-from dreamcoder import fragmentGrammar
-from dreamcoder import fragmentUtilities
-from dreamcoder import frontier
-from dreamcoder import grammar
-from dreamcoder import likelihoodModel
-from dreamcoder import program
-from dreamcoder import primitiveGraph
-from dreamcoder import recognition
-from dreamcoder import task
-from dreamcoder import taskBatcher
-from dreamcoder import type
-from dreamcoder import utilities
-from dreamcoder import vs
-from dreamcoder.domains.misc import algolispPrimitives, deepcoderPrimitives
-from dreamcoder.domains.misc import RobustFillPrimitives
-from dreamcoder.domains.misc import napsPrimitives
-from dreamcoder.domains.tower import makeTowerTasks
-from dreamcoder.domains.tower import towerPrimitives
-from dreamcoder.domains.tower import tower_common
-from dreamcoder.domains.tower import main as tower_main
-from dreamcoder.domains.regex import groundtruthRegexes
-from dreamcoder.domains.regex import regexPrimitives
-from dreamcoder.domains.regex import makeRegexTasks
-from dreamcoder.domains.regex import main as regex_main
-from dreamcoder.domains.logo import logoPrimitives
-from dreamcoder.domains.logo import makeLogoTasks
-from dreamcoder.domains.logo import main as logo_main
-from dreamcoder.domains.list import listPrimitives
-from dreamcoder.domains.list import makeListTasks
-from dreamcoder.domains.list import main as list_main
-from dreamcoder.domains.arithmetic import arithmeticPrimitives
-from dreamcoder.domains.text import textPrimitives
-from dreamcoder.domains.text import makeTextTasks
-from dreamcoder.domains.text import main as text_main
-
-sys.modules['differentiation'] = differentiation
-sys.modules['ec'] = dreamcoder
-sys.modules['enumeration'] = enumeration
-sys.modules['fragmentGrammar'] = fragmentGrammar
-sys.modules['fragmentUtilities'] = fragmentUtilities
-sys.modules['frontier'] = frontier
-sys.modules['grammar'] = grammar
-sys.modules['likelihoodModel'] = likelihoodModel
-sys.modules['program'] = program
-sys.modules['recognition'] = recognition
-sys.modules['task'] = task
-sys.modules['taskBatcher'] = taskBatcher
-sys.modules['type'] = type
-sys.modules['utilities'] = utilities
-sys.modules['vs'] = vs
-sys.modules['algolispPrimitives'] = algolispPrimitives
-sys.modules['RobustFillPrimitives'] = RobustFillPrimitives
-sys.modules['napsPrimitives'] = napsPrimitives
-sys.modules['makeTowerTasks'] = makeTowerTasks
-sys.modules['towerPrimitives'] = towerPrimitives
-sys.modules['tower_common'] = tower_common
-sys.modules['tower'] = tower_main
-sys.modules['groundtruthRegexes'] = groundtruthRegexes
-sys.modules['regexPrimitives'] = regexPrimitives
-sys.modules['makeRegexTasks'] = makeRegexTasks
-sys.modules['regexes'] = regex_main
-sys.modules['deepcoderPrimitives'] = deepcoderPrimitives
-sys.modules['logoPrimitives'] = logoPrimitives
-sys.modules['makeLogoTasks'] = makeLogoTasks
-sys.modules['logo'] = logo_main
-sys.modules['listPrimitives'] = listPrimitives
-sys.modules['makeListTasks'] = makeListTasks
-sys.modules['list'] = list_main
-sys.modules['arithmeticPrimitives'] = arithmeticPrimitives
-sys.modules['textPrimitives'] = textPrimitives
-sys.modules['makeTextTasks'] = makeTextTasks
-sys.modules['text'] = text_main
-sys.modules['primitiveGraph'] = primitiveGraph
+_LEGACY_MODULES = {
+    'differentiation': 'dreamcoder.differentiation',
+    'ec': 'dreamcoder.dreamcoder',
+    'enumeration': 'dreamcoder.enumeration',
+    'fragmentGrammar': 'dreamcoder.fragmentGrammar',
+    'fragmentUtilities': 'dreamcoder.fragmentUtilities',
+    'frontier': 'dreamcoder.frontier',
+    'grammar': 'dreamcoder.grammar',
+    'likelihoodModel': 'dreamcoder.likelihoodModel',
+    'program': 'dreamcoder.program',
+    'recognition': 'dreamcoder.recognition',
+    'task': 'dreamcoder.task',
+    'taskBatcher': 'dreamcoder.taskBatcher',
+    'type': 'dreamcoder.type',
+    'utilities': 'dreamcoder.utilities',
+    'vs': 'dreamcoder.vs',
+    'algolispPrimitives': 'dreamcoder.domains.misc.algolispPrimitives',
+    'RobustFillPrimitives': 'dreamcoder.domains.misc.RobustFillPrimitives',
+    'napsPrimitives': 'dreamcoder.domains.misc.napsPrimitives',
+    'makeTowerTasks': 'dreamcoder.domains.tower.makeTowerTasks',
+    'towerPrimitives': 'dreamcoder.domains.tower.towerPrimitives',
+    'tower_common': 'dreamcoder.domains.tower.tower_common',
+    'tower': 'dreamcoder.domains.tower.main',
+    'groundtruthRegexes': 'dreamcoder.domains.regex.groundtruthRegexes',
+    'regexPrimitives': 'dreamcoder.domains.regex.regexPrimitives',
+    'makeRegexTasks': 'dreamcoder.domains.regex.makeRegexTasks',
+    'regexes': 'dreamcoder.domains.regex.main',
+    'deepcoderPrimitives': 'dreamcoder.domains.misc.deepcoderPrimitives',
+    'logoPrimitives': 'dreamcoder.domains.logo.logoPrimitives',
+    'makeLogoTasks': 'dreamcoder.domains.logo.makeLogoTasks',
+    'logo': 'dreamcoder.domains.logo.main',
+    'listPrimitives': 'dreamcoder.domains.list.listPrimitives',
+    'makeListTasks': 'dreamcoder.domains.list.makeListTasks',
+    'list': 'dreamcoder.domains.list.main',
+    'arithmeticPrimitives': 'dreamcoder.domains.arithmetic.arithmeticPrimitives',
+    'textPrimitives': 'dreamcoder.domains.text.textPrimitives',
+    'makeTextTasks': 'dreamcoder.domains.text.makeTextTasks',
+    'text': 'dreamcoder.domains.text.main',
+    'primitiveGraph': 'dreamcoder.primitiveGraph',
+}
+
+
+class _LegacyModuleFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """Import old module paths as their new modules, e.g. 'ec' as dreamcoder.dreamcoder.
+
+    The finder is consulted before all regular finders, so old pickles resolve e.g. 'grammar'
+    or 'text' to the dreamcoder modules even if modules of the same name are installed, as
+    with the former eager mapping in sys.modules.
+    """
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname in _LEGACY_MODULES:
+            return importlib.util.spec_from_loader(fullname, self)
+        return None
+
+    def create_module(self, spec):
+        return importlib.import_module(_LEGACY_MODULES[spec.name])
+
+    def exec_module(self, module):
+        pass
+
+
+if not any(isinstance(finder, _LegacyModuleFinder) for finder in sys.meta_path):
+    sys.meta_path.insert(0, _LegacyModuleFinder())
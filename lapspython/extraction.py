@@ -1,63 +1,123 @@
 """Implements classes to extract primitives and lambda expressions."""
 
+import copy
+import hashlib
+import inspect
+import itertools
+import multiprocessing
+import os
+import re
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional
+
+import dill
 from tqdm import tqdm
 
-from dreamcoder.dreamcoder import ECResult
+from dreamcoder.frontier import Frontier
 from dreamcoder.grammar import Grammar
 from dreamcoder.program import Invented, Primitive
 from lapspython.translation import Translator
 from lapspython.types import (CompactFrontier, CompactResult, ParsedGrammar,
-                              ParsedInvented, ParsedPrimitive, ParsedRInvented,
+                              ParsedInvented, ParsedPrimitive,
+                              ParsedProgramBase, ParsedRInvented,
                               ParsedRPrimitive)
+from lapspython.verification import (ERROR, INVALID, TIMEOUT, VALID,
+                                     VerificationCache, VerifierPool)
+
+if TYPE_CHECKING:
+    from dreamcoder.dreamcoder import ECResult
+
+# Shared state of GrammarParser.parse(jobs > 1). It is set before the workers
+# of each level are forked so that they inherit the translations of all
+# previous levels.
+_SHARED_GRAMMAR: Optional[ParsedGrammar] = None
+
+
+def _translate_inventions(handles: list) -> list:
+    """Translate invented primitives whose dependencies are translated.
+
+    :param handles: Handles of invented primitives in the shared grammar.
+    :type handles: list
+    :returns: A (source, args, dependencies) tuple per handle.
+    :rtype: list
+    """
+    if _SHARED_GRAMMAR is None:  # pragma: no cover
+        raise RuntimeError('Worker was not forked by GrammarParser.')
+    translator = Translator(_SHARED_GRAMMAR, memoize=False)
+    translated = []
+    for handle in handles:
+        invented = _SHARED_GRAMMAR.invented[handle]
+        trans = translator.translate(invented.program, invented.name)
+        translated.append((trans.source, trans.args, trans.dependencies))
+    return translated
 
 
 class GrammarParser:
     """Extract, parse, and store all primitives from grammar."""
 
-    def __init__(self, grammar: Grammar = None, mode='python') -> None:
+    def __init__(self, grammar: Grammar = None, mode='python',
+                 jobs: int = 1) -> None:
         """Optionally parse grammar if passed during construction.
 
         :param grammar: A grammar induced by LAPS.
         :type grammar: dreamcoder.grammar.Grammar, optional
         :param mode: Whether to extract Python or R code, can 'python' or 'r'.
         :type mode: string, optional
+        :param jobs: Number of processes translating invented primitives.
+        :type jobs: int, optional
         """
         self.mode = mode.lower()
         if self.mode not in ('python', 'r'):
             raise ValueError('mode must be "Python" or "R".')
+        if jobs < 1:
+            raise ValueError('jobs must be a positive integer.')
+        self.jobs = jobs
 
         if grammar is not None:
             self.parse(grammar)
         else:
             self.parsed_grammar = ParsedGrammar({}, {})
 
-    def parse(self, grammar: Grammar) -> ParsedGrammar:
+    def parse(self, grammar: Grammar,
+              previous: ParsedGrammar = None) -> ParsedGrammar:
         """Convert Primitive objects to simplified ParsedPrimitive objects.
 
+        If a grammar parsed in a previous iteration is passed, its primitives
+        and translated inventions are reused and only new productions are
+        parsed. Reused inventions keep their names, new inventions are named
+        after the highest existing name, so earlier translations stay valid.
+
         :param grammar: A grammar induced inside main() or ecIterator().
         :type grammar: dreamcoder.grammar.Grammar
+        :param previous: Grammar parsed from a previous iteration.
+        :type previous: lapspython.types.ParsedGrammar, optional
         :rtype: ParsedGrammar
         """
-        parsed_primitives: dict = {}
         parsed_invented: dict = {}
+        previous_primitives: dict = {}
+        previous_invented: dict = {}
+        next_index = 0
+
+        if previous is not None:
+            if previous.mode != self.mode:
+                raise ValueError('Previous grammar has a different mode.')
+            previous_primitives = previous.primitives
+            previous_invented = previous.invented
+            next_index = self.next_invention_index(previous_invented)
+
+        parsed_primitives = self.parse_primitives(grammar, previous_primitives)
 
         for _, _, primitive in tqdm(grammar.productions):
             if isinstance(primitive, Primitive):
-                name = primitive.name
-                if name not in parsed_primitives:
-                    if self.mode == 'python':
-                        parsed_primitive = ParsedPrimitive(primitive)
-                        parsed_primitive = parsed_primitive.resolve_lambdas()
-                        parsed_primitives[name] = parsed_primitive
-                    else:
-                        parsed_primitives[name] = ParsedRPrimitive(primitive)
-
-            elif not isinstance(primitive, Invented):
+                continue
+            if not isinstance(primitive, Invented):
                 raise TypeError(f'Encountered unknown type {type(primitive)}.')
 
-            elif str(primitive) not in parsed_invented:
-                handle = str(primitive)
-                name = f'f{len(parsed_invented)}'
+            handle = str(primitive)
+            if handle in previous_invented:
+                parsed_invented[handle] = copy.copy(previous_invented[handle])
+            elif handle not in parsed_invented:
+                name = f'f{next_index}'
+                next_index += 1
                 if self.mode == 'python':
                     parsed_invented[handle] = ParsedInvented(primitive, name)
                 else:
@@ -69,16 +129,119 @@ class GrammarParser:
             self.mode
         )
 
-        translator = Translator(self.parsed_grammar)
-        for invented in self.parsed_grammar.invented.values():
-            if invented.source == '':
-                trans = translator.translate(invented.program, invented.name)
-                invented.source = trans.source
-                invented.args = trans.args
-                invented.dependencies = trans.dependencies
+        for level in self.invention_levels(parsed_invented):
+            self._translate_level(level)
 
         return self.parsed_grammar
 
+    def parse_primitives(self, grammar: Grammar,
+                         previous: dict = None) -> dict:
+        """Parse primitives of grammar that have not been parsed before.
+
+        :param grammar: A grammar induced by LAPS.
+        :type grammar: dreamcoder.grammar.Grammar
+        :param previous: (name, parsed primitive) dictionary to reuse, e.g.
+            primitives of another checkpoint of the same domain.
+        :type previous: dict, optional
+        :returns: (name, parsed primitive) dictionary of all primitives.
+        :rtype: dict
+        """
+        if previous is None:
+            previous = {}
+        parsed_primitives: dict = {}
+        module_indices: dict = {}
+
+        for primitive in grammar.primitives:
+            if not isinstance(primitive, Primitive):
+                continue
+            name = primitive.name
+            if name in previous:
+                parsed_primitives[name] = previous[name]
+            elif name not in parsed_primitives:
+                if self.mode == 'python':
+                    parsed_primitive = ParsedPrimitive(primitive,
+                                                       module_indices)
+                    parsed_primitive = parsed_primitive.resolve_lambdas()
+                    parsed_primitives[name] = parsed_primitive
+                else:
+                    parsed_primitives[name] = ParsedRPrimitive(
+                        primitive, module_indices)
+        return parsed_primitives
+
+    @classmethod
+    def next_invention_index(cls, parsed_invented: dict) -> int:
+        """Return the lowest index above all names f0, f1, ... in use.
+
+        :param parsed_invented: (handle, parsed invented primitive) dictionary.
+        :type parsed_invented: dict
+        :rtype: int
+        """
+        indices = [int(invented.name[1:])
+                   for invented in parsed_invented.values()
+                   if re.fullmatch(r'f\d+', invented.name)]
+        return max(indices, default=-1) + 1
+
+    @classmethod
+    def invention_levels(cls, parsed_invented: dict) -> List[list]:
+        """Group untranslated invented primitives by dependency depth.
+
+        Inventions of a level only call primitives and inventions of previous
+        levels, so each level can be translated independently once all
+        previous levels are translated.
+
+        :param parsed_invented: (handle, parsed invented primitive) dictionary.
+        :type parsed_invented: dict
+        :returns: A list of handle lists, starting with inventions that do not
+            depend on untranslated inventions.
+        :rtype: List[list]
+        """
+        pending = {
+            handle: {str(node) for _, node in invented.program.body.walk()
+                     if node.isInvented and str(node) != handle}
+            for handle, invented in parsed_invented.items()
+            if invented.source == ''
+        }
+        for dependencies in pending.values():
+            dependencies.intersection_update(pending)
+
+        levels = []
+        while pending:
+            level = [handle for handle, dependencies in pending.items()
+                     if len(dependencies) == 0]
+            if len(level) == 0:
+                raise ValueError('Invented primitives depend on each other.')
+            for handle in level:
+                del pending[handle]
+            for dependencies in pending.values():
+                dependencies.difference_update(level)
+            levels.append(level)
+        return levels
+
+    def _translate_level(self, level: list) -> None:
+        global _SHARED_GRAMMAR
+
+        jobs = min(self.jobs, len(level))
+        _SHARED_GRAMMAR = self.parsed_grammar
+        try:
+            if jobs == 1:
+                translated = _translate_inventions(level)
+            else:
+                shard_size = -(-len(level) // jobs)
+                shards = [level[i:i + shard_size]
+                          for i in range(0, len(level), shard_size)]
+                context = multiprocessing.get_context('fork')
+                with context.Pool(jobs) as pool:
+                    results = pool.map(_translate_inventions, shards)
+                translated = [trans for shard in results for trans in shard]
+        finally:
+            _SHARED_GRAMMAR = None
+
+        for handle, (source, args, dependencies) in zip(level, translated):
+            invented = self.parsed_grammar.invented[handle]
+            invented.source = source
+            invented.args = args
+            invented.dependencies = dependencies
+
     def fix_invented(self, new_invented: dict) -> None:
         """Replace invented primitives implementations.
 
@@ -97,55 +260,537 @@ class GrammarParser:
             this_invented[handle].dependencies = new_data['dependencies']
 
 
+class GrammarSnapshot:
+    """Parsed grammar stored next to a checkpoint to skip parsing."""
+
+    def __init__(self, filename: str, mode: str = 'python') -> None:
+        """Set path of snapshot in checkpoints folder.
+
+        :param filename: Checkpoint name in checkpoints folder.
+        :type filename: str
+        :param mode: Either 'python' or 'r'.
+        :type mode: str, optional
+        """
+        self.mode = mode.lower()
+        self.path = f'checkpoints/{filename}_{self.mode}_grammar.pickle'
+
+    @classmethod
+    def source_paths(cls, grammar: Grammar, mode: str) -> set:
+        """Return paths of all files the parsed grammar is derived from.
+
+        These are the modules implementing the primitives, their R sources
+        in R mode, and the lapspython modules parsing and translating them.
+
+        :param grammar: A grammar induced by LAPS.
+        :type grammar: dreamcoder.grammar.Grammar
+        :param mode: Either 'python' or 'r'.
+        :type mode: str
+        :rtype: set
+        """
+        paths = {inspect.getfile(ParsedGrammar), inspect.getfile(Translator),
+                 __file__}
+        for primitive in grammar.primitives:
+            if not isinstance(primitive, Primitive):
+                continue
+            if not inspect.isfunction(primitive.value):
+                continue
+            path = inspect.getsourcefile(primitive.value)
+            if path is None:  # pragma: no cover
+                continue
+            paths.add(path)
+            if mode == 'r':
+                paths.add(path[:-2] + 'R')
+        return paths
+
+    @classmethod
+    def key(cls, grammar: Grammar, mode: str) -> str:
+        """Hash grammar content, mode, and source files.
+
+        :param grammar: A grammar induced by LAPS.
+        :type grammar: dreamcoder.grammar.Grammar
+        :param mode: Either 'python' or 'r'.
+        :type mode: str
+        :rtype: str
+        """
+        digest = hashlib.sha256()
+        digest.update(mode.encode('utf-8'))
+        digest.update(str(grammar).encode('utf-8'))
+        for path in sorted(cls.source_paths(grammar, mode)):
+            digest.update(path.encode('utf-8'))
+            with open(path, 'rb') as source_file:
+                digest.update(source_file.read())
+        return digest.hexdigest()
+
+    def load(self, grammar: Grammar) -> Optional[ParsedGrammar]:
+        """Return stored parsed grammar if nothing has changed since.
+
+        :param grammar: The grammar that would be parsed otherwise.
+        :type grammar: dreamcoder.grammar.Grammar
+        :returns: The snapshot or None if missing or outdated.
+        :rtype: lapspython.types.ParsedGrammar, optional
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as snapshot_file:
+            if dill.load(snapshot_file) != self.key(grammar, self.mode):
+                return None
+            return dill.load(snapshot_file)
+
+    def is_current(self, grammar: Grammar) -> bool:
+        """Test whether load() would return the snapshot.
+
+        Only the key of the snapshot is read, not the parsed grammar.
+
+        :param grammar: The grammar that would be parsed otherwise.
+        :type grammar: dreamcoder.grammar.Grammar
+        :rtype: bool
+        """
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, 'rb') as snapshot_file:
+            return dill.load(snapshot_file) == self.key(grammar, self.mode)
+
+    def save(self, grammar: Grammar, parsed_grammar: ParsedGrammar) -> None:
+        """Store parsed grammar with the key of the grammar it was parsed of.
+
+        :param grammar: A grammar induced by LAPS.
+        :type grammar: dreamcoder.grammar.Grammar
+        :param parsed_grammar: The parsed grammar.
+        :type parsed_grammar: lapspython.types.ParsedGrammar
+        """
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as snapshot_file:
+            dill.dump(self.key(grammar, self.mode), snapshot_file)
+            dill.dump(parsed_grammar, snapshot_file)
+        os.replace(tmp_path, self.path)
+
+
+# Translation policies of ProgramExtractor. Programs of a frontier are ordered
+# by posterior, ALL translates every program, FIRST_VALID stops after the first
+# valid translation, and TOP_K only translates the k most likely programs.
+ALL = 'all'
+FIRST_VALID = 'first-valid'
+TOP_K = 'top-k'
+POLICIES = (ALL, FIRST_VALID, TOP_K)
+
+# Shared state of the worker processes of ProgramExtractor.extract(jobs > 1).
+# It is only set in the workers by their initializer. Its arguments are not
+# pickled by forked workers, so they inherit the warm translator and the
+# frontiers of the parent process.
+_SHARED_EXTRACTION: Optional[tuple] = None
+
+
+def _share_extraction(shared: tuple) -> None:
+    """Store state shared by the parent process in a forked worker."""
+    global _SHARED_EXTRACTION
+    _SHARED_EXTRACTION = shared
+
+
+def _translate_shard(indices: range) -> tuple:
+    """Translate and optionally verify a shard of frontiers in a worker.
+
+    :param indices: Indices into the frontiers shared by the parent process.
+    :type indices: range
+    :returns: A (translations, verdicts) tuple per frontier in the shard and
+        the translation counters of the shard.
+    :rtype: tuple
+    """
+    if _SHARED_EXTRACTION is None:  # pragma: no cover
+        raise RuntimeError('Worker was not forked by ProgramExtractor.')
+    translator, frontiers, verify, cache, policy, top_k = _SHARED_EXTRACTION
+    counters = translator.report()
+    translated = [ProgramExtractor.translate_frontier(
+        frontiers[i], translator, verify, cache, policy, top_k)
+        for i in indices]
+    final = translator.report()
+    return translated, {key: final[key] - counters[key] for key in counters}
+
+
 class ProgramExtractor:
     """Extract, parse and translate synthesized programs."""
 
-    def __init__(self, result: ECResult = None,
-                 translator: Translator = None) -> None:
+    def __init__(self, result: 'ECResult' = None,
+                 translator: Translator = None, jobs: int = 1,
+                 verifier: VerifierPool = None,
+                 cache: VerificationCache = None,
+                 policy: str = ALL, top_k: int = 1) -> None:
         """Optionally extract programs if passed during construction.
 
+        The policy decides how many programs per frontier are translated.
+        Programs that are not translated are stored in
+        CompactFrontier.skipped.
+
         :param result: A result produced by LAPS or checkpoint.
         :type result: dreamcoder.dreamcoder.ECResult, optional
         :param translator: Translator to translate programs during extraction.
         :type translator: lapspython.translation.Translator, optional
+        :param jobs: Number of worker processes used for translation.
+        :type jobs: int, optional
+        :param verifier: Sandbox to verify translations in, else in-process.
+            Only Python translations can be verified in the sandbox.
+        :type verifier: lapspython.verification.VerifierPool, optional
+        :param cache: Verdicts to look up before verifying translations.
+        :type cache: lapspython.verification.VerificationCache, optional
+        :param policy: 'all', 'first-valid' or 'top-k'.
+        :type policy: str, optional
+        :param top_k: Number of programs translated with policy 'top-k'.
+        :type top_k: int, optional
         """
+        if policy not in POLICIES:
+            raise ValueError('policy must be "all", "first-valid" or "top-k".')
+        if top_k < 1:
+            raise ValueError('top_k must be a positive integer.')
+        self.policy = policy
+        self.top_k = top_k
+
         if result is not None:
-            self.extract(result, translator)
+            self.extract(result, translator, jobs, verifier, cache)
         else:
             self.compact_result = CompactResult({}, {})
 
-    def extract(self, result: ECResult,
-                translator: Translator = None) -> CompactResult:
+    def extract(self, result: 'ECResult',
+                translator: Translator = None,
+                jobs: int = 1,
+                verifier: VerifierPool = None,
+                cache: VerificationCache = None) -> CompactResult:
         """Extract all frontiers with descriptions and frontiers.
 
+        With jobs > 1, HIT frontiers are split into contiguous shards which
+        are translated by a pool of forked worker processes. Each worker
+        inherits the warm translator of the parent process. The merged result
+        is identical to a serial run.
+
+        If a verifier is passed, all translations are verified in its
+        sandboxed workers afterwards. Translations exceeding the timeout are
+        stored in CompactFrontier.timed_out instead of CompactFrontier.failed.
+        With policy 'first-valid', programs are instead translated in this
+        process one per frontier and round, and each round is verified as
+        one batch, so that no program after the first valid one is
+        translated.
+
+        If a cache is passed, translations are only verified if their verdict
+        is not cached yet. New verdicts are added to the cache.
+
+        Programs are translated according to the policy of the extractor.
+
         :param result: Result of dreamcoder execution (checkpoint)
         :type result: dreamcoder.dreamcoder.ECResult
         :param translator: Translator to translate programs during extraction.
         :type translator: lapspython.translation.Translator, optional
+        :param jobs: Number of worker processes used for translation.
+        :type jobs: int, optional
+        :param verifier: Sandbox to verify translations in, else in-process.
+            Only Python translations can be verified in the sandbox.
+        :type verifier: lapspython.verification.VerifierPool, optional
+        :param cache: Verdicts to look up before verifying translations.
+        :type cache: lapspython.verification.VerificationCache, optional
         :rtype: lapspython.types.CompactResult
         """
         hit_frontiers = {}
         miss_frontiers = {}
 
-        for frontier in tqdm(result.allFrontiers.values()):
-            name = frontier.task.name
-            annotation = result.taskLanguage.get(name, '')[0]
-            compact_frontier = CompactFrontier(frontier, annotation)
-            if frontier.empty:
-                miss_frontiers[name] = compact_frontier
+        counters = {}
+        if translator is not None:
+            counters = translator.report()
+
+        for frontier in self.iter_extract(result, translator, jobs, verifier,
+                                          cache):
+            if len(frontier.program_strings) == 0:
+                miss_frontiers[frontier.name] = frontier
             else:
-                hit_frontiers[name] = compact_frontier
-
-                if translator is not None:
-                    for program in compact_frontier.programs:
-                        transl = translator.translate(program, name)
-                        try:
-                            if transl.verify(compact_frontier.examples):
-                                compact_frontier.translations.append(transl)
-                            else:
-                                compact_frontier.failed.append(transl)
-                        except BaseException:
-                            compact_frontier.failed.append(transl)
+                hit_frontiers[frontier.name] = frontier
+
+        if translator is not None:
+            final = translator.report()
+            counters = {f'translation {key}': final[key] - counters[key]
+                        for key in counters}
 
         self.compact_result = CompactResult(hit_frontiers, miss_frontiers)
+        self.compact_result.counters.update(counters)
         return self.compact_result
+
+    def iter_extract(self, result: 'ECResult',
+                     translator: Translator = None,
+                     jobs: int = 1,
+                     verifier: VerifierPool = None,
+                     cache: VerificationCache = None
+                     ) -> Iterator[CompactFrontier]:
+        """Yield frontiers as soon as they are extracted and translated.
+
+        MISS frontiers need no translation and are yielded first, followed by
+        the HIT frontiers in checkpoint order. Only the frontiers of the
+        current shard are held in memory. Arguments are the same as for
+        extract(), with a verifier each shard is verified as one batch.
+
+        :rtype: Iterator[lapspython.types.CompactFrontier]
+        """
+        if jobs < 1:
+            raise ValueError('jobs must be a positive integer.')
+        if verifier is not None and translator is not None and \
+                translator.mode != 'python':
+            raise ValueError('Sandboxed verification only supports Python.')
+        return self._iter_extract(result, translator, jobs, verifier, cache)
+
+    def _iter_extract(self, result: 'ECResult',
+                      translator: Optional[Translator],
+                      jobs: int,
+                      verifier: Optional[VerifierPool],
+                      cache: Optional[VerificationCache]
+                      ) -> Iterator[CompactFrontier]:
+        """Yield frontiers for iter_extract() once jobs is validated."""
+        hit_frontiers = []
+        for frontier in result.allFrontiers.values():
+            if frontier.empty:
+                yield self.compact_frontier(result, frontier)
+            else:
+                hit_frontiers.append(frontier)
+
+        if translator is None:
+            for frontier in hit_frontiers:
+                yield self.compact_frontier(result, frontier)
+            return
+
+        verify = verifier is None
+        lazy = False
+        if verifier is not None and self.policy == FIRST_VALID:
+            lazy = True
+            chunks = self._translate_lazily(result, hit_frontiers, translator,
+                                            jobs, verifier, cache)
+        elif jobs == 1 or len(hit_frontiers) < 2:
+            chunks = self._translate_serial(result, hit_frontiers, translator,
+                                            verify, cache)
+        else:
+            chunks = self._translate_parallel(result, hit_frontiers,
+                                              translator, jobs, verify, cache)
+
+        for frontiers, translated in chunks:
+            if verifier is not None and not lazy:
+                translated = self._verify_sandboxed(frontiers, translated,
+                                                    translator.mode, verifier,
+                                                    cache)
+
+            for frontier, (translations, verdicts) in zip(frontiers,
+                                                          translated):
+                self.sort_translations(frontier, translations, verdicts)
+                skipped = frontier.program_strings[len(verdicts):]
+                frontier.skipped = list(skipped)
+                if cache is not None:
+                    for translation, verdict in zip(translations, verdicts):
+                        cache.record(translation, frontier.examples,
+                                     translator.mode, verdict)
+                yield frontier
+
+    @classmethod
+    def compact_frontier(cls, result: 'ECResult',
+                         frontier: Frontier) -> CompactFrontier:
+        """Condense frontier and attach its task description.
+
+        :param result: Result of dreamcoder execution (checkpoint)
+        :type result: dreamcoder.dreamcoder.ECResult
+        :param frontier: A frontier of the checkpoint.
+        :type frontier: dreamcoder.frontier.Frontier
+        :rtype: lapspython.types.CompactFrontier
+        """
+        annotation = result.taskLanguage.get(frontier.task.name, '')[0]
+        return CompactFrontier(frontier, annotation)
+
+    @classmethod
+    def translate_frontier(cls, frontier: Frontier,
+                           translator: Translator, verify: bool = True,
+                           cache: VerificationCache = None,
+                           policy: str = ALL, top_k: int = 1) -> tuple:
+        """Translate and optionally verify programs of a HIT frontier.
+
+        Programs are translated in the order of
+        CompactFrontier.program_strings.
+
+        :param frontier: A HIT frontier of the checkpoint.
+        :type frontier: dreamcoder.frontier.Frontier
+        :param translator: Translator to translate programs with.
+        :type translator: lapspython.translation.Translator
+        :param verify: Whether to verify the translations in this process.
+        :type verify: bool, optional
+        :param cache: Verdicts to look up before verifying translations.
+        :type cache: lapspython.verification.VerificationCache, optional
+        :param policy: 'all', 'first-valid' or 'top-k'. Without verification
+            'first-valid' translates all programs and leaves stopping early
+            to the caller.
+        :type policy: str, optional
+        :param top_k: Number of programs translated with policy 'top-k'.
+        :type top_k: int, optional
+        :returns: Translations and their verdicts, None if not verified.
+        :rtype: tuple
+        """
+        task = frontier.task
+        programs: Iterable = CompactFrontier.ranked_programs(frontier)
+        if policy == TOP_K:
+            programs = itertools.islice(programs, top_k)
+
+        if not verify:
+            translations = [translator.translate(program, task.name)
+                            for program in programs]
+            return translations, None
+
+        translations = []
+        verdicts = []
+        for program in programs:
+            translation = translator.translate(program, task.name)
+            verdict = None
+            if cache is not None:
+                verdict = cache.peek(translation, task.examples,
+                                     translator.mode)
+            if verdict is None:
+                verdict = cls.verify_translation(translation, task.examples)
+            translations.append(translation)
+            verdicts.append(verdict)
+            if policy == FIRST_VALID and verdict == VALID:
+                break
+        return translations, verdicts
+
+    @classmethod
+    def verify_translation(cls, translation: ParsedProgramBase,
+                           examples: list) -> str:
+        """Verify a translation in this process without timeout.
+
+        :param translation: A translated program.
+        :type translation: lapspython.types.ParsedProgramBase
+        :param examples: A list of (input, output) tuples.
+        :type examples: list
+        :returns: VALID, INVALID or ERROR.
+        :rtype: str
+        """
+        try:
+            if translation.verify(examples):
+                return VALID
+            return INVALID
+        except MemoryError:
+            return ERROR
+        except BaseException:
+            return INVALID
+
+    @classmethod
+    def sort_translations(cls, frontier: CompactFrontier, translations: list,
+                          verdicts: list) -> None:
+        """Append translations to the frontier list matching their verdict.
+
+        The verdicts are appended to CompactFrontier.verdicts.
+
+        :param frontier: The HIT frontier the translations belong to.
+        :type frontier: lapspython.types.CompactFrontier
+        :param translations: Translated programs of the frontier.
+        :type translations: list
+        :param verdicts: VALID, INVALID, TIMEOUT or ERROR per translation.
+        :type verdicts: list
+        """
+        frontier.verdicts += tuple(verdicts)
+        for translation, verdict in zip(translations, verdicts):
+            if verdict == VALID:
+                frontier.translations.append(translation)
+            elif verdict == TIMEOUT:
+                frontier.timed_out.append(translation)
+            else:
+                frontier.failed.append(translation)
+
+    def _translate_serial(self, result: 'ECResult', frontiers: List[Frontier],
+                          translator: Translator, verify: bool,
+                          cache: Optional[VerificationCache]) -> Iterator:
+        for frontier in tqdm(frontiers):
+            translated = self.translate_frontier(frontier, translator, verify,
+                                                 cache, self.policy,
+                                                 self.top_k)
+            yield [self.compact_frontier(result, frontier)], [translated]
+
+    def _translate_parallel(self, result: 'ECResult',
+                            frontiers: List[Frontier],
+                            translator: Translator, jobs: int,
+                            verify: bool,
+                            cache: Optional[VerificationCache]) -> Iterator:
+        jobs = min(jobs, len(frontiers))
+        shards = self._shards(len(frontiers), jobs)
+
+        shared = (translator, frontiers, verify, cache, self.policy,
+                  self.top_k)
+        context = multiprocessing.get_context('fork')
+        with context.Pool(jobs, _share_extraction, (shared,)) as pool:
+            results = pool.imap(_translate_shard, shards)
+            for shard, (translated, counters) in zip(
+                    shards, tqdm(results, total=len(shards))):
+                translator.cache_hits += counters['cache hits']
+                translator.cache_misses += counters['cache misses']
+                translator.shared_subexpressions += \
+                    counters['shared subexpressions']
+                translator.saved_statements += counters['saved statements']
+                yield [self.compact_frontier(result, frontiers[i])
+                       for i in shard], translated
+
+    def _translate_lazily(self, result: 'ECResult',
+                          frontiers: List[Frontier], translator: Translator,
+                          jobs: int, verifier: VerifierPool,
+                          cache: Optional[VerificationCache]) -> Iterator:
+        # Policy 'first-valid' translates and verifies the next program of
+        # each frontier per round, until each frontier has a valid or no
+        # remaining program. Verdicts are returned with the translations.
+        for shard in tqdm(self._shards(len(frontiers), jobs)):
+            compact_frontiers = [self.compact_frontier(result, frontiers[i])
+                                 for i in shard]
+            programs = [CompactFrontier.ranked_programs(frontiers[i])
+                        for i in shard]
+            translated: list = [([], []) for _ in compact_frontiers]
+            pending = list(range(len(compact_frontiers)))
+            while pending:
+                round_frontiers = []
+                round_translated = []
+                for i in pending:
+                    frontier = compact_frontiers[i]
+                    program = programs[i][len(translated[i][0])]
+                    translation = translator.translate(program, frontier.name)
+                    round_frontiers.append(frontier)
+                    round_translated.append(([translation], None))
+                verified = self._verify_sandboxed(round_frontiers,
+                                                  round_translated,
+                                                  translator.mode, verifier,
+                                                  cache)
+                for i, (translations, verdicts) in zip(pending, verified):
+                    translated[i][0].extend(translations)
+                    translated[i][1].extend(verdicts)
+                pending = [i for i in pending if self._unfinished(
+                    programs[i], translated[i][1])]
+            yield compact_frontiers, translated
+
+    def _verify_sandboxed(self, frontiers: List[CompactFrontier],
+                          translated: list, mode: str,
+                          verifier: VerifierPool,
+                          cache: Optional[VerificationCache]) -> list:
+        all_verdicts: list = []
+        batch: list = []
+        owners: list = []
+        pairs = zip(frontiers, translated)
+        for i, (frontier, (translations, _)) in enumerate(pairs):
+            verdicts: list = []
+            for translation in translations:
+                verdict = None
+                if cache is not None:
+                    verdict = cache.peek(translation, frontier.examples, mode)
+                if verdict is None:
+                    batch.append((translation, frontier.examples))
+                    owners.append((i, len(verdicts)))
+                verdicts.append(verdict)
+            all_verdicts.append(verdicts)
+
+        for (i, j), verdict in zip(owners, verifier.verify(batch)):
+            all_verdicts[i][j] = verdict
+
+        return [
+            (translations, verdicts)
+            for (translations, _), verdicts in zip(translated, all_verdicts)
+        ]
+
+    @classmethod
+    def _shards(cls, count: int, jobs: int) -> List[range]:
+        shard_size = max(1, count // (4 * jobs))
+        return [range(i, min(i + shard_size, count))
+                for i in range(0, count, shard_size)]
+
+    @classmethod
+    def _unfinished(cls, programs: list, verdicts: list) -> bool:
+        return len(verdicts) < len(programs) and VALID not in verdicts
@@ -0,0 +1,399 @@
+"""Optimize translated Python programs on their abstract syntax tree."""
+
+import ast
+import copy
+import sys
+from typing import Dict, List, Optional, Union
+
+from lapspython.types import ParsedProgram
+
+if sys.version_info < (3, 8):
+    _LEGACY_CONSTANTS: tuple = (ast.Str, ast.Num, ast.NameConstant)
+else:
+    _LEGACY_CONSTANTS = ()
+
+# Folded values longer than this are left unfolded to keep the code small.
+MAX_FOLDED_LENGTH = 256
+
+
+def is_literal(node: ast.AST) -> bool:
+    """Test whether node is a constant or a tuple of constants.
+
+    List displays are not literals, since copies of a mutable value are
+    distinct objects.
+    """
+    if isinstance(node, (ast.Constant,) + _LEGACY_CONSTANTS):
+        return True
+    if isinstance(node, ast.Tuple):
+        return all(is_literal(element) for element in node.elts)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return is_literal(node.operand)
+    return False
+
+
+def to_literal(value) -> ast.expr:
+    """Convert a folded value into a constant or a tuple display.
+
+    :raises ValueError: If the value has no literal representation.
+    """
+    if isinstance(value, tuple):
+        return ast.Tuple(elts=[to_literal(v) for v in value], ctx=ast.Load())
+    if isinstance(value, (str, int, bool)) or value is None:
+        return ast.Constant(value=value)
+    raise ValueError(f'{type(value).__name__} is not a literal.')
+
+
+def is_total(node: ast.AST) -> bool:
+    """Test whether an expression of a well-typed program cannot fail.
+
+    Such expressions contain no calls and raise no exceptions, so unused
+    results can be dropped.
+    """
+    if is_literal(node) or isinstance(node, (ast.Name, ast.Lambda)):
+        return True
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return all(is_total(element) for element in node.elts)
+    if isinstance(node, ast.JoinedStr):
+        return all(is_total(value) for value in node.values)
+    if isinstance(node, ast.FormattedValue):
+        return node.format_spec is None and is_total(node.value)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        return is_total(node.left) and is_total(node.right)
+    return False
+
+
+class ConstantFolder(ast.NodeTransformer):
+    """Evaluate pure operations on literals bottom-up.
+
+    Concatenations, subscripts, f-strings and str.join() of literals are
+    replaced by their values, and conditional expressions with a literal
+    test by the chosen branch. Calls of primitives and their dependencies
+    are not folded, since they might not terminate. Operations raising an
+    exception are kept, so that the translation fails as before.
+    """
+
+    def __init__(self) -> None:
+        """Start counting folded expressions."""
+        self.folded = 0
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:  # noqa: N802
+        """Fold concatenation of literals."""
+        self.generic_visit(node)
+        if not isinstance(node.op, ast.Add):
+            return node
+        return self._fold(node, [node.left, node.right])
+
+    def visit_Subscript(self, node: ast.Subscript) -> ast.AST:  # noqa: N802
+        """Fold index or slice of a literal."""
+        self.generic_visit(node)
+        index: ast.AST = node.slice
+        if sys.version_info < (3, 9) and isinstance(index, ast.Index):
+            index = index.value
+        if isinstance(index, ast.Slice):
+            bounds = (index.lower, index.upper, index.step)
+            parts: list = [p for p in bounds if p is not None]
+        else:
+            parts = [index]
+        return self._fold(node, [node.value] + parts)
+
+    def visit_JoinedStr(self, node: ast.JoinedStr) -> ast.AST:  # noqa: N802
+        """Fold f-string with literal fields."""
+        self.generic_visit(node)
+        parts = []
+        for value in node.values:
+            if not isinstance(value, ast.FormattedValue):
+                parts.append(value)
+            elif value.format_spec is None:
+                parts.append(value.value)
+            else:
+                return node
+        return self._fold(node, parts)
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:  # noqa: N802
+        """Fold str.join() of a literal separator and list."""
+        self.generic_visit(node)
+        function = node.func
+        if not isinstance(function, ast.Attribute) or function.attr != 'join':
+            return node
+        if len(node.args) != 1 or node.keywords:
+            return node
+        return self._fold(node, [function.value, node.args[0]])
+
+    def visit_IfExp(self, node: ast.IfExp) -> ast.AST:  # noqa: N802
+        """Replace conditional expression with a literal test by a branch."""
+        self.generic_visit(node)
+        if not is_literal(node.test):
+            return node
+        try:
+            test = self._evaluate(node.test)
+        except Exception:
+            return node
+        self.folded += 1
+        if test:
+            return node.body
+        return node.orelse
+
+    def _fold(self, node: ast.expr, operands: list) -> ast.AST:
+        if not all(is_literal(operand) for operand in operands):
+            return node
+        try:
+            value = self._evaluate(node)
+            if len(value) > MAX_FOLDED_LENGTH:
+                return node
+            literal = to_literal(value)
+        except Exception:
+            return node
+        self.folded += 1
+        return ast.copy_location(literal, node)
+
+    @staticmethod
+    def _evaluate(node: ast.expr):
+        expression = ast.fix_missing_locations(ast.Expression(body=node))
+        code = compile(expression, '<fold>', 'eval')
+        return eval(code, {'__builtins__': {}})  # noqa: S307
+
+
+class _UseCounter(ast.NodeVisitor):
+    """Record the statements loading and assigning each variable.
+
+    Loads inside lambda functions, comprehensions or conditionally evaluated
+    operands are marked as guarded, since inlining an expression there would
+    change how often it is evaluated. Only the first iterable of a
+    comprehension is evaluated once.
+    """
+
+    def __init__(self) -> None:
+        self.uses: Dict[str, List[tuple]] = {}
+        self.stores: Dict[str, List[int]] = {}
+        self.statement = 0
+        self.guarded = 0
+
+    def count(self, statements: list) -> Dict[str, List[tuple]]:
+        for index, statement in enumerate(statements):
+            self.statement = index
+            self.visit(statement)
+        return self.uses
+
+    def visit_Name(self, node: ast.Name) -> None:  # noqa: N802
+        if isinstance(node.ctx, ast.Load):
+            use = (self.statement, self.guarded > 0)
+            self.uses.setdefault(node.id, []).append(use)
+        else:
+            self.stores.setdefault(node.id, []).append(self.statement)
+
+    def visit_Lambda(self, node: ast.Lambda) -> None:  # noqa: N802
+        self._visit_guarded([node.body])
+
+    def visit_IfExp(self, node: ast.IfExp) -> None:  # noqa: N802
+        self.visit(node.test)
+        self._visit_guarded([node.body, node.orelse])
+
+    def visit_ListComp(self, node: ast.ListComp) -> None:  # noqa: N802
+        self._visit_comprehension(node, [node.elt])
+
+    def visit_SetComp(self, node: ast.SetComp) -> None:  # noqa: N802
+        self._visit_comprehension(node, [node.elt])
+
+    def visit_GeneratorExp(  # noqa: N802
+        self,
+        node: ast.GeneratorExp
+    ) -> None:
+        self._visit_comprehension(node, [node.elt])
+
+    def visit_DictComp(self, node: ast.DictComp) -> None:  # noqa: N802
+        self._visit_comprehension(node, [node.key, node.value])
+
+    def visit_BoolOp(self, node: ast.BoolOp) -> None:  # noqa: N802
+        self.visit(node.values[0])
+        self._visit_guarded(node.values[1:])
+
+    def _visit_comprehension(
+        self,
+        node: Union[ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp],
+        elements: list
+    ) -> None:
+        first, *others = node.generators
+        self.visit(first.iter)
+        guarded = [first.target] + first.ifs + elements
+        for generator in others:
+            guarded += [generator.target, generator.iter] + generator.ifs
+        self._visit_guarded(guarded)
+
+    def _visit_guarded(self, nodes: list) -> None:
+        self.guarded += 1
+        for node in nodes:
+            self.visit(node)
+        self.guarded -= 1
+
+
+class _Substituter(ast.NodeTransformer):
+    """Replace loads of variables by their expressions.
+
+    Literals may be used several times and are copied, other expressions
+    are only substituted for their single use.
+    """
+
+    def __init__(self, expressions: Dict[str, ast.expr]) -> None:
+        self.expressions = expressions
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:  # noqa: N802
+        expression = self.expressions.get(node.id)
+        if expression is None or not isinstance(node.ctx, ast.Load):
+            return node
+        if is_literal(expression):
+            expression = copy.deepcopy(expression)
+        return ast.copy_location(expression, node)
+
+
+def _loaded_names(node: ast.AST) -> List[str]:
+    names = []
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load):
+            names.append(child.id)
+    return names
+
+
+def _stored_names(node: ast.AST) -> List[str]:
+    names = []
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and \
+                not isinstance(child.ctx, ast.Load):
+            names.append(child.id)
+    return names
+
+
+class Optimizer:
+    """Simplify the straight-line code emitted by the Translator.
+
+    A forward pass folds constants, propagates variables assigned literals
+    and inlines variables used once before they are assigned again. A
+    backward pass removes assignments
+    whose variables are unused and whose values cannot fail. Variables are
+    never inlined into lambda functions or conditional branches, so every
+    expression is still evaluated once and unconditionally, and
+    translations fail on the same inputs as before. Counters of all
+    optimized translations are kept for reports.
+    """
+
+    def __init__(self) -> None:
+        """Start counting applied optimizations."""
+        self.counts = {'folded': 0, 'propagated': 0, 'inlined': 0,
+                       'eliminated': 0, 'translations': 0}
+
+    def optimize(self, translation: ParsedProgram) -> ParsedProgram:
+        """Return an optimized copy of a Python translation.
+
+        :param translation: Translation of a synthesized program.
+        :type translation: lapspython.types.ParsedProgram
+        :rtype: lapspython.types.ParsedProgram
+        """
+        from lapspython.translation import unparse
+
+        header = f'def {translation.name}({", ".join(translation.args)}):\n'
+        body = ''.join(f'    {line}\n'
+                       for line in translation.source.splitlines())
+        module = ast.parse(header + body)
+        function = module.body[0]
+        if not isinstance(function, ast.FunctionDef):
+            return translation
+
+        function.body = self.optimize_statements(function.body)
+        ast.fix_missing_locations(module)
+
+        optimized = copy.copy(translation)
+        optimized.source = '\n'.join(unparse(s) for s in function.body)
+        optimized.module = module
+        self.counts['translations'] += 1
+        return optimized
+
+    def optimize_statements(self, statements: list) -> list:
+        """Optimize assignments followed by a return statement.
+
+        :param statements: Function body.
+        :type statements: list
+        :returns: Optimized function body.
+        :rtype: list
+        """
+        counter = _UseCounter()
+        uses = counter.count(statements)
+        stores = counter.stores
+        expressions: Dict[str, ast.expr] = {}
+        substituter = _Substituter(expressions)
+        folder = ConstantFolder()
+        kept = []
+        for index, statement in enumerate(statements):
+            statement = folder.visit(substituter.visit(statement))
+            for stored in _stored_names(statement):
+                expressions.pop(stored, None)
+            name = self._target(statement)
+            if name is None:
+                kept.append(statement)
+                continue
+            value = statement.value
+            later = [store for store in stores[name] if store > index]
+            end = min(later, default=len(statements))
+            live = [use for use in uses.get(name, [])
+                    if index < use[0] <= end]
+            if is_literal(value):
+                expressions[name] = value
+                self.counts['propagated'] += 1
+            elif self._is_inlinable(value, live, stores, index):
+                expressions[name] = value
+                self.counts['inlined'] += 1
+            else:
+                kept.append(statement)
+        self.counts['folded'] += folder.folded
+        return self._eliminate(kept)
+
+    def _eliminate(self, statements: list) -> list:
+        counts: Dict[str, int] = {}
+        for statement in statements:
+            for loaded in _loaded_names(statement):
+                counts[loaded] = counts.get(loaded, 0) + 1
+
+        kept = []
+        for statement in reversed(statements):
+            name = self._target(statement)
+            unused = name is not None and counts.get(name, 0) == 0
+            if unused and is_total(statement.value):
+                for loaded in _loaded_names(statement.value):
+                    counts[loaded] -= 1
+                self.counts['eliminated'] += 1
+                continue
+            kept.append(statement)
+        return kept[::-1]
+
+    @staticmethod
+    def _target(statement: ast.stmt) -> Optional[str]:
+        """Return the variable assigned by a simple assignment."""
+        if not isinstance(statement, ast.Assign):
+            return None
+        if len(statement.targets) != 1:
+            return None
+        target = statement.targets[0]
+        if not isinstance(target, ast.Name):
+            return None
+        return target.id
+
+    @staticmethod
+    def _is_inlinable(value: ast.expr, uses: List[tuple],
+                      stores: Dict[str, List[int]], index: int) -> bool:
+        """Test whether an expression can be moved to its single use.
+
+        The expression must not be moved past an assignment of a variable
+        it loads, since it would then see the new value.
+        """
+        if len(uses) != 1:
+            return False
+        use, guarded = uses[0]
+        if guarded:
+            return False
+        between = range(index + 1, use)
+        return not any(store in between
+                       for loaded in _loaded_names(value)
+                       for store in stores.get(loaded, []))
+
+    def __str__(self) -> str:
+        """Return counts of applied optimizations as table."""
+        return '\n'.join(f'{key}\t{value}'
+                         for key, value in self.counts.items())
@@ -1,11 +1,81 @@
 """Pipe all necessary steps to extract, translate and store programs."""
 
-from dreamcoder.dreamcoder import ECResult
-from lapspython.extraction import GrammarParser, ProgramExtractor
+import concurrent.futures
+import contextlib
+import itertools
+import multiprocessing
+import os
+from typing import TYPE_CHECKING, Dict, Iterator, Optional, Sequence
+
+from lapspython.extraction import (GrammarParser, GrammarSnapshot,
+                                   ProgramExtractor)
+from lapspython.profiling import Profiler
 from lapspython.stats import Statistics
 from lapspython.translation import Translator
-from lapspython.types import CompactResult
-from lapspython.utils import json_dump, json_read, load_checkpoint
+from lapspython.types import CompactResult, ParsedGrammar
+from lapspython.utils import (ResultsStore, json_dump, json_read,
+                              list_checkpoints, load_checkpoint)
+from lapspython.verification import VerificationCache, VerifierPool
+
+if TYPE_CHECKING:
+    from dreamcoder.dreamcoder import ECResult
+
+# Primitives parsed by Pipeline.from_directory() per domain and mode. They are
+# parsed before the worker processes are forked, which inherit them.
+_PRIMITIVES: Dict[tuple, dict] = {}
+
+
+def _translate_checkpoint(name: str, modes: list, options: dict) -> list:
+    """Translate one checkpoint of a batch in all modes.
+
+    :param name: Checkpoint name in checkpoints directory.
+    :type name: str
+    :param modes: Modes to translate the checkpoint in.
+    :type modes: list
+    :param options: Keyword arguments of Pipeline.extract_translate().
+    :type options: dict
+    :returns: Task name and best results per HIT frontier for each mode.
+    :rtype: list
+    """
+    print(f'Loading checkpoint {name}...', end=' ')
+    result = load_checkpoint(name, lazy=True, light=True)
+    print('Done\n')
+    grammar = result.grammars[-1]
+    domain = Pipeline.domain(grammar)
+
+    records_per_mode = []
+    for mode in modes:
+        compact_result = Pipeline.extract_translate(
+            result, f'{name}_{mode}', mode, verbose=False, snapshot=name,
+            primitives=_PRIMITIVES.get((domain, mode)), **options
+        )
+        records = []
+        for frontier in compact_result.hit_frontiers.values():
+            record = {'name': frontier.name}
+            record.update(frontier.get_best())
+            records.append(record)
+        records_per_mode.append(records)
+    return records_per_mode
+
+
+def _count_level(args: tuple, returned: None) -> int:
+    """Count inventions translated by GrammarParser._translate_level()."""
+    return len(args[1])
+
+
+def _count_verified(args: tuple, returned: list) -> int:
+    """Count translations verified by ProgramExtractor._verify_sandboxed()."""
+    return sum(len(verdicts) for _, verdicts in returned)
+
+
+# Methods whose calls Pipeline.extract_translate() records as nested stages,
+# with functions counting the items of each call.
+PROFILED_METHODS = (
+    (GrammarParser, '_translate_level', 'invention translation',
+     _count_level),
+    (ProgramExtractor, 'verify_translation', 'verification', None),
+    (ProgramExtractor, '_verify_sandboxed', 'verification', _count_verified)
+)
 
 
 class Pipeline:
@@ -14,10 +84,19 @@ class Pipeline:
     @classmethod
     def extract_translate(
         cls,
-        result: ECResult,
+        result: 'ECResult',
         json_path: str = '',
         mode: str = 'python',
-        verbose: bool = True
+        verbose: bool = True,
+        jobs: int = 1,
+        timeout: float = 0.0,
+        use_cache: bool = False,
+        policy: str = 'all',
+        top_k: int = 1,
+        snapshot: str = '',
+        profiler: Profiler = None,
+        primitives: dict = None,
+        save: bool = True
     ) -> CompactResult:
         """Extract and translate programs from a LAPS result.
 
@@ -25,6 +104,30 @@ class Pipeline:
         :type result: dreamcoder.dreamcoder.ECResult
         :param json_path: Path to dump or read from json.
         :type json_path: string
+        :param jobs: Number of worker processes used for translation.
+        :type jobs: int
+        :param timeout: CPU seconds per example, verify in sandbox if > 0.
+        :type timeout: float
+        :param use_cache: Whether to reuse verdicts of previous runs, stored
+            next to the checkpoint named by snapshot.
+        :type use_cache: bool
+        :param policy: Translate 'all' programs per task, stop at the
+            'first-valid' one, or only translate the 'top-k' programs.
+        :type policy: str
+        :param top_k: Number of programs per task for policy 'top-k'.
+        :type top_k: int
+        :param snapshot: Checkpoint name to store the parsed grammar for, so
+            that parsing is skipped if neither grammar nor primitives change.
+            Snapshots are only used with use_cache.
+        :type snapshot: str
+        :param profiler: Records the pipeline stages, printed if verbose.
+        :type profiler: lapspython.profiling.Profiler, optional
+        :param primitives: (name, parsed primitive) dictionary to reuse
+            instead of parsing the primitives again.
+        :type primitives: dict, optional
+        :param save: Whether to write the verification cache and grammar
+            snapshot, otherwise they are only read.
+        :type save: bool
         :returns: Extracted and translated programs
         :rtype: lapspython.types.CompactResult
         """
@@ -35,25 +138,36 @@ class Pipeline:
         print(f'Language Mode: {mode.upper()}')
         if mode == 'r':
             print('WARNING: Code verification for R not implemented')
-        print('\nParsing library...', flush=True)
-        parser = GrammarParser(result.grammars[-1], mode)
+        if profiler is None:
+            profiler = Profiler(enabled=False)
 
-        json = json_read(json_path)
-        if json != {}:
-            new_invented = json['grammar'].invented
-            parser.fix_invented(new_invented)
-        grammar = parser.parsed_grammar
+        with cls._instrumented(profiler):
+            print('\nParsing library...', flush=True)
+            with profiler.stage('grammar parse') as stage:
+                grammar = cls._parse_grammar(result, mode, jobs, use_cache,
+                                             snapshot, json_path, primitives,
+                                             save)
+                stage.items = len(grammar.primitives) + len(grammar.invented)
 
-        print('\nTranslating synthesized programs...', flush=True)
-        translator = Translator(grammar)
-        extractor = ProgramExtractor(result, translator)
-        result = extractor.compact_result
+            print('\nTranslating synthesized programs...', flush=True)
+            with profiler.stage('program translation') as stage:
+                directory = os.path.join('checkpoints',
+                                         os.path.dirname(snapshot))
+                result = cls._translate(result, grammar, jobs, timeout,
+                                        use_cache, directory, policy, top_k,
+                                        save)
+                hits = result.hit_frontiers.values()
+                stage.items = sum(len(frontier.verdicts) for frontier in hits)
 
         if json_path != '':
             print(f'\nSaving results to {json_path}...', end=' ')
-            json_dump(json_path, grammar, extractor.compact_result)
+            with profiler.stage('JSON dump', len(result.hit_frontiers)):
+                json_dump(json_path, grammar, result)
         print('Done')
 
+        if profiler.enabled and verbose:
+            print(f'\nProfile:\n{profiler}')
+
         if not verbose:
             return result
 
@@ -62,6 +176,7 @@ class Pipeline:
             stats = Statistics(result)
             print(stats)
             stats.plot_histogram(result)
+            stats.print_failure_rates(result)
 
         print(f'\nSampling 1 {"valid "*(mode == "python")}translation:')
         sample = result.sample()
@@ -74,32 +189,238 @@ class Pipeline:
 
         return result
 
+    @classmethod
+    @contextlib.contextmanager
+    def _instrumented(cls, profiler: Profiler) -> Iterator[None]:
+        """Record calls of PROFILED_METHODS as nested stages."""
+        with contextlib.ExitStack() as stack:
+            for owner, attribute, name, count in PROFILED_METHODS:
+                stack.enter_context(profiler.instrumented(owner, attribute,
+                                                          name, count))
+            yield
+
+    @classmethod
+    def _parse_grammar(cls, result: 'ECResult', mode: str, jobs: int,
+                       use_cache: bool, snapshot: str, json_path: str,
+                       primitives: Optional[dict],
+                       save: bool) -> ParsedGrammar:
+        """Parse or load grammar and apply invented primitives from JSON."""
+        parser = GrammarParser(mode=mode, jobs=jobs)
+        grammar_snapshot = None
+        parsed_grammar = None
+        if use_cache and snapshot != '':
+            grammar_snapshot = GrammarSnapshot(snapshot, mode)
+            parsed_grammar = grammar_snapshot.load(result.grammars[-1])
+        if parsed_grammar is None:
+            previous = None
+            if primitives is not None:
+                previous = ParsedGrammar(primitives, {}, mode)
+            parser.parse(result.grammars[-1], previous)
+            if grammar_snapshot is not None and save:
+                grammar_snapshot.save(result.grammars[-1],
+                                      parser.parsed_grammar)
+        else:
+            print('Reusing parsed grammar snapshot')
+            parser.parsed_grammar = parsed_grammar
+
+        json = json_read(json_path)
+        if json != {}:
+            new_invented = json['grammar'].invented
+            parser.fix_invented(new_invented)
+        return parser.parsed_grammar
+
+    @classmethod
+    def _translate(cls, result: 'ECResult', grammar: ParsedGrammar, jobs: int,
+                   timeout: float, use_cache: bool, directory: str,
+                   policy: str, top_k: int, save: bool) -> CompactResult:
+        """Extract, translate and verify programs."""
+        translator = Translator(grammar)
+        verifier = cache = None
+        if timeout > 0 and grammar.mode == 'python':
+            verifier = VerifierPool(jobs, timeout)
+        if use_cache and grammar.mode == 'python':
+            cache = VerificationCache(directory=directory)
+        try:
+            extractor = ProgramExtractor(result, translator, jobs, verifier,
+                                         cache, policy, top_k)
+        finally:
+            if verifier is not None:
+                verifier.close()
+
+        if cache is not None:
+            if save:
+                cache.save()
+            print(f'Verification cache: {cache.hits} hits, '
+                  f'{cache.misses} misses')
+        return extractor.compact_result
+
     @classmethod
     def from_checkpoint(
         cls,
         filepath: str,
         mode='python',
         verbose=True,
-        save=True
+        save=True,
+        jobs=1,
+        timeout=0.0,
+        use_cache=True,
+        policy='all',
+        top_k=1,
+        profiler=None,
+        primitives=None
     ) -> CompactResult:
         """Load checkpoint, then extract and translate.
 
+        Checkpoints converted by lapspython.utils.convert_checkpoint() are
+        loaded lazily, so only the sections needed for extraction are
+        deserialized.
+
         :param filepath: Checkpoint name in checkpoints directory.
         :type filepath: str
         :param mode: Translate to 'python' or 'r'.
         :type mode: str
         :param verbose: Whether to print statistics and sample translations.
         :type verbose: bool
-        :param save: Whether to save the results in a JSON file.
+        :param save: Whether to save the results in a JSON file, the
+            verification cache and the parsed grammar snapshot.
         :type save: bool
+        :param jobs: Number of worker processes used for translation.
+        :type jobs: int
+        :param timeout: CPU seconds per example, verify in sandbox if > 0.
+        :type timeout: float
+        :param use_cache: Whether to reuse verdicts and the parsed grammar
+            of previous runs.
+        :type use_cache: bool
+        :param policy: 'all', 'first-valid' or 'top-k'.
+        :type policy: str
+        :param top_k: Number of programs per task for policy 'top-k'.
+        :type top_k: int
+        :param profiler: Records the pipeline stages, printed if verbose.
+            Sections of lazily loaded checkpoints are loaded in later stages.
+        :type profiler: lapspython.profiling.Profiler, optional
+        :param primitives: Parsed primitives to reuse, see extract_translate.
+        :type primitives: dict, optional
         :returns: Extracted and translated programs
         :rtype: lapspython.types.CompactResult
         """
+        if profiler is None:
+            profiler = Profiler(enabled=False)
         print(f'Loading checkpoint {filepath}...', end=' ')
-        result = load_checkpoint(filepath)
+        with profiler.stage('checkpoint load'):
+            result = load_checkpoint(filepath, lazy=True, light=True)
         print('Done\n')
         if save:
             json_path = f'{filepath}_{mode.lower()}'
         else:
             json_path = ''
-        return cls.extract_translate(result, json_path, mode, verbose)
+        return cls.extract_translate(
+            result, json_path, mode, verbose, jobs, timeout, use_cache,
+            policy, top_k, filepath, profiler, primitives, save
+        )
+
+    @classmethod
+    def from_directory(
+        cls,
+        directory='',
+        modes: Sequence[str] = ('python', 'r'),
+        jobs=1,
+        timeout=0.0,
+        use_cache=True,
+        policy='all',
+        top_k=1,
+        store=''
+    ) -> ResultsStore:
+        """Translate all checkpoints of a folder concurrently in all modes.
+
+        Each checkpoint is translated in all modes by one worker process.
+        Primitives are parsed once per domain and mode before the workers
+        are forked, which inherit them. They are not parsed for checkpoints
+        whose grammar snapshots are current. Each checkpoint is saved in its
+        own JSON file as in from_checkpoint(), and the best results of all
+        checkpoints are merged into one ResultsStore.
+
+        :param directory: Folder inside checkpoints directory.
+        :type directory: str
+        :param modes: Modes to translate each checkpoint in.
+        :type modes: Sequence[str]
+        :param jobs: Number of checkpoints translated at the same time.
+        :type jobs: int
+        :param timeout: CPU seconds per example, verify in sandbox if > 0.
+        :type timeout: float
+        :param use_cache: Whether to reuse verdicts and the parsed grammar
+            of previous runs.
+        :type use_cache: bool
+        :param policy: 'all', 'first-valid' or 'top-k'.
+        :type policy: str
+        :param top_k: Number of programs per task for policy 'top-k'.
+        :type top_k: int
+        :param store: Name of the results store in checkpoints directory,
+            defaults to 'results' inside directory.
+        :type store: str
+        :returns: The updated and saved results store.
+        :rtype: lapspython.utils.ResultsStore
+        """
+        modes = [mode.lower() for mode in modes]
+        if not set(modes) <= {'python', 'r'}:
+            raise ValueError('mode must be "Python" or "R".')
+        if jobs < 1:
+            raise ValueError('jobs must be a positive integer.')
+        if store == '':
+            store = os.path.join(directory, 'results')
+
+        names = list_checkpoints(directory)
+        cls._parse_primitives(names, modes, use_cache)
+        options = {'jobs': 1, 'timeout': timeout, 'use_cache': use_cache,
+                   'policy': policy, 'top_k': top_k}
+        if jobs == 1 or len(names) <= 1:
+            results = [_translate_checkpoint(name, modes, options)
+                       for name in names]
+        else:
+            context = multiprocessing.get_context('fork')
+            with concurrent.futures.ProcessPoolExecutor(
+                    min(jobs, len(names)), context) as executor:
+                results = list(executor.map(
+                    _translate_checkpoint, names, itertools.repeat(modes),
+                    itertools.repeat(options)))
+
+        results_store = ResultsStore(store)
+        for name, records_per_mode in zip(names, results):
+            for mode, records in zip(modes, records_per_mode):
+                added = results_store.add(name, mode, records)
+                print(f'{name} ({mode}): {len(records)} tasks, {added} new '
+                      f'results')
+        results_store.save()
+        print(f'Saved {len(results_store)} results to {results_store.path}')
+        return results_store
+
+    @classmethod
+    def _parse_primitives(cls, names: list, modes: list,
+                          use_cache: bool) -> None:
+        """Parse primitives into _PRIMITIVES unless snapshots are current."""
+        for name in names:
+            result = load_checkpoint(name, lazy=True, light=True)
+            grammar = result.grammars[-1]
+            domain = cls.domain(grammar)
+            for mode in modes:
+                snapshot = GrammarSnapshot(name, mode)
+                if use_cache and snapshot.is_current(grammar):
+                    continue
+                parser = GrammarParser(mode=mode)
+                _PRIMITIVES[(domain, mode)] = parser.parse_primitives(
+                    grammar, _PRIMITIVES.get((domain, mode)))
+
+    @classmethod
+    def domain(cls, grammar) -> tuple:
+        """Return names of the modules implementing primitives of grammar.
+
+        Checkpoints with the same domain share their parsed primitives.
+
+        :param grammar: A grammar induced by LAPS.
+        :type grammar: dreamcoder.grammar.Grammar
+        :rtype: tuple
+        """
+        modules = {getattr(primitive.value, '__module__', None)
+                   for primitive in grammar.primitives
+                   if not primitive.isInvented}
+        modules.discard(None)
+        return tuple(sorted(modules))
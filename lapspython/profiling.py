@@ -0,0 +1,319 @@
+"""Profile pipeline stages and time translator methods."""
+
+import contextlib
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterator, List
+
+
+def _cpu_seconds() -> float:
+    """Return CPU time of this process and its terminated children."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _peak_rss() -> int:
+    """Return peak resident set size of this process in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak
+    return peak * 1024
+
+
+class Stage:
+    """Measurements of one execution of a pipeline stage."""
+
+    def __init__(self, name: str, start: float, items: int = 0) -> None:
+        """Start measuring a stage.
+
+        :param name: Stage name, e.g. 'grammar parse'.
+        :type name: str
+        :param start: Seconds since the start of the profiler.
+        :type start: float
+        :param items: Number of processed items, can be updated later.
+        :type items: int, optional
+        """
+        self.name = name
+        self.start = start
+        self.items = items
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_rss = 0
+
+
+class _Patch:
+    """Original of a patched method and the recorders of its wrapper."""
+
+    def __init__(self, original: object) -> None:
+        self.original = original
+        self.recorders: List[Callable] = []
+
+
+# Patched methods by (owner, attribute). The list of recorders of a patch is
+# replaced instead of modified, so wrappers can iterate it without the lock.
+_PATCHES: Dict[tuple, _Patch] = {}
+_PATCH_LOCK = threading.Lock()
+
+
+def _record_call(record: Callable, function: Callable, *args, **kwargs):
+    return record(function, args, kwargs)
+
+
+def _wrap(function: Callable, patch: _Patch) -> Callable:
+    """Return function calling each record(function, args, kwargs) of patch.
+
+    Recorders registered later are nested inside earlier ones.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        call = function
+        for record in reversed(patch.recorders):
+            call = functools.partial(_record_call, record, call)
+        return call(*args, **kwargs)
+    return wrapper
+
+
+@contextlib.contextmanager
+def _patched(owner: type, attribute: str,
+             record: Callable) -> Iterator[None]:
+    """Replace a method of owner by a recording wrapper while in context.
+
+    Class and static methods are wrapped without their descriptor and
+    rewrapped, so the replacement behaves like the original method. The
+    method is patched process-wide, so calls from all threads are recorded.
+    Overlapping contexts share one wrapper calling all their recorders, and
+    the original is restored when the last of them exits, in any order.
+    """
+    key = (owner, attribute)
+    with _PATCH_LOCK:
+        patch = _PATCHES.get(key)
+        if patch is None:
+            original = owner.__dict__[attribute]
+            patch = _Patch(original)
+            wrapped: object
+            if isinstance(original, (classmethod, staticmethod)):
+                wrapped = type(original)(_wrap(original.__func__, patch))
+            else:
+                wrapped = _wrap(original, patch)
+            setattr(owner, attribute, wrapped)
+            _PATCHES[key] = patch
+        patch.recorders = patch.recorders + [record]
+    try:
+        yield
+    finally:
+        with _PATCH_LOCK:
+            patch.recorders = [r for r in patch.recorders if r is not record]
+            if len(patch.recorders) == 0:
+                setattr(owner, attribute, patch.original)
+                del _PATCHES[key]
+
+
+class Profiler:
+    """Record wall time, CPU time, peak RSS and item counts per stage.
+
+    Stages may be nested, the measurements of a stage include its nested
+    stages. CPU time includes worker processes once they are terminated.
+    Stages executed inside forked worker processes are not recorded.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        """Start clock of the profiler.
+
+        :param enabled: Whether to record stages. A disabled profiler can be
+            passed instead of None and does not patch any methods.
+        :type enabled: bool, optional
+        """
+        self.enabled = enabled
+        self.stages: List[Stage] = []
+        self.origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, items: int = 0) -> Iterator[Stage]:
+        """Measure the code executed inside the context as one stage.
+
+        :param name: Stage name, e.g. 'grammar parse'.
+        :type name: str
+        :param items: Number of processed items, can also be set on the
+            yielded stage.
+        :type items: int, optional
+        :rtype: Iterator[Stage]
+        """
+        start = time.perf_counter()
+        stage = Stage(name, start - self.origin, items)
+        if not self.enabled:
+            yield stage
+            return
+
+        cpu = _cpu_seconds()
+        try:
+            yield stage
+        finally:
+            stage.wall = time.perf_counter() - start
+            stage.cpu = _cpu_seconds() - cpu
+            stage.peak_rss = _peak_rss()
+            self.stages.append(stage)
+
+    @contextlib.contextmanager
+    def instrumented(self, owner: type, attribute: str, name: str,
+                     count: Callable = None) -> Iterator[None]:
+        """Record each call of a method as a stage while in context.
+
+        The method is patched process-wide, so calls of all threads are
+        recorded, and other profilers or timers may patch it at the same
+        time.
+
+        :param owner: Class defining the method.
+        :type owner: type
+        :param attribute: Method name.
+        :type attribute: str
+        :param name: Stage name of each call.
+        :type name: str
+        :param count: Function of the positional arguments and the return
+            value counting the items of a call, else each call is one item.
+        :type count: Callable, optional
+        """
+        if not self.enabled:
+            yield
+            return
+
+        def record(function, args, kwargs):
+            with self.stage(name, 1) as stage:
+                returned = function(*args, **kwargs)
+                if count is not None:
+                    stage.items = count(args, returned)
+                return returned
+
+        with _patched(owner, attribute, record):
+            yield
+
+    def summary(self) -> List[dict]:
+        """Aggregate stages of the same name in order of first execution.
+
+        :returns: A dictionary with name, start of first call, calls, wall,
+            cpu, peak_rss and items per stage name.
+        :rtype: List[dict]
+        """
+        rows: Dict[str, dict] = {}
+        for stage in self.stages:
+            row = rows.setdefault(stage.name, {
+                'name': stage.name, 'start': stage.start, 'calls': 0,
+                'wall': 0.0, 'cpu': 0.0, 'peak_rss': 0, 'items': 0
+            })
+            row['start'] = min(row['start'], stage.start)
+            row['calls'] += 1
+            row['wall'] += stage.wall
+            row['cpu'] += stage.cpu
+            row['peak_rss'] = max(row['peak_rss'], stage.peak_rss)
+            row['items'] += stage.items
+        return sorted(rows.values(), key=lambda row: row['start'])
+
+    def __str__(self) -> str:
+        """Return summary as table."""
+        lines = ['stage\tcalls\twall (s)\tCPU (s)\tpeak RSS (MiB)\titems']
+        for row in self.summary():
+            lines.append(f'{row["name"]}\t{row["calls"]}\t{row["wall"]:.3f}'
+                         f'\t{row["cpu"]:.3f}\t{row["peak_rss"] / 2**20:.1f}'
+                         f'\t{row["items"]}')
+        return '\n'.join(lines)
+
+    def trace_events(self) -> List[dict]:
+        """Return stages as complete events of the Chrome trace format.
+
+        :rtype: List[dict]
+        """
+        pid = os.getpid()
+        return [{
+            'name': stage.name,
+            'ph': 'X',
+            'ts': stage.start * 1e6,
+            'dur': stage.wall * 1e6,
+            'pid': pid,
+            'tid': pid,
+            'args': {
+                'cpu (s)': stage.cpu,
+                'peak RSS (bytes)': stage.peak_rss,
+                'items': stage.items
+            }
+        } for stage in self.stages]
+
+    def dump_trace(self, path: str) -> None:
+        """Write stages to JSON file viewable in chrome://tracing.
+
+        :param path: Path of JSON file.
+        :type path: str
+        """
+        with open(path, 'w') as json_file:
+            json.dump({'traceEvents': self.trace_events()}, json_file)
+
+
+class MethodTimers:
+    """Count calls and accumulate time of methods while enabled.
+
+    The methods are only wrapped while enabled, so disabled timers have no
+    overhead at all. Time of recursive or nested calls is counted for every
+    timed method on the call stack. Methods are patched process-wide, calls
+    of all threads are timed, but concurrent updates of the counters are
+    not synchronized.
+    """
+
+    def __init__(self, owner: type, attributes: tuple) -> None:
+        """Prepare timers for methods of a class.
+
+        :param owner: Class defining the methods, e.g. Translator.
+        :type owner: type
+        :param attributes: Method names, e.g. Translator.TIMED_METHODS.
+        :type attributes: tuple
+        """
+        self.owner = owner
+        self.attributes = attributes
+        self.calls = {attribute: 0 for attribute in attributes}
+        self.seconds = {attribute: 0.0 for attribute in attributes}
+        self.enabled = False
+        self._stack = contextlib.ExitStack()
+
+    def __enter__(self) -> 'MethodTimers':
+        """Enable timers for use as context manager."""
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Disable timers when leaving context."""
+        self.disable()
+
+    def enable(self) -> None:
+        """Wrap methods with timers, unless already enabled."""
+        if self.enabled:
+            return
+        for attribute in self.attributes:
+            self._stack.enter_context(
+                _patched(self.owner, attribute, self._recorder(attribute)))
+        self.enabled = True
+
+    def disable(self) -> None:
+        """Restore the original methods."""
+        self._stack.close()
+        self.enabled = False
+
+    def _recorder(self, attribute: str) -> Callable:
+        def record(function, args, kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.seconds[attribute] += time.perf_counter() - start
+                self.calls[attribute] += 1
+        return record
+
+    def __str__(self) -> str:
+        """Return calls and seconds per method as table."""
+        lines = ['method\tcalls\ttime (s)']
+        for attribute in self.attributes:
+            lines.append(f'{attribute}\t{self.calls[attribute]}'
+                         f'\t{self.seconds[attribute]:.4f}')
+        return '\n'.join(lines)
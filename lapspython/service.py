@@ -0,0 +1,364 @@
+"""Serve translations from warm grammars over a Unix socket or HTTP.
+
+Start a service for a checkpoint from the repository root:
+
+    python -m lapspython.service re2_test --socket /tmp/lapspython.sock
+    python -m lapspython.service re2_test --port 8080
+
+Requests are JSON objects with a 'program' string and optional 'name',
+'mode' and 'examples', which enable verification for Python. A JSON list of
+such objects is answered by a list of responses. Over the Unix socket, each
+request and response is a single line. Over HTTP, requests are posted to
+/translate, and GET /health reports the number of requests and batches.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import json
+from typing import Dict, List, Optional, Tuple
+
+from dreamcoder.program import Program
+from lapspython.extraction import GrammarParser, GrammarSnapshot
+from lapspython.translation import Translator
+from lapspython.utils import load_checkpoint, parse_program
+from lapspython.verification import VerifierPool
+
+
+class TranslationService:
+    """Translate program strings with warm translators in batches.
+
+    Requests of all connections are queued and translated together in one
+    background thread, so the event loop keeps accepting connections while
+    a batch is translated. Batches are verified at once by the VerifierPool.
+    Without a verifier, requests with examples are refused, since a program
+    that does not terminate would block all later requests.
+    """
+
+    def __init__(
+        self,
+        translators: Dict[str, Translator],
+        batch_size: int = 64,
+        batch_delay: float = 0.002,
+        verifier: VerifierPool = None,
+        max_cache: int = 100000,
+        grammar=None
+    ) -> None:
+        """Store warm translators and batching parameters.
+
+        :param translators: A (mode, Translator) dictionary.
+        :type translators: Dict[str, lapspython.translation.Translator]
+        :param batch_size: Maximum number of requests per batch.
+        :type batch_size: int, optional
+        :param batch_delay: Seconds to wait for further requests once the
+            first request of a batch has arrived.
+        :type batch_delay: float, optional
+        :param verifier: Verifies Python translations in sandboxed processes,
+            else requests with examples are refused.
+        :type verifier: lapspython.verification.VerifierPool, optional
+        :param max_cache: Memoized translations per translator before its
+            cache is cleared.
+        :type max_cache: int, optional
+        :param grammar: Grammar to parse programs with, else primitives are
+            looked up in dreamcoder.program.Primitive.GLOBALS.
+        :type grammar: dreamcoder.grammar.Grammar, optional
+        """
+        if batch_size < 1:
+            raise ValueError('batch_size must be a positive integer.')
+        self.translators = translators
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.verifier = verifier
+        self.max_cache = max_cache
+        self.grammar = grammar
+        self.requests = 0
+        self.batches = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(1)
+
+    @classmethod
+    def from_checkpoint(
+        cls,
+        checkpoint: str,
+        modes: Tuple[str, ...] = ('python',),
+        timeout: float = 1.0,
+        workers: int = 2,
+        **kwargs
+    ) -> 'TranslationService':
+        """Load checkpoint and parse its grammar once per mode.
+
+        Parsed grammars are reused from and stored as snapshots like in
+        lapspython.pipeline.Pipeline.from_checkpoint().
+
+        :param checkpoint: Checkpoint name in checkpoints directory.
+        :type checkpoint: str
+        :param modes: Modes requests can be translated to.
+        :type modes: Tuple[str, ...], optional
+        :param timeout: CPU seconds per example, refuse examples if <= 0.
+        :type timeout: float, optional
+        :param workers: Number of sandboxed verification processes.
+        :type workers: int, optional
+        :param kwargs: Further arguments of the constructor.
+        :rtype: lapspython.service.TranslationService
+        """
+        result = load_checkpoint(checkpoint, lazy=True, light=True)
+        grammar = result.grammars[-1]
+        translators = {}
+        for mode in modes:
+            mode = mode.lower()
+            snapshot = GrammarSnapshot(checkpoint, mode)
+            parsed_grammar = snapshot.load(grammar)
+            if parsed_grammar is None:
+                parsed_grammar = GrammarParser(grammar, mode).parsed_grammar
+                snapshot.save(grammar, parsed_grammar)
+            translators[mode] = Translator(parsed_grammar)
+
+        verifier = None
+        if timeout > 0 and 'python' in translators:
+            verifier = VerifierPool(workers, timeout)
+        return cls(translators, verifier=verifier, grammar=grammar, **kwargs)
+
+    def translate_batch(self, requests: List[dict]) -> List[dict]:
+        """Translate and verify a batch of requests in this thread.
+
+        :param requests: Dictionaries with 'program' and optional 'name',
+            'mode' and 'examples'.
+        :type requests: List[dict]
+        :returns: Dictionaries with 'name', 'mode', 'source' and 'verdict',
+            or 'error' for invalid requests. The verdict is None if the
+            request has no examples or is translated to R.
+        :rtype: List[dict]
+        """
+        responses: List[dict] = []
+        pending = []
+        for request in requests:
+            try:
+                response, translation = self._translate(request)
+            except Exception as error:
+                responses.append({'error': f'{type(error).__name__}: {error}'})
+                continue
+            responses.append(response)
+            examples = request.get('examples')
+            if not examples or response['mode'] != 'python':
+                continue
+            if self.verifier is None:
+                responses[-1] = {'error': 'ValueError: Examples cannot be '
+                                 'verified without a timeout.'}
+                continue
+            pending.append((len(responses) - 1, translation, examples))
+
+        verdicts = []
+        if self.verifier is not None and pending:
+            batch = [(translation, examples)
+                     for _, translation, examples in pending]
+            verdicts = self.verifier.verify(batch)
+        for (index, _, _), verdict in zip(pending, verdicts):
+            responses[index]['verdict'] = verdict
+
+        for translator in self.translators.values():
+            if len(translator.translation_cache) > self.max_cache:
+                translator.translation_cache.clear()
+        return responses
+
+    def _translate(self, request: dict) -> tuple:
+        if not isinstance(request, dict) or 'program' not in request:
+            raise ValueError('Request must be an object with a program.')
+        mode = request.get('mode', 'python').lower()
+        if mode not in self.translators:
+            raise ValueError(f'Mode {mode} is not served.')
+        name = request.get('name', 'f')
+        if self.grammar is None:
+            program = Program.parse(request['program'])
+        else:
+            program = parse_program(request['program'], self.grammar)
+        translation = self.translators[mode].translate(program, name)
+        response = {'name': name, 'mode': mode, 'source': str(translation),
+                    'verdict': None}
+        return response, translation
+
+    async def submit(self, request: dict) -> dict:
+        """Queue a request for the next batch and await its response.
+
+        :param request: See translate_batch().
+        :type request: dict
+        :rtype: dict
+        """
+        if self._queue is None:
+            raise RuntimeError('Service is not started.')
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((request, future))
+        self.requests += 1
+        return await future
+
+    async def handle_payload(self, payload):
+        """Answer a request or a list of requests.
+
+        :param payload: Decoded JSON object or list of objects.
+        :returns: Response or list of responses.
+        """
+        if isinstance(payload, list):
+            return list(await asyncio.gather(*map(self.submit, payload)))
+        return await self.submit(payload)
+
+    async def _batch_loop(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            await asyncio.sleep(self.batch_delay)
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            requests = [request for request, _ in batch]
+            try:
+                responses = await loop.run_in_executor(
+                    self._executor, self.translate_batch, requests)
+            except Exception as error:
+                responses = [{'error': f'{type(error).__name__}: {error}'}]
+                responses *= len(batch)
+            self.batches += 1
+            for (_, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+
+    async def _handle_lines(self, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    payload = json.loads(line)
+                except ValueError as error:
+                    response = {'error': f'Invalid JSON: {error}'}
+                else:
+                    response = await self.handle_payload(payload)
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _handle_http(self, reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter) -> None:
+        try:
+            with contextlib.suppress(ValueError, asyncio.IncompleteReadError):
+                while await self._answer_http(reader, writer):
+                    pass
+        finally:
+            writer.close()
+
+    async def _answer_http(self, reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter) -> bool:
+        """Answer one HTTP request, return whether to keep connection."""
+        request_line = await reader.readline()
+        if not request_line:
+            return False
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line.strip() == b'':
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', '0'))
+        body = await reader.readexactly(length)
+
+        status, response = await self._route(request_line, body)
+        data = json.dumps(response).encode('utf-8')
+        writer.write(f'HTTP/1.1 {status}\r\n'
+                     f'Content-Type: application/json\r\n'
+                     f'Content-Length: {len(data)}\r\n\r\n'
+                     .encode('latin-1') + data)
+        await writer.drain()
+        return headers.get('connection', '').lower() != 'close'
+
+    async def _route(self, request_line: bytes, body: bytes) -> tuple:
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3:
+            return '400 Bad Request', {'error': 'Invalid request line.'}
+        method, path, _ = parts
+        if (method, path) == ('GET', '/health'):
+            return '200 OK', {'modes': sorted(self.translators),
+                              'requests': self.requests,
+                              'batches': self.batches}
+        if (method, path) != ('POST', '/translate'):
+            return '404 Not Found', {'error': f'No route {method} {path}.'}
+        try:
+            payload = json.loads(body)
+        except ValueError as error:
+            return '400 Bad Request', {'error': f'Invalid JSON: {error}'}
+        return '200 OK', await self.handle_payload(payload)
+
+    async def start(self, socket_path: str = '', port: int = 0,
+                    host: str = '127.0.0.1') -> list:
+        """Start batching and listening on the given addresses.
+
+        :param socket_path: Path of Unix socket, not served if empty.
+        :type socket_path: str, optional
+        :param port: TCP port for HTTP, not served if 0.
+        :type port: int, optional
+        :param host: Host for HTTP, only local connections by default.
+        :type host: str, optional
+        :returns: The started asyncio servers.
+        :rtype: list
+        """
+        if socket_path == '' and port == 0:
+            raise ValueError('Either socket_path or port must be given.')
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.ensure_future(self._batch_loop(self._queue))
+        servers = []
+        if socket_path != '':
+            servers.append(await asyncio.start_unix_server(
+                self._handle_lines, socket_path))
+        if port != 0:
+            servers.append(await asyncio.start_server(
+                self._handle_http, host, port))
+        return servers
+
+    async def serve(self, socket_path: str = '', port: int = 0,
+                    host: str = '127.0.0.1') -> None:
+        """Serve requests until cancelled, see start()."""
+        servers = await self.start(socket_path, port, host)
+        try:
+            await asyncio.gather(*(server.serve_forever()
+                                   for server in servers))
+        finally:
+            for server in servers:
+                server.close()
+
+    def close(self) -> None:
+        """Stop translating thread and verification processes."""
+        self._executor.shutdown()
+        if self.verifier is not None:
+            self.verifier.close()
+
+
+def main() -> None:
+    """Parse arguments and serve translations until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('checkpoint')
+    parser.add_argument('--socket', default='', help='Unix socket path.')
+    parser.add_argument('--port', type=int, default=0, help='HTTP port.')
+    parser.add_argument('--modes', nargs='+', default=['python', 'r'])
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--batch-delay', type=float, default=0.002)
+    parser.add_argument('--timeout', type=float, default=1.0,
+                        help='CPU seconds per example, 0 refuses examples.')
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    service = TranslationService.from_checkpoint(
+        args.checkpoint, tuple(args.modes), args.timeout, args.workers,
+        batch_size=args.batch_size, batch_delay=args.batch_delay
+    )
+    print(f'Serving {args.checkpoint} in modes {", ".join(args.modes)}')
+    try:
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(service.serve(args.socket, args.port))
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
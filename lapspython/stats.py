@@ -1,12 +1,19 @@
 """Collect statistics for program translations."""
 
-from typing import List
+from typing import List, Optional
 
 import numpy as np
-import uniplot
-from scipy import stats
 
+from dreamcoder.utilities import parseSExpression
 from lapspython.types import CompactFrontier, CompactResult
+from lapspython.verification import VALID
+
+# Columns of Statistics.build_table() and Statistics.failure_rates().
+TABLE_DTYPE = np.dtype([('task', object), ('programs', np.int64),
+                        ('valid', np.int64), ('failed', np.int64),
+                        ('timed_out', np.int64)])
+RATES_DTYPE = np.dtype([('component', object), ('attempts', np.int64),
+                        ('failures', np.int64), ('rate', np.float64)])
 
 
 class Statistics:
@@ -21,6 +28,8 @@ class Statistics:
         :type result: CompactResult, optional
         """
         self.stats = {}
+        self.result: Optional[CompactResult] = None
+        self.table = np.array([], dtype=TABLE_DTYPE)
 
         if result is not None:
             self.summarize(result)
@@ -37,12 +46,17 @@ class Statistics:
         :returns: Descriptive statistics.
         :rtype: dict
         """
-        program_count = self.count_programs(result)
-        self.stats.update({'programs': program_count})
-        translation_count = self.count_translations(result)
-        self.stats.update({'translations': translation_count})
+        table = self.get_table(result)
+        attempted = self.attempted(table)
+        programs = table['programs'].sum()
+        self.stats.update({'programs': int(programs)})
+        self.stats.update({'translations': int(table['valid'].sum())})
+        skipped_count = programs - attempted.sum()
+        self.stats.update({'translations (skipped)': int(skipped_count)})
+
+        from scipy import stats
 
-        percentages = self.percentages_result(result)
+        percentages = self.percentages(table)
         n_obs, minmax, mean, var, skew, kurtosis = stats.describe(percentages)
         self.stats.update({'tasks (total)': n_obs})
         self.stats.update({'tasks (solved)': np.count_nonzero(percentages)})
@@ -52,6 +66,8 @@ class Statistics:
         self.stats.update({'mean\t(%)': mean})
         self.stats.update({'std\t(%)': np.sqrt(var)})
 
+        self.stats.update(result.counters)
+
         return self.stats
 
     def plot_histogram(self, result: CompactResult) -> None:
@@ -60,9 +76,82 @@ class Statistics:
         :param result: Translated checkpoint.
         :type result: CompactResult
         """
-        percentages = self.percentages_result(result)
+        import uniplot
+
+        percentages = self.percentages(self.get_table(result))
         uniplot.histogram(percentages)
 
+    def print_failure_rates(self, result: CompactResult,
+                            top: int = 5) -> None:
+        """Print components with the highest translation failure rates.
+
+        :param result: Translated checkpoint.
+        :type result: CompactResult
+        :param top: Maximum number of components printed per kind.
+        :type top: int, optional
+        """
+        for invented, kind in ((False, 'Primitives'), (True, 'Inventions')):
+            rates = self.failure_rates(result, invented)
+            failing = rates[rates['failures'] > 0][:top]
+            if len(failing) == 0:
+                continue
+            print(f'{kind} with failed translations:')
+            for component, attempts, _, rate in failing:
+                print(f'{component}:\t{rate * 100:.1f}% of {attempts}')
+
+    def build_table(self, result: CompactResult) -> np.ndarray:
+        """Count programs and translations of all HIT frontiers in one pass.
+
+        :param result: Translated checkpoint.
+        :type result: lapspython.types.CompactResult
+        :returns: Structured array with columns task, programs, valid,
+            failed and timed_out, one row per HIT frontier.
+        :rtype: np.ndarray
+        """
+        rows = [(frontier.name, len(frontier.program_strings),
+                 len(frontier.translations), len(frontier.failed),
+                 len(frontier.timed_out))
+                for frontier in result.hit_frontiers.values()]
+        return np.array(rows, dtype=TABLE_DTYPE)
+
+    def get_table(self, result: CompactResult) -> np.ndarray:
+        """Return table of result, built only once per result.
+
+        :param result: Translated checkpoint.
+        :type result: lapspython.types.CompactResult
+        :rtype: np.ndarray
+        """
+        if self.result is not result:
+            self.table = self.build_table(result)
+            self.result = result
+        return self.table
+
+    @classmethod
+    def attempted(cls, table: np.ndarray) -> np.ndarray:
+        """Return number of translated programs per row of table.
+
+        :param table: Table built by build_table().
+        :type table: np.ndarray
+        :rtype: np.ndarray
+        """
+        return table['valid'] + table['failed'] + table['timed_out']
+
+    @classmethod
+    def percentages(cls, table: np.ndarray) -> np.ndarray:
+        """Return percentage of correct translations per row of table.
+
+        Skipped programs are excluded since they were never translated.
+        Rows without translated programs count as 0 %, so that every HIT
+        frontier is one task as if all its programs had been translated.
+
+        :param table: Table built by build_table().
+        :type table: np.ndarray
+        :rtype: np.ndarray
+        """
+        attempted = cls.attempted(table)
+        denominator = np.where(attempted > 0, attempted, table['programs'])
+        return table['valid'] / denominator * 100
+
     def count_programs(self, result: CompactResult) -> int:
         """Count totals number of programs across all tasks.
 
@@ -70,10 +159,7 @@ class Statistics:
         :type result: lapspython.types.CompactResult
         :rtype: int
         """
-        program_count: int = 0
-        for frontier in result.hit_frontiers.values():
-            program_count += len(frontier.programs)
-        return program_count
+        return int(self.get_table(result)['programs'].sum())
 
     def count_translations(self, result: CompactResult) -> int:
         """Count total number of correct translations across all tasks.
@@ -82,10 +168,17 @@ class Statistics:
         :type result: lapspython.types.CompactResult
         :rtype: int
         """
-        translation_count: int = 0
-        for frontier in result.hit_frontiers.values():
-            translation_count += len(frontier.translations)
-        return translation_count
+        return int(self.get_table(result)['valid'].sum())
+
+    def count_skipped(self, result: CompactResult) -> int:
+        """Count programs not translated due to the extraction policy.
+
+        :param result: Translated checkpoint.
+        :type result: lapspython.types.CompactResult
+        :rtype: int
+        """
+        table = self.get_table(result)
+        return int(table['programs'].sum() - self.attempted(table).sum())
 
     def percentages_result(self, result: CompactResult) -> List[float]:
         """Return percentage of correctly translated programs per frontier.
@@ -94,16 +187,92 @@ class Statistics:
         :type result: lapspython.types.CompactResult
         :rtype: List[float]
         """
-        percentages: list = []
+        return self.percentages(self.get_table(result)).tolist()
+
+    def failure_rates(self, result: CompactResult,
+                      invented: bool = False) -> np.ndarray:
+        """Return how often translations using a component fail.
+
+        A translation that is invalid or timed out counts as failure of every
+        primitive or invented primitive used in its program. The primitives
+        inside an invented primitive are not counted.
+
+        :param result: Translated checkpoint.
+        :type result: lapspython.types.CompactResult
+        :param invented: Whether to count invented primitives instead of
+            primitives.
+        :type invented: bool, optional
+        :returns: Structured array with columns component, attempts, failures
+            and rate, sorted by descending failure rate.
+        :rtype: np.ndarray
+        """
+        indices: dict = {}
+        components = []
+        failures = []
         for frontier in result.hit_frontiers.values():
-            percentages.append(self.percentage_frontier(frontier))
-        return percentages
+            for program, verdict in zip(frontier.program_strings,
+                                        frontier.verdicts):
+                for name in self.components(program, invented):
+                    components.append(indices.setdefault(name, len(indices)))
+                    failures.append(verdict != VALID)
+
+        rates = np.zeros(len(indices), dtype=RATES_DTYPE)
+        rates['component'] = list(indices)
+        rates['attempts'] = np.bincount(components, minlength=len(indices))
+        rates['failures'] = np.bincount(components, weights=failures,
+                                        minlength=len(indices))
+        rates['rate'] = rates['failures'] / rates['attempts']
+        return rates[np.argsort(-rates['rate'], kind='stable')]
+
+    @classmethod
+    def components(cls, program: str, invented: bool) -> set:
+        """Return names of the primitives or invented primitives of program.
+
+        The program string is parsed into an S-expression, so no grammar is
+        needed. Invented primitives are named as in str(program).
+
+        :param program: A synthesized program as returned by str(program).
+        :type program: str
+        :param invented: Whether to return invented primitives.
+        :type invented: bool
+        :rtype: set
+        """
+        names = set()
+        expressions = [parseSExpression(program)]
+        while expressions:
+            expression = expressions.pop()
+            if isinstance(expression, str):
+                if not invented and expression != 'lambda' and \
+                        not expression.startswith('$'):
+                    names.add(expression)
+            elif expression[0] == '#':
+                if invented:
+                    names.add(cls._show(expression))
+            else:
+                expressions.extend(expression)
+        return names
+
+    @classmethod
+    def _show(cls, expression) -> str:
+        if isinstance(expression, str):
+            return expression
+        if expression[0] == '#':
+            return f'#{cls._show(expression[1])}'
+        return f'({" ".join(cls._show(e) for e in expression)})'
 
     def percentage_frontier(self, frontier: CompactFrontier) -> float:
         """Return percentage of correctly translated programs.
 
+        Skipped programs are excluded since they were never translated.
+        Frontiers without translated programs count as 0 % as in
+        percentages().
+
         :param result: Translated frontier (task).
         :type result: lapspython.types.CompactFrontier
         :rtype: float
         """
-        return len(frontier.translations) / len(frontier.programs) * 100
+        skipped = len(frontier.skipped)
+        attempted = len(frontier.program_strings) - skipped
+        if attempted == 0:
+            return 0.0
+        return len(frontier.translations) / attempted * 100
@@ -1,25 +1,108 @@
 """Implements functions for translation from lambda calculus to Python."""
 
+import ast
+import copy
 import logging
 import re
 import traceback
 
 from dreamcoder.program import (Abstraction, Application, Index, Invented,
                                 Primitive, Program)
+from lapspython.optimization import Optimizer
 from lapspython.types import (ParsedGrammar, ParsedProgram, ParsedProgramBase,
-                              ParsedRProgram, ParsedType)
+                              ParsedRProgram, ParsedType, assign)
+
+
+def unparse(node: ast.AST) -> str:
+    """Convert abstract syntax tree to source code.
+
+    Uses ast.unparse on Python 3.9+ and falls back to astor otherwise.
+
+    :param node: Abstract syntax tree.
+    :type node: ast.AST
+    :rtype: string
+    """
+    ast_unparse = getattr(ast, 'unparse', None)
+    if ast_unparse is not None:
+        return ast_unparse(node)
+    try:
+        import astor
+    except ImportError:  # pragma: no cover
+        raise ImportError('The ast backend requires Python 3.9+ or astor.')
+    return astor.to_source(node).strip()
+
+
+class ArgumentRenamer(ast.NodeTransformer):
+    """Rename all arguments matching a pattern in a single pass."""
+
+    def __init__(self, pattern: str, new_name: str) -> None:
+        """Store pattern of argument names and their new name.
+
+        :param pattern: Regular expression matching entire argument names.
+        :type pattern: string
+        :param new_name: Name replacing all matching arguments.
+        :type new_name: string
+        """
+        self.pattern = re.compile(pattern)
+        self.new_name = new_name
+
+    def visit_Name(self, node: ast.Name) -> ast.Name:  # noqa: N802
+        """Rename argument if it matches the pattern."""
+        if self.pattern.fullmatch(node.id):
+            return ast.Name(id=self.new_name, ctx=node.ctx)
+        return node
 
 
 class Translator:
     """Translate lambda programs to Python code."""
 
-    def __init__(self, grammar: ParsedGrammar) -> None:
+    # Hot paths timed by lapspython.profiling.MethodTimers.
+    TIMED_METHODS = ('translate', '_translate', '_resolve', '_build_module',
+                     '_translate_invented', '_translate_primitive_f',
+                     '_optimize')
+
+    def __init__(
+        self,
+        grammar: ParsedGrammar,
+        memoize: bool = True,
+        backend: str = 'string',
+        optimize: bool = False,
+        share: bool = True
+    ) -> None:
         """Init grammar used for translation and empty containers.
 
+        The 'string' backend builds code by string concatenation and regex
+        substitution. The 'ast' backend instantiates pre-parsed templates of
+        the primitives and builds an ast.Module, it only supports Python and
+        is about half as fast, so only use it if the module is needed.
+        Python translations can be simplified by an optimization pass, see
+        lapspython.optimization.Optimizer.
+
+        If sharing is enabled, identical applications without side effects
+        are translated and executed once and reuse the variable of their
+        first occurrence afterwards. Only the function body assigns
+        variables, so applications in lambda functions are only shared if
+        they contain no de Bruijn index.
+
         :param grammar: Grammar used for translation
         :type grammar: lapspython.types.ParsedGrammar
+        :param memoize: Whether to reuse translations of identical programs
+        :type memoize: bool, optional
+        :param backend: Code generation backend, 'string' or 'ast'
+        :type backend: string, optional
+        :param optimize: Whether to optimize Python translations
+        :type optimize: bool, optional
+        :param share: Whether to share common subexpressions
+        :type share: bool, optional
         """
         self.mode = grammar.mode
+        self.backend = backend.lower()
+        if self.backend not in ('string', 'ast'):
+            raise ValueError('backend must be "string" or "ast".')
+        if self.backend == 'ast' and self.mode != 'python':
+            raise ValueError('The ast backend only supports mode "python".')
+        if optimize and self.mode != 'python':
+            raise ValueError('Optimization only supports mode "python".')
 
         if self.mode == 'python':
             self.sep = ' = '
@@ -35,6 +118,20 @@ class Translator:
         self.dependencies: set = set()
         self.debug_stack: list = []
         self.logger = self.setup_logger()
+        self.memoize = memoize
+        self.translation_cache: dict = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.optimizer = None
+        if optimize:
+            self.optimizer = Optimizer()
+        self.share = share
+        self.subexpressions: dict = {}
+        self.lambda_depth = 0
+        self.purity: dict = {}
+        self.side_effects = 0
+        self.shared_subexpressions = 0
+        self.saved_statements = 0
 
     def setup_logger(self) -> logging.Logger:
         """Set up a logger for exceptions caught during translation.
@@ -54,13 +151,19 @@ class Translator:
         for entry in self.debug_stack:
             self.logger.debug(entry)
         if len(self.code) > 0:
-            code = '\n'.join(self.code)
+            if self.backend == 'ast':
+                code = '\n'.join(unparse(s) for row in self.code for s in row)
+            else:
+                code = '\n'.join(self.code)
             self.logger.debug(f'\n{code}')
         self.logger.debug(f'\n{traceback.format_exc()}\n')
 
     def translate(self, program: Program, name: str) -> ParsedProgramBase:
         """Translate a synthesized program under the current grammar.
 
+        If memoization is enabled, programs are looked up by their structural
+        hash first. A hit only renames the previous translation.
+
         :param program: Abstraction/Invented at any depth of lambda expression
         :type program: subclass of dreamcoder.program.Program
         :param name: Task/Function name
@@ -68,6 +171,47 @@ class Translator:
         :returns: Translated program
         :rtype: ParsedProgram
         """
+        if not self.memoize:
+            return self._optimize(self._translate(program, name))
+
+        cached = self.translation_cache.get(program)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached.rename(name)
+
+        self.cache_misses += 1
+        translation = self._optimize(self._translate(program, name))
+        self.translation_cache[program] = translation
+        return translation
+
+    def report(self) -> dict:
+        """Return counters of memoized and shared translations.
+
+        Saved statements are the assignments not emitted because an earlier
+        subexpression was shared.
+
+        :returns: (description, count) dictionary
+        :rtype: dict
+        """
+        return {
+            'cache hits': self.cache_hits,
+            'cache misses': self.cache_misses,
+            'shared subexpressions': self.shared_subexpressions,
+            'saved statements': self.saved_statements
+        }
+
+    def _optimize(self, translation: ParsedProgramBase) -> ParsedProgramBase:
+        if self.optimizer is None:
+            return translation
+        if not isinstance(translation, ParsedProgram):
+            return translation
+        try:
+            return self.optimizer.optimize(translation)
+        except SyntaxError:
+            self.log_exception()
+            return translation
+
+    def _translate(self, program: Program, name: str) -> ParsedProgramBase:
         for call in self.call_counts:
             self.call_counts[call] = 0
         self.code = []
@@ -79,9 +223,14 @@ class Translator:
         self.dependencies = set()
         self.name = name
         self.debug_stack = []
+        self.subexpressions = {}
+        self.lambda_depth = 0
 
         self.translate_wrapper(program)
 
+        if self.backend == 'ast':
+            return self._build_module(name)
+
         source = '\n'.join(self.code)
 
         if self.mode == 'python':
@@ -106,6 +255,60 @@ class Translator:
             self.dependencies
         )
 
+    def _build_module(self, name: str) -> ParsedProgram:
+        statements = [statement for row in self.code for statement in row]
+        for i in reversed(range(len(statements))):
+            if isinstance(statements[i], ast.Assign):
+                statements[i] = ast.Return(value=statements[i].value)
+                break
+
+        module = ast.parse(f'def {name}({", ".join(self.args)}):\n    pass')
+        function = module.body[0]
+        if isinstance(function, ast.FunctionDef) and statements:
+            function.body = statements
+        ast.fix_missing_locations(module)
+
+        source = '\n'.join(unparse(statement) for statement in statements)
+        translation = ParsedProgram(
+            name,
+            source,
+            self.args,
+            self.imports,
+            self.dependencies
+        )
+        translation.module = module
+        return translation
+
+    def _literal(self, value):
+        if self.backend == 'ast':
+            return ast.Constant(value=str(value))
+        return f"'{value}'"
+
+    def _variable(self, name: str):
+        if self.backend == 'ast':
+            return ast.Name(id=name, ctx=ast.Load())
+        return name
+
+    def _lambda(self, parameter: str, body):
+        if self.backend == 'ast':
+            expression = ast.parse(f'lambda {parameter}: None', mode='eval')
+            function = expression.body
+            if isinstance(function, ast.Lambda):
+                function.body = body
+            return function
+        return f'lambda {parameter}: {body}'
+
+    def _resolve(self, f_parsed: ParsedType, x_args: list, name: str):
+        try:
+            if self.backend == 'ast':
+                return f_parsed.resolve_variables_ast(x_args, name)
+            return f_parsed.resolve_variables(x_args, name)
+        except ValueError:
+            self.log_exception()
+            if self.backend == 'ast':
+                return [assign(name, ast.Constant(value=None))]
+            return f'{name} = None'
+
     def translate_wrapper(self, program: Program, node_type: str = 'body'):
         """Redirect node to corresponding translation procedure.
 
@@ -122,9 +325,7 @@ class Translator:
         if program.isApplication:
             if node_type == 'f':
                 return self._translate_application_f(program)
-            if node_type == 'x':
-                return self._translate_application_x(program)
-            return self._translate_application_body(program)
+            return self._translate_shared(program, node_type)
         if program.isIndex:
             return self._translate_index(program)
         if program.isInvented:
@@ -141,11 +342,16 @@ class Translator:
 
     def _translate_abstraction_body(self, abstraction: Abstraction) -> tuple:
         parsed, args = self.translate_wrapper(abstraction.body)
-        args = [f'lambda x: {args[0]}']
+        args = [self._lambda('x', args[0])]
         return parsed, args
 
     def _translate_abstraction_x(self, abstraction: Abstraction) -> tuple:
+        self.lambda_depth += 1
         parsed, args = self.translate_wrapper(abstraction.body)
+        self.lambda_depth -= 1
+
+        if self.backend == 'ast':
+            return self._translate_abstraction_x_ast(abstraction, parsed, args)
 
         try:
             lambda_head = ''
@@ -164,6 +370,18 @@ class Translator:
         except IndexError:
             return '# ERROR', ['# ERROR']
 
+    def _translate_abstraction_x_ast(self, abstraction: Abstraction,
+                                     parsed, args: list) -> tuple:
+        if not self.contains_index(abstraction) or len(self.code) == 0:
+            return parsed, [self._lambda('lx', args[0])]
+
+        last_statement = self.code[-1][-1]
+        if not isinstance(last_statement, ast.Assign):
+            return '# ERROR', [self._variable('ERROR')]
+        body = copy.deepcopy(last_statement.value)
+        body = ArgumentRenamer(r'arg\d+', 'lx').visit(body)
+        return parsed, [self._lambda('lx', body)]
+
     def _translate_application_f(self, application: Application) -> tuple:
         f = application.f
         x = application.x
@@ -173,6 +391,38 @@ class Translator:
 
         return f_parsed, f_args + x_args
 
+    def _translate_shared(self, application: Application,
+                          node_type: str) -> tuple:
+        if node_type == 'x':
+            translate = self._translate_application_x
+        else:
+            translate = self._translate_application_body
+        if not self.share:
+            return translate(application)
+        # Subexpressions of lambda functions are assigned outside of them,
+        # so their variables cannot depend on the lambda's argument.
+        if self.lambda_depth > 0 and self.contains_index(application):
+            return translate(application)
+
+        key = (node_type, application)
+        shared = self.subexpressions.get(key)
+        if shared is not None:
+            parsed, name, statements = shared
+            self.shared_subexpressions += 1
+            self.saved_statements += statements
+            return parsed, [self._variable(name)]
+
+        start = len(self.code)
+        side_effects = self.side_effects
+        parsed, args = translate(application)
+        if self.side_effects > side_effects:
+            return parsed, args
+        name = self.get_last_variable()
+        if len(self.code) > start and self._variable_name(args[0]) == name:
+            statements = len(self.code) - start
+            self.subexpressions[key] = (parsed, name, statements)
+        return parsed, args
+
     def _translate_application_x(self, application: Application) -> tuple:
         f = application.f
         x = application.x
@@ -180,10 +430,10 @@ class Translator:
         x_parsed, x_args = self.translate_wrapper(x, 'x')
         f_parsed, f_args = self.translate_wrapper(f, 'f')
 
-        if x_args[-1][:3] == 'arg' and x_args[-1] not in self.args:
+        if self.is_unbound_arg(x_args[-1]):
             new_x_arg = self.get_last_variable()
             if new_x_arg != 'x':
-                x_args[-1] = new_x_arg
+                x_args[-1] = self._variable(new_x_arg)
 
         if not f.isInvented:
             x_args = f_args + x_args
@@ -191,13 +441,8 @@ class Translator:
         if not f.isIndex:
             self.call_counts[f_parsed.handle] += 1
             name = f'{f_parsed.name}_{self.call_counts[f_parsed.handle]}'
-            try:
-                f_parsed_resolved = f_parsed.resolve_variables(x_args, name)
-            except ValueError:
-                self.log_exception()
-                f_parsed_resolved = f'{name} = None'
-            self.code.append(f_parsed_resolved)
-            x_args = name
+            self.code.append(self._resolve(f_parsed, x_args, name))
+            x_args = self._variable(name)
 
         return f_parsed, [x_args]
 
@@ -217,28 +462,22 @@ class Translator:
         for i in range(missing_args):
             new_arg = f'arg{i + 1}'
             if new_arg in self.args:
-                x_args.append(new_arg)
+                x_args.append(self._variable(new_arg))
 
-        try:
-            f_parsed_resolved = f_parsed.resolve_variables(x_args, name)
-        except ValueError:
-            self.log_exception()
-            f_parsed_resolved = f'{name} = None'
-
-        self.code.append(f_parsed_resolved)
+        self.code.append(self._resolve(f_parsed, x_args, name))
 
-        return None, [name]
+        return None, [self._variable(name)]
 
     def _translate_index(self, index: Index) -> tuple:
         arg = f'arg{index.i + 1}'
         f_parsed = f'lambda lx: {arg}'
-        return f_parsed, [arg]
+        return f_parsed, [self._variable(arg)]
 
     def _translate_invented(self, invented: Invented) -> tuple:
         handle = str(invented)
         f_parsed = self.grammar.invented[handle]
         if f_parsed.source == '':
-            translator = Translator(self.grammar)
+            translator = Translator(self.grammar, backend=self.backend)
             f_trans = translator.translate(f_parsed.program, f_parsed.name)
             f_parsed.source = f_trans.source
             f_parsed.args = f_trans.args
@@ -246,22 +485,26 @@ class Translator:
         self.imports.update(f_parsed.imports)
         self.dependencies.update(f_parsed.dependencies)
         self.dependencies.add(str(f_parsed))
+        if not self.is_pure(invented):
+            self.side_effects += 1
         name = f'{f_parsed.name}_{self.call_counts[handle]}'
-        x_args = [name]
+        x_args = [self._variable(name)]
 
         return f_parsed, x_args
 
     def _translate_primitive_f(self, primitive: Primitive) -> tuple:
-        parsed = self.grammar.primitives[primitive.name].resolve_lambdas()
+        parsed = self.grammar.primitives[primitive.name]
         self.imports.update(parsed.imports)
         self.dependencies.update(parsed.dependencies)
+        if not self.is_pure(primitive):
+            self.side_effects += 1
         return parsed, []
 
     def _translate_primitive_x(self, primitive: Primitive) -> tuple:
-        return None, [f"'{primitive.value}'"]
+        return None, [self._literal(primitive.value)]
 
     def _translate_primitive_body(self, primitive: Primitive) -> tuple:
-        return None, [f"'{primitive.value}'"]
+        return None, [self._literal(primitive.value)]
 
     def contains_index(self, program: Program) -> bool:
         """Test whether the subprogram contains a de Bruijin index."""
@@ -276,8 +519,50 @@ class Translator:
             x = self.contains_index(program.x)
             return (f or x)
 
+    def is_pure(self, program: Program) -> bool:
+        """Test whether the subprogram only calls pure primitives."""
+        if program.isApplication:
+            return self.is_pure(program.f) and self.is_pure(program.x)
+        if program.isAbstraction:
+            return self.is_pure(program.body)
+        if program.isIndex:
+            return True
+
+        pure = self.purity.get(program)
+        if pure is None:
+            if program.isInvented:
+                pure = self.is_pure(program.body)
+            else:
+                primitive = self.grammar.primitives.get(program.name)
+                pure = primitive is not None and primitive.is_pure()
+            self.purity[program] = pure
+        return pure
+
+    def is_unbound_arg(self, x_arg) -> bool:
+        """Test whether argument refers to a variable of an outer lambda."""
+        if self.backend == 'ast':
+            if not isinstance(x_arg, ast.Name):
+                return False
+            x_arg = x_arg.id
+        return x_arg[:3] == 'arg' and x_arg not in self.args
+
+    def _variable_name(self, x_arg) -> str:
+        if isinstance(x_arg, ast.Name):
+            return x_arg.id
+        if isinstance(x_arg, str):
+            return x_arg
+        return ''
+
     def get_last_variable(self) -> str:
         """Return the declared variable in the last line of code."""
         if len(self.code) == 0:
             return ''
+        if self.backend == 'ast':
+            last_statement = self.code[-1][-1]
+            if not isinstance(last_statement, ast.Assign):
+                return ''
+            target = last_statement.targets[0]
+            if not isinstance(target, ast.Name):
+                return ''
+            return target.id
         return self.code[-1].split(self.sep)[0]
@@ -1,20 +1,422 @@
 """Implements types for parsed primitives and lambda expressions."""
 
+import ast
 import copy
+import functools
 import inspect
+import os
 import random
 import re
+import sys
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from typing import Callable, Dict, Iterator, List, Optional
 
 from dreamcoder.frontier import Frontier
-from dreamcoder.program import Invented, Primitive
+from dreamcoder.program import Invented, Primitive, Program
 from dreamcoder.type import TypeConstructor, TypeVariable
 
+# Global assignments and calls of R functions with side effects.
+IMPURE_R = re.compile(r'<<-|\b(?:assign|cat|print|message|readline|sample'
+                      r'|runif|rnorm|set\.seed|Sys\.time|write\w*)\s*\(')
+
+
+@functools.lru_cache(maxsize=None)
+def parse_template(source: str) -> list:
+    """Parse source code once into statements shared by all instantiations.
+
+    The returned statements must not be modified, copy them instead.
+
+    :param source: Python source code of a (invented) primitive.
+    :type source: string
+    :rtype: list
+    """
+    return ast.parse(source).body
+
+
+def assign(name: str, value: ast.expr) -> ast.Assign:
+    """Construct a statement assigning value to a variable.
+
+    :param name: Variable name.
+    :type name: string
+    :param value: Expression to assign.
+    :type value: ast.expr
+    :rtype: ast.Assign
+    """
+    target = ast.Name(id=name, ctx=ast.Store())
+    return ast.Assign(targets=[target], value=value)
+
+
+def slot_state(instance) -> dict:
+    """Return the assigned slots of an instance as (name, value) dict.
+
+    :param instance: Instance of a class defining __slots__.
+    :rtype: dict
+    """
+    state = {}
+    for cls in type(instance).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if hasattr(instance, name):
+                state[name] = getattr(instance, name)
+    return state
+
+
+class ModuleIndex:
+    """Members of a primitive module, collected once per grammar parse."""
+
+    def __init__(self, module) -> None:
+        """Index imported modules and helper functions of module.
+
+        :param module: Module defining primitives.
+        :type module: module
+        """
+        self.module = module
+        modules = inspect.getmembers(module, inspect.ismodule)
+        functions = inspect.getmembers(module, inspect.isfunction)
+        self.modules = {name for name, _ in modules}
+        self.helpers = {name: function for name, function in functions
+                        if name[:2] == '__'}
+        self.sources: dict = {}
+
+    @classmethod
+    def lookup(cls, implementation, indices: dict = None) -> 'ModuleIndex':
+        """Return index of the module defining implementation.
+
+        :param implementation: The function referenced by a primitive.
+        :type implementation: function
+        :param indices: (module name, ModuleIndex) dictionary shared by all
+            primitives of a parse, a new index is built if omitted.
+        :type indices: dict, optional
+        :rtype: lapspython.types.ModuleIndex
+        """
+        module = inspect.getmodule(implementation)
+        if indices is None:
+            return cls(module)
+        name = getattr(module, '__name__', None)
+        if name not in indices:
+            indices[name] = cls(module)
+        return indices[name]
+
+    def source(self, function) -> str:
+        """Return source code of function, retrieving it only once.
+
+        :param function: A function defined in the indexed module.
+        :type function: function
+        :rtype: string
+        """
+        if function not in self.sources:
+            self.sources[function] = inspect.getsource(function)
+        return self.sources[function]
+
+    def helper_sources(self) -> list:
+        """Return (name, source) tuples of all helper functions.
+
+        :rtype: list
+        """
+        return [(name, self.source(function))
+                for name, function in self.helpers.items()]
+
+
+class RSourceIndex:
+    """Function definitions and library calls of an R file, read once.
+
+    Indices are cached per path and rebuilt when the file is modified.
+    """
+
+    _cache: Dict[str, 'RSourceIndex'] = {}
+
+    def __init__(self, path: str) -> None:
+        """Read R file and index its top-level definitions in one pass.
+
+        :param path: Path to R source file.
+        :type path: string
+        """
+        with open(path, 'r') as r_file:
+            self.mtime = os.fstat(r_file.fileno()).st_mtime_ns
+            self.lines = r_file.readlines()
+        self.path = path
+        self.libraries: set = set()
+        self.spans: Dict[str, tuple] = {}
+
+        unclosed: list = []
+        for i, line in enumerate(self.lines):
+            self.libraries.update(re.findall(r'library\((.+)\)', line))
+            if line == '}\n':
+                for name in unclosed:
+                    self.spans[name] = (self.spans[name][0], i)
+                unclosed = []
+                continue
+            match = re.match(r'(\S+) <- ', line)
+            if match is None or match[1] in self.spans:
+                continue
+            self.spans[match[1]] = (i, len(self.lines) - 1)
+            if line.endswith('{\n'):
+                unclosed.append(match[1])
+
+    @classmethod
+    def load(cls, path: str) -> 'RSourceIndex':
+        """Return cached index of path unless the file was modified.
+
+        :param path: Path to R source file.
+        :type path: string
+        :rtype: lapspython.types.RSourceIndex
+        """
+        key = os.path.abspath(path)
+        index = cls._cache.get(key)
+        if index is None or index.mtime != os.stat(path).st_mtime_ns:
+            index = cls(path)
+            cls._cache[key] = index
+        return index
+
+    def definition(self, name: str, with_header: bool = False) -> tuple:
+        """Return header line and source code of a top-level definition.
+
+        :param name: Function or variable name.
+        :type name: string
+        :param with_header: Whether to include header and closing brace.
+        :type with_header: bool, optional
+        :returns: (header, source) tuple
+        :rtype: tuple
+        """
+        if name not in self.spans:
+            raise ValueError(f'Cannot find {name} in {self.path}.')
+        start, end = self.spans[name]
+        header = self.lines[start]
+        if not header.endswith('{\n'):
+            return header, header[len(f'{name} <- '):]
+        if with_header:
+            return header, ''.join(self.lines[start:end + 1])
+        return header, ''.join(self.lines[start + 1:end])
+
+
+class SubstitutionPlan:
+    """Source code split into literal segments and argument slots.
+
+    Arguments are matched once as whole words delimited by brackets, commas
+    or spaces, or as f-string fields. A marker in the source denotes the
+    variable name replacing the return statement. Instantiation then only
+    joins segments and arguments.
+    """
+
+    RETURN_MARKER = '\x00'
+
+    def __init__(self, source: str, args: list) -> None:
+        """Split source at all occurrences of arguments and return marker.
+
+        :param source: Source code, possibly containing the return marker.
+        :type source: string
+        :param args: List of argument names.
+        :type args: list
+        """
+        self.segments: List[str] = []
+        self.slots: List[int] = []
+
+        alternatives = [re.escape(self.RETURN_MARKER)]
+        if len(args) > 0:
+            names = '|'.join(re.escape(str(arg)) for arg in args)
+            alternatives.append(fr'(?<=[(\[ ])({names})(?=[, )\[\]]|$)')
+            alternatives.append(fr'\{{({names})\}}')
+        pattern = re.compile('|'.join(alternatives))
+
+        slot_indices = {str(arg): i for i, arg in enumerate(args)}
+        position = 0
+        for match in pattern.finditer(source):
+            self.segments.append(source[position:match.start()])
+            name = match.group(1) or match.group(2)
+            if name is None:
+                self.slots.append(len(args))
+            else:
+                self.slots.append(slot_indices[name])
+            position = match.end()
+        self.segments.append(source[position:])
+
+    def instantiate(self, args: list, return_name: str = '') -> str:
+        """Fill argument slots and the return variable.
+
+        :param args: List of new argument names.
+        :type args: list
+        :param return_name: Variable name filling the return marker.
+        :type return_name: string, optional
+        :rtype: string
+        """
+        values = [str(arg) for arg in args]
+        values.append(return_name)
+        parts = [self.segments[0]]
+        for slot, segment in zip(self.slots, self.segments[1:]):
+            parts.append(values[slot])
+            parts.append(segment)
+        return ''.join(parts)
+
+
+class TemplateInstantiator(ast.NodeTransformer):
+    """Substitute arguments and return statements in a single pass.
+
+    Visited nodes are copied rather than modified, so the shared template
+    stays intact while unchanged leaves and nested functions are reused.
+    """
+
+    def __init__(self, substitutions: dict, return_name: str = '') -> None:
+        """Store substitutions applied when visiting a copied template.
+
+        :param substitutions: (argument name, expression) dictionary.
+        :type substitutions: dict
+        :param return_name: Variable to assign return values to, if any.
+        :type return_name: string, optional
+        """
+        self.substitutions = substitutions
+        self.return_name = return_name
+
+    def generic_visit(self, node: ast.AST) -> ast.AST:
+        """Return a copy of node with visited children."""
+        fields = {}
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, ast.AST):
+                value = self.visit(value)
+            elif isinstance(value, list):
+                value = [self._visit_item(item) for item in value]
+            fields[field] = value
+        return ast.copy_location(type(node)(**fields), node)
+
+    def _visit_item(self, item):
+        if isinstance(item, ast.AST):
+            return self.visit(item)
+        return item
+
+    def visit_Name(self, node: ast.Name) -> ast.expr:  # noqa: N802
+        """Replace loaded argument by its expression."""
+        if isinstance(node.ctx, ast.Load) and node.id in self.substitutions:
+            return self.substitutions[node.id]
+        return node
+
+    def visit_Return(self, node: ast.Return) -> ast.AST:  # noqa: N802
+        """Replace return statement with assignment."""
+        if self.return_name == '' or node.value is None:
+            return self.generic_visit(node)
+        return assign(self.return_name, self.visit(node.value))
+
+    def visit_FunctionDef(  # noqa: N802
+        self,
+        node: ast.FunctionDef
+    ) -> ast.FunctionDef:
+        """Substitute arguments not shadowed by locals of nested function."""
+        names = self.parameters(node.args)
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and \
+                    not isinstance(child.ctx, ast.Load):
+                names.add(child.id)
+        return self._visit_scope(node, names)
+
+    def visit_Lambda(self, node: ast.Lambda) -> ast.Lambda:  # noqa: N802
+        """Substitute arguments not shadowed by nested lambda function."""
+        return self._visit_scope(node, self.parameters(node.args))
+
+    @classmethod
+    def parameters(cls, args: ast.arguments) -> set:
+        """Return names of all parameters of a function.
+
+        :param args: Arguments of a function or lambda function.
+        :type args: ast.arguments
+        :rtype: set
+        """
+        nodes = args.args + args.kwonlyargs
+        nodes += getattr(args, 'posonlyargs', [])
+        nodes += [arg for arg in (args.vararg, args.kwarg) if arg is not None]
+        return {arg.arg for arg in nodes}
+
+    def _visit_scope(self, node, names: set):
+        substitutions = {name: value
+                         for name, value in self.substitutions.items()
+                         if name not in names}
+        if len(substitutions) == 0:
+            return node
+        outer = (self.substitutions, self.return_name)
+        self.substitutions, self.return_name = substitutions, ''
+        try:
+            return self.generic_visit(node)
+        finally:
+            self.substitutions, self.return_name = outer
+
+
+class SideEffectFinder(ast.NodeVisitor):
+    """Detect side effects in the source of a primitive and its helpers.
+
+    Global statements, names of impure built-ins or modules and mutation of
+    function arguments are side effects. Mutating local variables is not.
+    """
+
+    IMPURE_NAMES = frozenset(('print', 'input', 'open', 'exec', 'eval',
+                              'exit', 'setattr', 'delattr', 'random', 'time',
+                              'os', 'sys'))
+    MUTATING_METHODS = frozenset(('append', 'extend', 'insert', 'pop',
+                                  'popitem', 'remove', 'clear', 'sort',
+                                  'reverse', 'update', 'setdefault', 'add',
+                                  'discard'))
+
+    def __init__(self, tree: ast.AST) -> None:
+        """Collect the argument names of all functions in tree.
+
+        :param tree: Parsed source code.
+        :type tree: ast.AST
+        """
+        self.arguments: set = set()
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.Lambda)):
+                self.arguments.update(a.arg for a in node.args.args)
+        self.found = False
+
+    def visit_Global(self, node: ast.Global) -> None:  # noqa: N802
+        """Mark assignments to global variables."""
+        self.found = True
+
+    def visit_Nonlocal(self, node: ast.Nonlocal) -> None:  # noqa: N802
+        """Mark assignments to variables of enclosing functions."""
+        self.found = True
+
+    def visit_Name(self, node: ast.Name) -> None:  # noqa: N802
+        """Mark use of impure built-ins or modules."""
+        if node.id in self.IMPURE_NAMES:
+            self.found = True
+
+    def visit_Call(self, node: ast.Call) -> None:  # noqa: N802
+        """Mark calls of mutating methods on arguments."""
+        function, methods = node.func, self.MUTATING_METHODS
+        if isinstance(function, ast.Attribute) and function.attr in methods:
+            self.found |= self._is_argument(function.value)
+        self.generic_visit(node)
+
+    def visit_Assign(self, node: ast.Assign) -> None:  # noqa: N802
+        """Mark item or attribute assignments to arguments."""
+        for target in node.targets:
+            self._check_target(target)
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> None:  # noqa: N802
+        """Mark in-place operations on arguments, e.g. extending lists."""
+        self.found |= self._is_argument(node.target)
+        self.generic_visit(node)
+
+    def visit_Delete(self, node: ast.Delete) -> None:  # noqa: N802
+        """Mark deletion of items or attributes of arguments."""
+        for target in node.targets:
+            self._check_target(target)
+        self.generic_visit(node)
+
+    def _check_target(self, node: ast.AST) -> None:
+        # Rebinding an argument is harmless, modifying its value is not.
+        if isinstance(node, (ast.Subscript, ast.Attribute)):
+            self.found |= self._is_argument(node)
+
+    def _is_argument(self, node: ast.AST) -> bool:
+        while isinstance(node, (ast.Subscript, ast.Attribute)):
+            node = node.value
+        return isinstance(node, ast.Name) and node.id in self.arguments
+
 
 class ParsedType(ABC):
     """Abstract base class for program parsing."""
 
+    __slots__ = ('name', 'handle', 'source', 'args', 'imports', 'dependencies',
+                 'arg_types', 'return_type')
+
     @abstractmethod
     def __init__(self) -> None:  # pragma: no cover
         """Parse input primitive and initialize members."""
@@ -32,6 +434,15 @@ class ParsedType(ABC):
         """Convert object to clean code."""
         pass
 
+    def __getstate__(self) -> dict:
+        """Return assigned slots for pickling and copying."""
+        return slot_state(self)
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore slots from pickled or copied state."""
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def as_dict(self) -> dict:
         """Return member attributes as dict for json dumping."""
         return {
@@ -72,16 +483,44 @@ class ParsedType(ABC):
             func = f'{self.name}({", ".join(self.args)})'
             raise ValueError(f'Wrong number of arguments for {func}: {args}.')
 
-        new_source = self.source
-        for i in range(len(args)):
-            pattern = fr'(\(|\[| )({self.args[i]})(,| |\)|\[|\]|$)'
-            fstring_pattern = '{' + str(self.args[i]) + '}'
-            repl = fr'\1{args[i]}\3'
-            new_source = re.sub(pattern, repl, new_source)
-            new_source = re.sub(fstring_pattern, str(args[i]), new_source)
-        if return_name != '':
-            return self.replace_return_statement(return_name, new_source)
-        return new_source
+        plans = getattr(self, 'plans', None)
+        if plans is None:
+            plans = self.compile_plans()
+        return plans[return_name != ''].instantiate(args, return_name)
+
+    def compile_plans(self) -> tuple:
+        """Precompute substitution plans without and with return statement.
+
+        :returns: Tuple of two SubstitutionPlan objects
+        :rtype: tuple
+        """
+        marker = SubstitutionPlan.RETURN_MARKER
+        return_source = self.replace_return_statement(marker, self.source)
+        if return_source is None:
+            return_source = self.source
+        return (
+            SubstitutionPlan(self.source, self.args),
+            SubstitutionPlan(return_source, self.args)
+        )
+
+    def resolve_variables_ast(self, args: list, return_name: str) -> list:
+        """Instantiate pre-parsed source with argument expressions.
+
+        :param args: List of argument expressions.
+        :type args: List[ast.expr]
+        :param return_name: Variable name to replace the return statement with
+        :type return_name: string
+        :returns: Statements with substituted arguments
+        :rtype: List[ast.stmt]
+        """
+        if len(args) != len(self.args):
+            func = f'{self.name}({", ".join(self.args)})'
+            raise ValueError(f'Wrong number of arguments for {func}: {args}.')
+
+        instantiator = TemplateInstantiator(dict(zip(self.args, args)),
+                                            return_name)
+        statements = parse_template(self.source)
+        return [instantiator.visit(statement) for statement in statements]
 
     def replace_return_statement(self, return_name, source):
         """Substitute return statement with variable assignment.
@@ -98,6 +537,8 @@ class ParsedType(ABC):
 class ParsedPythonType(ParsedType):
     """Abstract base class for python parsing."""
 
+    __slots__ = ()
+
     def __str__(self) -> str:
         """Construct clean Python function from object.
 
@@ -108,10 +549,33 @@ class ParsedPythonType(ParsedType):
         indented_body = re.sub(r'^', '    ', self.source, flags=re.MULTILINE)
         return header + indented_body + '\n'
 
+    def is_pure(self) -> bool:
+        """Test whether calling the function cannot have side effects.
+
+        Constants are pure. Sources that cannot be parsed are impure.
+
+        :rtype: bool
+        """
+        if len(self.args) == 0:
+            return True
+        # Names of primitives like "if" may be keywords, so rename them.
+        header = f'def function({", ".join(self.args)}):\n'
+        body = re.sub(r'^', '    ', self.source, flags=re.MULTILINE)
+        sources = [header + body] + sorted(self.dependencies)
+        try:
+            tree = ast.parse('\n'.join(sources))
+        except SyntaxError:
+            return False
+        finder = SideEffectFinder(tree)
+        finder.visit(tree)
+        return not finder.found
+
 
 class ParsedRType(ParsedType):
     """Abstract base class for R parsing."""
 
+    __slots__ = ()
+
     def __str__(self) -> str:
         """Return parsed primitive as R code.
 
@@ -122,23 +586,42 @@ class ParsedRType(ParsedType):
         indented_body = re.sub(r'^', '    ', self.source, flags=re.MULTILINE)
         return header + indented_body + '\n}\n'
 
+    def is_pure(self) -> bool:
+        """Test whether calling the function cannot have side effects.
+
+        R passes arguments by value, so only global assignments, I/O and
+        random numbers are side effects.
+
+        :rtype: bool
+        """
+        if len(self.args) == 0:
+            return True
+        sources = [self.source] + sorted(self.dependencies)
+        return IMPURE_R.search('\n'.join(sources)) is None
+
 
 class ParsedPrimitive(ParsedPythonType):
     """Class parsing primitives for translation to clean Python code."""
 
-    def __init__(self, primitive: Primitive) -> None:
+    __slots__ = ('plans',)
+
+    def __init__(self, primitive: Primitive, indices: dict = None) -> None:
         """Construct ParsedPrimitive object with parsed function specs.
 
         :param primitive: A Primitive object
         :type primitive: dreamcoder.program.Primitive
+        :param indices: (module name, ModuleIndex) dictionary shared by all
+            primitives of a parse.
+        :type indices: dict, optional
         """
         implementation = primitive.value
 
         if inspect.isfunction(implementation):
+            index = ModuleIndex.lookup(implementation, indices)
             args = inspect.getfullargspec(implementation).args
-            source = self.parse_source(implementation)
-            imports = self.get_imports(implementation)
-            dependencies = self.get_dependencies(implementation)
+            source = self.parse_source(implementation, index)
+            imports = self.get_imports(implementation, index)
+            dependencies = self.get_dependencies(implementation, index)
         else:
             args = []
             source = implementation
@@ -153,16 +636,22 @@ class ParsedPrimitive(ParsedPythonType):
         self.args = args
         self.arg_types = self.parse_argument_types(primitive.tp)
         self.return_type = self.arg_types.pop()
+        self.plans = self.compile_plans()
 
-    def parse_source(self, implementation) -> str:
+    def parse_source(self, implementation,
+                     index: ModuleIndex = None) -> str:
         """Resolve lambdas and arguments to produce cleaner Python code.
 
         :param implementation: The function referenced by primitive
         :type implementation: callable
+        :param index: Index of the module defining implementation
+        :type index: lapspython.types.ModuleIndex, optional
         :returns: New source code
         :rtype: string
         """
-        source = inspect.getsource(implementation)
+        if index is None:
+            index = ModuleIndex.lookup(implementation)
+        source = index.source(implementation)
 
         source = source[source.find(':') + 1:]
 
@@ -178,30 +667,35 @@ class ParsedPrimitive(ParsedPythonType):
 
         return re.sub(' #.+$', '', source)
 
-    def get_imports(self, implementation) -> set:
+    def get_imports(self, implementation,
+                    index: ModuleIndex = None) -> set:
         """Find import modules that might be required by primitives.
 
         :param implementation: The function referenced by a primitive
         :type implementation: function
+        :param index: Index of the module defining implementation
+        :type index: lapspython.types.ModuleIndex, optional
         :returns: A set of module names as strings
         :rtype: set
         """
-        main_module = inspect.getmodule(implementation)
-        imports = inspect.getmembers(main_module, inspect.ismodule)
-        return {module[0] for module in imports}
+        if index is None:
+            index = ModuleIndex.lookup(implementation)
+        return set(index.modules)
 
-    def get_dependencies(self, implementation) -> list:
+    def get_dependencies(self, implementation,
+                         index: ModuleIndex = None) -> list:
         """Find functions called by primitives that are not built-ins.
 
         :param implementation: The function referenced by a primitive
         :type implementation: function
+        :param index: Index of the module defining implementation
+        :type index: lapspython.types.ModuleIndex, optional
         :returns: A list of (function name, source) tuples
         :rtype: list
         """
-        module = inspect.getmodule(implementation)
-        functions = inspect.getmembers(module, inspect.isfunction)
-        dependent_functions = [f for f in functions if f[0][:2] == '__']
-        return [(f[0], inspect.getsource(f[1])) for f in dependent_functions]
+        if index is None:
+            index = ModuleIndex.lookup(implementation)
+        return index.helper_sources()
 
     def resolve_lambdas(self) -> 'ParsedPrimitive':
         """Remove lambda functions from source and extend list of arguments.
@@ -213,6 +707,7 @@ class ParsedPrimitive(ParsedPythonType):
         pattern = r'lambda (\S+): '
         new_primitive.args = self.args + re.findall(pattern, self.source)
         new_primitive.source = re.sub(pattern, '', self.source)
+        new_primitive.plans = new_primitive.compile_plans()
         return new_primitive
 
     def replace_return_statement(self, return_name, source) -> str:
@@ -230,11 +725,16 @@ class ParsedPrimitive(ParsedPythonType):
 class ParsedRPrimitive(ParsedRType):
     """Class parsing primitives for translation to clean R code."""
 
-    def __init__(self, primitive: Primitive):
+    __slots__ = ('path', 'plans')
+
+    def __init__(self, primitive: Primitive, indices: dict = None):
         """Extract name, path and source of R primitive.
 
         :param primitive: A primitive extracted from LAPS.
         :type primitive: dreamcoder.program.Primitive
+        :param indices: (module name, ModuleIndex) dictionary shared by all
+            primitives of a parse.
+        :type indices: dict, optional
         """
         self.handle = primitive.name
         self.name = re.sub(r'^[^a-z]+', '', self.handle)
@@ -248,7 +748,8 @@ class ParsedRPrimitive(ParsedRType):
             self.path = py_path[:-2] + 'R'
             source = self.parse_source(self.name, self.path)
             imports = self.get_imports(self.path)
-            dependencies = self.get_dependencies(primitive.value)
+            index = ModuleIndex.lookup(py_implementation, indices)
+            dependencies = self.get_dependencies(py_implementation, index)
         else:
             source = py_implementation
             imports = set()
@@ -260,6 +761,7 @@ class ParsedRPrimitive(ParsedRType):
         self.source = source.strip()
         self.arg_types = self.parse_argument_types(primitive.tp)
         self.return_type = self.arg_types.pop()
+        self.plans = self.compile_plans()
 
     def parse_source(self, name: str, path: str, is_dep=False) -> str:
         """Extract source code of primitive from R file.
@@ -269,26 +771,12 @@ class ParsedRPrimitive(ParsedRType):
         :returns: Source code of corresponding function.
         :rtype: string
         """
-        with open(path, 'r') as r_file:
-            lines = r_file.readlines()
-
-        pattern = f'{name} <- '
-
-        for i in range(len(lines)):
-            line = lines[i]
-            if line.startswith(pattern):
-                if not line.endswith('{\n'):
-                    self.args = []
-                    return re.sub(pattern, '', line)
-                if not is_dep:
-                    self.args = self.get_args(line)
-                cutoff_lines = lines[i + 1 - is_dep:]
-                break
-
-        for j in range(len(cutoff_lines)):
-            if cutoff_lines[j] == '}\n':
-                break
-        return ''.join(cutoff_lines[:j + is_dep])
+        header, source = RSourceIndex.load(path).definition(name, is_dep)
+        if not is_dep:
+            self.args = []
+            if header.endswith('{\n'):
+                self.args = self.get_args(header)
+        return source
 
     def get_imports(self, path) -> set:
         """Find import modules that might be required by primitives.
@@ -298,30 +786,28 @@ class ParsedRPrimitive(ParsedRType):
         :returns: A set of module names as strings
         :rtype: set
         """
-        pattern = r'library\((.+)\)'
-        with open(path, 'r') as r_file:
-            return set(re.findall(pattern, r_file.read()))
+        return set(RSourceIndex.load(path).libraries)
 
-    def get_dependencies(self, implementation):
+    def get_dependencies(self, implementation, index: ModuleIndex = None):
         """Find functions called by primitives that are not built-ins.
 
         :param implementation: The function referenced by a primitive
         :type implementation: function
+        :param index: Index of the module defining implementation
+        :type index: lapspython.types.ModuleIndex, optional
         :returns: A list of (function name, source) tuples
         :rtype: list
         """
-        module = inspect.getmodule(implementation)
-        functions = inspect.getmembers(module, inspect.isfunction)
-        dependent_functions = [(f[0], f[1])
-                               for f in functions if f[0][:2] == '__']
+        if index is None:
+            index = ModuleIndex.lookup(implementation)
         dependencies = []
-        for f in dependent_functions:
-            if inspect.isfunction(f[1]):
-                path = inspect.getsourcefile(f[1])[:-2] + 'R'
-                dependencies.append(
-                    (f[0][2:], self.parse_source(f[0][2:], path, True)))
-            else:
-                dependencies.append((f[0][2:], f[1]))
+        for helper, function in index.helpers.items():
+            py_path = inspect.getsourcefile(function)
+            if not isinstance(py_path, str):  # pragma: no cover
+                continue
+            path = py_path[:-2] + 'R'
+            dependencies.append(
+                (helper[2:], self.parse_source(helper[2:], path, True)))
 
         return dependencies
 
@@ -356,6 +842,8 @@ class ParsedRPrimitive(ParsedRType):
 class ParsedInvented(ParsedPythonType):
     """Class parsing invented primitives for translation to Python."""
 
+    __slots__ = ('program',)
+
     def __init__(self, invented: Invented, name: str):
         """Construct ParsedInvented object with parsed specs.
 
@@ -383,10 +871,18 @@ class ParsedInvented(ParsedPythonType):
         body = f'{self.name}({", ".join(args)})'
         return f'{head}{body}'
 
+    def resolve_variables_ast(self, args: list, return_name: str) -> list:
+        """Instead arguments in function call rather than definition."""
+        function = ast.Name(id=self.name, ctx=ast.Load())
+        call = ast.Call(func=function, args=list(args), keywords=[])
+        return [assign(return_name, call)]
+
 
 class ParsedRInvented(ParsedRType):
     """Class parsing invented primitives for translation to R."""
 
+    __slots__ = ('program',)
+
     def __init__(self, invented: Invented, name: str):
         """Construct ParsedRInvented object with parsed specs.
 
@@ -418,6 +914,8 @@ class ParsedRInvented(ParsedRType):
 class ParsedProgramBase(ParsedType):
     """Class parsing synthesized programs."""
 
+    __slots__ = ()
+
     def __init__(
         self,
         name: str,
@@ -444,6 +942,18 @@ class ParsedProgramBase(ParsedType):
         self.imports = imports
         self.dependencies = dependencies
 
+    def rename(self, name: str) -> 'ParsedProgramBase':
+        """Return a shallow copy of the translation under a new name.
+
+        :param name: New task or function name
+        :type name: string
+        :rtype: lapspython.types.ParsedProgramBase
+        """
+        renamed = copy.copy(self)
+        renamed.handle = name
+        renamed.name = name
+        return renamed
+
     @abstractmethod
     def __str__(self) -> str:  # pragma: no cover
         """Return imports, dependencies and source code as string.
@@ -464,22 +974,102 @@ class ParsedProgramBase(ParsedType):
         """
         pass
 
+    @abstractmethod
+    def verify_example(self, example: tuple) -> bool:  # pragma: no cover
+        """Verify code for a single example from task.
+
+        :param example: An (input, output) tuple
+        :type example: tuple
+        :returns: Whether the translation produces the expected output.
+        :rtype: bool
+        """
+        pass
+
 
 class ParsedProgram(ParsedProgramBase, ParsedType):
     """Class parsing synthesized programs."""
 
+    __slots__ = ('module', '_function')
+
+    # Members of str(self), assigning one of them drops the compiled function.
+    _SOURCE_MEMBERS = ('name', 'source', 'args', 'imports', 'dependencies')
+
+    def __init__(
+        self,
+        name: str,
+        source: str,
+        args: list,
+        imports: set,
+        dependencies: set
+    ):
+        """Store Python program and prepare cache for compiled function.
+
+        :param name: Task name or invented primitive handle
+        :type name: string
+        :param source: The Python translation of a given program
+        :type source: string
+        :param args: List of arguments to be resolved when used
+        :type args: list
+        :param dependencies: Source codes of called functions
+        :type dependencies: set
+        """
+        self._function: Optional[Callable] = None
+        super().__init__(name, source, args, imports, dependencies)
+        self.module: Optional[ast.Module] = None
+
+    def __setattr__(self, name: str, value) -> None:
+        """Assign member and drop compiled function if the source changes."""
+        if name in self._SOURCE_MEMBERS:
+            object.__setattr__(self, '_function', None)
+        object.__setattr__(self, name, value)
+
+    def __getstate__(self) -> dict:
+        """Drop compiled function since it cannot be pickled."""
+        state = slot_state(self)
+        state['_function'] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore slots and share dependency sources between programs.
+
+        Dependencies of translations unpickled from worker processes are
+        interned, so they are only held once.
+        """
+        super().__setstate__(state)
+        self.imports = {sys.intern(module) for module in self.imports}
+        self.dependencies = {sys.intern(dependency)
+                             for dependency in self.dependencies}
+
     def __str__(self) -> str:
         """Return dependencies and source code as string.
 
         :returns: Full source code of translated program
         :rtype: string
         """
-        imports = '\n'.join([f'import {module}' for module in self.imports])
-        dependencies = '\n'.join(self.dependencies) + '\n'
+        imports = '\n'.join([f'import {module}'
+                             for module in sorted(self.imports)])
+        dependencies = '\n'.join(sorted(self.dependencies)) + '\n'
         header = f'def {self.name}({", ".join(self.args)}):\n'
         indent_source = re.sub(r'^', '    ', self.source, flags=re.MULTILINE)
         return imports + '\n\n' + dependencies + header + indent_source
 
+    def compile_function(self) -> Callable:
+        """Compile translation with imports and dependencies into a function.
+
+        The function is compiled once and cached until name, source,
+        arguments, imports or dependencies are assigned. Sets of imports and
+        dependencies must not be changed in place.
+
+        :returns: The translated program as callable.
+        :rtype: Callable
+        """
+        if self._function is None:
+            namespace: dict = {}
+            code = compile(str(self), f'<{self.name}>', 'exec')
+            exec(code, namespace)
+            self._function = namespace[self.name]
+        return self._function
+
     def verify(self, examples: list) -> bool:
         """Verify code for a list of examples from task.
 
@@ -488,37 +1078,43 @@ class ParsedProgram(ParsedProgramBase, ParsedType):
         :returns: Whether the translated program is correct.
         :rtype: bool
         """
-        exec_translation = str(self) + '\n\n'
+        try:
+            for example in examples:
+                if not self.verify_example(example):
+                    return False
+        except BaseException:
+            raise BaseException('\n' + str(self))
+        return True
 
-        for example in examples:
-            example_inputs = [f"'{x}'" for x in example[0]]
-            example_output = str(example[1])
+    def verify_example(self, example: tuple) -> bool:
+        """Run compiled translation on a single example.
 
-            joined_inputs = ', '.join(example_inputs)
-            exec_example = f'python_output = {self.name}({joined_inputs})'
-            exec_string = exec_translation + exec_example
+        Exceptions raised by the translated code are not caught.
 
-            loc: dict = {}
-            try:
-                exec(exec_string, loc)
-                if loc['python_output'] != example_output:
-                    return False
-            except BaseException:
-                raise BaseException('\n' + exec_string)
-        return True
+        :param example: An (input, output) tuple
+        :type example: tuple
+        :returns: Whether the translation produces the expected output.
+        :rtype: bool
+        """
+        function = self.compile_function()
+        example_inputs = [str(x) for x in example[0]]
+        return function(*example_inputs) == str(example[1])
 
 
 class ParsedRProgram(ParsedProgramBase, ParsedRType):
     """Class parsing synthesized programs."""
 
+    __slots__ = ()
+
     def __str__(self) -> str:
         """Return dependencies and source code as string.
 
         :returns: Full source code of translated program
         :rtype: string
         """
-        imports = '\n'.join([f'library({module})' for module in self.imports])
-        dependencies = '\n'.join(self.dependencies) + '\n'
+        imports = '\n'.join([f'library({module})'
+                             for module in sorted(self.imports)])
+        dependencies = '\n'.join(sorted(self.dependencies)) + '\n'
         header = f'{self.name} <- function({", ".join(self.args)}) \u007b\n'
         indent_source = re.sub(r'^', '    ', self.source, flags=re.MULTILINE)
         return imports + '\n\n' + dependencies + header + indent_source + '\n}'
@@ -533,6 +1129,16 @@ class ParsedRProgram(ParsedProgramBase, ParsedRType):
         """
         return True  # TODO
 
+    def verify_example(self, example: tuple) -> bool:
+        """Verify code for a single example from task.
+
+        :param example: An (input, output) tuple
+        :type example: tuple
+        :returns: Whether the translation produces the expected output.
+        :rtype: bool
+        """
+        return True  # TODO
+
 
 class ParsedGrammar:
     """Data class containing parsed (invented) primitives."""
@@ -565,21 +1171,104 @@ class ParsedGrammar:
 
 
 class CompactFrontier:
-    """Data class containing the important specs of extracted frontiers."""
+    """Data class containing the important specs of extracted frontiers.
+
+    Programs are only held as interned strings and parsed on demand, so the
+    frontier does not keep the program trees of the checkpoint alive.
+    Examples are held by reference to those of the task.
+    """
+
+    __slots__ = ('annotation', 'name', 'examples', 'program_strings',
+                 'translations', 'failed', 'timed_out', 'skipped', 'verdicts')
 
     def __init__(self, frontier: Frontier, annotation: str = '') -> None:
         """Construct condensed frontier object with optional annotation."""
         self.annotation = annotation
         task = frontier.task
-        self.name = task.name
-        self.requested_types = task.request
+        self.name = sys.intern(task.name)
         self.examples = task.examples
-        entries = sorted(frontier.entries, key=lambda e: -e.logPosterior)
-        self.programs = [entry.program for entry in entries]
+        programs = self.ranked_programs(frontier)
+        self.program_strings = tuple(sys.intern(str(program))
+                                     for program in programs)
         # To avoid circular imports, source translation is handled by
         # lapspython.extraction.ProgramExtractor instead of the constructor.
         self.translations: list = []
         self.failed: list = []
+        self.timed_out: list = []
+        self.skipped: list = []
+        # Verdict per translated program in the order of program_strings.
+        self.verdicts: tuple = ()
+
+    def __getstate__(self) -> dict:
+        """Return assigned slots for pickling and copying."""
+        return slot_state(self)
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore slots and share strings with the process.
+
+        Frontiers pickled by earlier versions only have their programs and
+        valid and failed translations, the other members are defaulted.
+        Their programs and requested types are dropped.
+        """
+        for name, value in state.items():
+            if name in self.__slots__:
+                setattr(self, name, value)
+        self.name = sys.intern(self.name)
+        program_strings = state.get('program_strings')
+        if program_strings is None:
+            program_strings = [str(program) for program in state['programs']]
+        self.program_strings = tuple(sys.intern(program)
+                                     for program in program_strings)
+        self.timed_out = state.get('timed_out', [])
+        self.skipped = [sys.intern(program)
+                        for program in state.get('skipped', [])]
+        self.verdicts = tuple(sys.intern(verdict)
+                              for verdict in state.get('verdicts', ()))
+
+    @classmethod
+    def ranked_programs(cls, frontier: Frontier) -> List[Program]:
+        """Return programs of a frontier by descending posterior.
+
+        :param frontier: A frontier of a checkpoint.
+        :type frontier: dreamcoder.frontier.Frontier
+        :rtype: List[dreamcoder.program.Program]
+        """
+        entries = sorted(frontier.entries, key=lambda e: -e.logPosterior)
+        return [entry.program for entry in entries]
+
+    def iter_programs(self, grammar) -> Iterator[Program]:
+        """Parse programs one at a time, e.g. to stop translating early.
+
+        :param grammar: Grammar defining all primitives of the programs.
+        :type grammar: dreamcoder.grammar.Grammar
+        :rtype: Iterator[dreamcoder.program.Program]
+        """
+        from lapspython.utils import parse_program
+
+        for program in self.program_strings:
+            yield parse_program(program, grammar)
+
+    def get_best(self) -> dict:
+        """Return frontier as dict with best posteriors.
+
+        :returns: A minimal CompactFrontier dictionary.
+        :rtype: dict
+        """
+        best_program = best_valid = best_invalid = None
+
+        if len(self.program_strings) > 0:
+            best_program = self.program_strings[0]
+        if len(self.translations) > 0:
+            best_valid = str(self.translations[0])
+        if len(self.failed) > 0:
+            best_invalid = str(self.failed[0])
+
+        return {
+            'annotation': self.annotation,
+            'best_program': best_program,
+            'best_valid_translation': best_valid,
+            'best_invalid_translation': best_invalid
+        }
 
 
 class CompactResult:
@@ -595,6 +1284,7 @@ class CompactResult:
         """
         self.hit_frontiers: dict = hit
         self.miss_frontiers: dict = miss
+        self.counters: dict = {}
 
     def get_best(self) -> List[Dict]:
         """Return the HIT frontiers as dict with best posteriors.
@@ -602,25 +1292,7 @@ class CompactResult:
         :returns: A list of minimal CompactFrontier dictionaries.
         :rtype: List[Dict]
         """
-        hits_best = []
-
-        for hit in self.hit_frontiers.values():
-            best_valid = best_invalid = None
-
-            if len(hit.translations) > 0:
-                best_valid = str(hit.translations[0])
-            if len(hit.failed) > 0:
-                best_invalid = str(hit.failed[0])
-
-            hit_best = {
-                'annotation': hit.annotation,
-                'best_program': str(hit.programs[0]),
-                'best_valid_translation': best_valid,
-                'best_invalid_translation': best_invalid
-            }
-            hits_best.append(hit_best)
-
-        return hits_best
+        return [hit.get_best() for hit in self.hit_frontiers.values()]
 
     def sample(self) -> dict:
         """Return a random HIT frontier with valid translation.
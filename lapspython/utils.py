@@ -2,24 +2,313 @@
 
 import json
 import os
+import pickle
+import struct
+import sys
+from typing import IO, TYPE_CHECKING, Any, Dict, Iterable, List
 
 import dill
 
-from dreamcoder.dreamcoder import ECResult
-from lapspython.types import CompactResult, ParsedGrammar
+from dreamcoder.program import (Abstraction, Application, Index, Invented,
+                                Primitive, Program)
+from dreamcoder.utilities import ParseFailure, parseSExpression
+from lapspython.types import CompactFrontier, CompactResult, ParsedGrammar
 
+if TYPE_CHECKING:
+    from dreamcoder.dreamcoder import ECResult
 
-def load_checkpoint(filename: str) -> ECResult:
+SECTIONS_MAGIC = b'LAPSSECTIONS1\n'
+
+HEAVY_PACKAGES = ('torch', 'nltk')
+HEAVY_MODULES = ('dreamcoder.dreamcoder', 'dreamcoder.recognition',
+                 'dreamcoder.parser')
+
+
+class ECResultShim:
+    """Stand-in for dreamcoder.dreamcoder.ECResult when unpickling.
+
+    Unpickled attributes are stored as by the original class, but neither
+    the class nor its star imports of torch and the recognition models are
+    imported. Shims cannot be pickled again, since they would no longer
+    load as ECResult.
+    """
+
+    def __reduce__(self):
+        """Refuse to pickle the shim in place of an ECResult."""
+        raise pickle.PicklingError(
+            'ECResultShim cannot be pickled, load the checkpoint with '
+            'load_checkpoint(light=False) instead.')
+
+
+class Placeholder:
+    """Stand-in for classes and functions of modules that are not imported.
+
+    Placeholders accept any arguments and state, so that recognition models
+    and tensors are unpickled into inert objects without importing torch.
+    They cannot be pickled again, since the original objects are lost.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        """Create instance regardless of the arguments."""
+        return super().__new__(cls)
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Keep positional arguments of reduced objects, e.g. tensors."""
+        self.args = args
+
+    def __setstate__(self, state: Any) -> None:
+        """Keep any state without interpreting it."""
+        self.state = state
+
+    def __reduce__(self):
+        """Refuse to pickle the placeholder in place of the original."""
+        raise pickle.PicklingError(
+            f'Placeholder of {type(self).__module__}.{type(self).__name__} '
+            'cannot be pickled, load the checkpoint with '
+            'load_checkpoint(light=False) instead.')
+
+
+class LightUnpickler(dill.Unpickler):
+    """Unpickle checkpoints without importing torch and dreamcoder.dreamcoder.
+
+    ECResult is replaced by ECResultShim and classes of heavy modules, i.e.
+    HEAVY_PACKAGES, HEAVY_MODULES and the main modules of domains, by
+    Placeholder subclasses, unless those modules are imported already.
+    Programs, grammars, frontiers and tasks are unpickled as usual.
+    """
+
+    placeholders: Dict[tuple, type] = {}
+
+    def find_class(self, module: str, name: str) -> Any:
+        """Return shim or placeholder for classes of unimported modules."""
+        if module in sys.modules or not self.is_heavy(module):
+            return super().find_class(module, name)
+        if (module, name) == ('dreamcoder.dreamcoder', 'ECResult'):
+            return ECResultShim
+        key = (module, name)
+        if key not in self.placeholders:
+            self.placeholders[key] = type(name.split('.')[-1], (Placeholder,),
+                                          {'__module__': module})
+        return self.placeholders[key]
+
+    @staticmethod
+    def is_heavy(module: str) -> bool:
+        """Check whether module is replaced by placeholders.
+
+        :param module: Dotted module name.
+        :type module: str
+        :rtype: bool
+        """
+        if module.startswith('dreamcoder.domains.'):
+            return module.endswith('.main')
+        if module.split('.')[0] in HEAVY_PACKAGES:
+            return True
+        return module in HEAVY_MODULES
+
+
+def load_checkpoint(filename: str, lazy: bool = False,
+                    light: bool = False) -> 'ECResult':
     """Load training checkpoint.
 
+    With light, the checkpoint is unpickled by LightUnpickler, so that
+    neither torch nor dreamcoder.dreamcoder are imported. An ECResultShim
+    with the same attributes is then returned instead of the ECResult.
+
     :param filename: Name of file in checkpoints directory, without extension
     :type filename: string
-    :returns: dreamcoder.dreamcoder.ECResult
+    :param lazy: Whether to return a LazyCheckpoint if the checkpoint was
+        converted by convert_checkpoint() and has not changed since.
+    :type lazy: bool, optional
+    :param light: Whether to replace the ECResult and classes of heavy
+        modules, e.g. recognition models, to load faster.
+    :type light: bool, optional
+    :returns: dreamcoder.dreamcoder.ECResult, or an ECResultShim or a
+        LazyCheckpoint in its place
     """
+    if lazy and LazyCheckpoint.is_current(filename):
+        return LazyCheckpoint(filename)
+
     with open(f'checkpoints/{filename}.pickle', 'rb') as handle:
+        if light:
+            return LightUnpickler(handle).load()
         return dill.load(handle)
 
 
+def list_checkpoints(directory: str = '') -> List[str]:
+    """Return names of all checkpoints in a folder of checkpoints directory.
+
+    Grammar snapshots stored next to the checkpoints are skipped.
+
+    :param directory: Folder inside checkpoints directory.
+    :type directory: str, optional
+    :returns: Sorted names as accepted by load_checkpoint().
+    :rtype: List[str]
+    """
+    names = []
+    for filename in os.listdir(os.path.join('checkpoints', directory)):
+        name, extension = os.path.splitext(filename)
+        if extension != '.pickle':
+            continue
+        if name.endswith(('_python_grammar', '_r_grammar')):
+            continue
+        names.append(os.path.join(directory, name))
+    return sorted(names)
+
+
+def parse_program(source: str, grammar) -> Program:
+    """Parse a program string with the primitives of a grammar.
+
+    Unlike dreamcoder.program.Program.parse(), primitives are not looked up
+    in the process-wide Primitive.GLOBALS, which keeps the first primitive
+    of each name, e.g. of another domain.
+
+    :param source: Program as returned by str(program).
+    :type source: str
+    :param grammar: Grammar defining all primitives of the program.
+    :type grammar: dreamcoder.grammar.Grammar
+    :raises dreamcoder.utilities.ParseFailure: If the program is malformed
+        or uses a primitive not in the grammar.
+    :rtype: dreamcoder.program.Program
+    """
+    primitives = {p.name: p for p in grammar.primitives
+                  if isinstance(p, Primitive)}
+
+    def parse(expression) -> Program:
+        if isinstance(expression, str):
+            if expression.startswith('$'):
+                return Index(int(expression[1:]))
+            if expression in primitives:
+                return primitives[expression]
+            raise ParseFailure((source, expression))
+        if expression[0] == '#':
+            return Invented(parse(expression[1]))
+        if expression[0] == 'lambda':
+            return Abstraction(parse(expression[1]))
+        function = parse(expression[0])
+        for argument in expression[1:]:
+            function = Application(function, parse(argument))
+        return function
+
+    return parse(parseSExpression(source))
+
+
+def convert_checkpoint(filename: str) -> dict:
+    """Rewrite checkpoint into a sectioned file with an index.
+
+    Each attribute of the ECResult is pickled into its own section, so that
+    LazyCheckpoint can deserialize the sections needed by the pipeline
+    without unpickling e.g. recognition models. Objects shared between
+    attributes are no longer shared between sections after loading.
+
+    :param filename: Name of file in checkpoints directory, without extension
+    :type filename: str
+    :returns: Index of the sectioned file.
+    :rtype: dict
+    """
+    pickle_path = f'checkpoints/{filename}.pickle'
+    result = load_checkpoint(filename)
+    stat = os.stat(pickle_path)
+    index: dict = {
+        'source': {'size': stat.st_size, 'mtime': stat.st_mtime_ns},
+        'sections': {}
+    }
+
+    path = f'checkpoints/{filename}.sections'
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as sections_file:
+        sections_file.write(SECTIONS_MAGIC)
+        for name, value in vars(result).items():
+            blob = dill.dumps(value)
+            index['sections'][name] = [sections_file.tell(), len(blob)]
+            sections_file.write(blob)
+        index_offset = sections_file.tell()
+        sections_file.write(json.dumps(index).encode('utf-8'))
+        sections_file.write(struct.pack('<Q', index_offset))
+    os.replace(tmp_path, path)
+    return index
+
+
+class LazyCheckpoint:
+    """Converted checkpoint whose sections are loaded on first access.
+
+    Sections are accessed like the attributes of an ECResult, e.g.
+    checkpoint.allFrontiers, and stay loaded afterwards.
+    """
+
+    def __init__(self, filename: str) -> None:
+        """Read index of sectioned file created by convert_checkpoint().
+
+        :param filename: Name of file in checkpoints directory, without
+            extension
+        :type filename: str
+        """
+        self.path = f'checkpoints/{filename}.sections'
+        self.index = self.read_index(self.path)
+        self.sections = self.index['sections']
+
+    def __getattr__(self, name: str) -> Any:
+        """Load section on first access of the attribute."""
+        if name not in self.__dict__.get('sections', {}):
+            msg = f'Checkpoint {self.__dict__.get("path")} has no {name}.'
+            raise AttributeError(msg)
+        return self.load(name)
+
+    @classmethod
+    def read_index(cls, path: str) -> dict:
+        """Read index from the end of a sectioned file.
+
+        :param path: Path to sectioned file.
+        :type path: str
+        :rtype: dict
+        """
+        with open(path, 'rb') as sections_file:
+            if sections_file.read(len(SECTIONS_MAGIC)) != SECTIONS_MAGIC:
+                raise ValueError(f'{path} is not a sectioned checkpoint.')
+            sections_file.seek(-8, os.SEEK_END)
+            end = sections_file.tell()
+            index_offset, = struct.unpack('<Q', sections_file.read(8))
+            sections_file.seek(index_offset)
+            index_bytes = sections_file.read(end - index_offset)
+        return json.loads(index_bytes.decode('utf-8'))
+
+    @classmethod
+    def is_current(cls, filename: str) -> bool:
+        """Check whether a converted checkpoint matches its pickle.
+
+        A converted checkpoint without pickle is considered current.
+
+        :param filename: Name of file in checkpoints directory, without
+            extension
+        :type filename: str
+        :rtype: bool
+        """
+        path = f'checkpoints/{filename}.sections'
+        if not os.path.exists(path):
+            return False
+        pickle_path = f'checkpoints/{filename}.pickle'
+        if not os.path.exists(pickle_path):
+            return True
+        stat = os.stat(pickle_path)
+        source = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+        return cls.read_index(path)['source'] == source
+
+    def load(self, name: str) -> Any:
+        """Deserialize section unless it is already loaded.
+
+        :param name: Section name, i.e. ECResult attribute name.
+        :type name: str
+        :returns: The loaded section.
+        """
+        if name in self.__dict__:
+            return self.__dict__[name]
+        offset, length = self.sections[name]
+        with open(self.path, 'rb') as sections_file:
+            sections_file.seek(offset)
+            value = LightUnpickler(sections_file).load()
+        setattr(self, name, value)
+        return value
+
+
 def json_dump(
     filename: str,
     grammar: ParsedGrammar,
@@ -34,17 +323,158 @@ def json_dump(
     :param result: Result extracted and translated from checkpoint.
     :type result: lapspython.types.CompactResult
     """
+    json_stream_dump(filename, grammar, result.hit_frontiers.values())
+
+
+class _ChunkedJsonWriter:
+    """Buffer encoded JSON in chunks and track byte offsets of values."""
+
+    def __init__(self, stream: IO[bytes], chunk_size: int) -> None:
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.chunk: List[bytes] = []
+        self.offset = 0
+        self.values = 0
+
+    def write(self, text: str) -> None:
+        data = text.encode('utf-8')
+        self.chunk.append(data)
+        self.offset += len(data)
+
+    def write_value(self, value: Any, depth: int) -> list:
+        """Write indented value and return its [offset, length]."""
+        text = json.dumps(value, indent=4)
+        start = self.offset
+        self.write(text.replace('\n', '\n' + '    ' * depth))
+        self.values += 1
+        if self.values % self.chunk_size == 0:
+            self.flush()
+        return [start, self.offset - start]
+
+    def write_members(self, members: Iterable[tuple], depth: int) -> dict:
+        """Write (key, value) pairs as object and return value offsets."""
+        offsets = {}
+        indent = '    ' * depth
+        separator = '{'
+        for key, value in members:
+            self.write(f'{separator}\n{indent}    {json.dumps(key)}: ')
+            offsets[key] = self.write_value(value, depth + 1)
+            separator = ','
+        if len(offsets) == 0:
+            self.write('{}')
+        else:
+            self.write(f'\n{indent}}}')
+        return offsets
+
+    def flush(self) -> None:
+        self.stream.write(b''.join(self.chunk))
+        self.stream.flush()
+        self.chunk = []
+
+
+def json_stream_dump(
+    filename: str,
+    grammar: ParsedGrammar,
+    frontiers: Iterable[CompactFrontier],
+    chunk_size: int = 64
+) -> dict:
+    """Stream grammar and best results of HIT frontiers into json file.
+
+    The file has the same structure as written by json_dump(). Entries are
+    encoded one at a time and written in chunks, so frontiers can be passed
+    while they are extracted, e.g. from ProgramExtractor.iter_extract().
+    Byte offsets of the grammar and of each task's results are stored in
+    an index file for json_lookup().
+
+    :param filename: File name in checkpoints folder without file extension.
+    :type filename: str
+    :param grammar: Grammar extracted and parsed from checkpoint.
+    :type grammar: lapspython.types.ParsedGrammar
+    :param frontiers: Extracted and translated frontiers, MISS frontiers are
+        skipped.
+    :type frontiers: Iterable[lapspython.types.CompactFrontier]
+    :param chunk_size: Number of entries written at once.
+    :type chunk_size: int, optional
+    :returns: The index.
+    :rtype: dict
+    """
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be a positive integer.')
+
     json_path = f'checkpoints/{filename}.json'
-    json_dict = {
-        'grammar': grammar.as_dict(),
-        'result': result.get_best()
+    tmp_path = f'{json_path}.tmp'
+    tasks = {}
+    try:
+        with open(tmp_path, 'wb') as json_file:
+            writer = _ChunkedJsonWriter(json_file, chunk_size)
+            writer.write('{\n    "grammar": ')
+            grammar_start = writer.offset
+            writer.write('{\n        "primitives": ')
+            writer.write_members(((p.handle, p.as_dict())
+                                  for p in grammar.primitives.values()), 2)
+            writer.write(',\n        "invented": ')
+            writer.write_members(((i.handle, i.as_dict())
+                                  for i in grammar.invented.values()), 2)
+            writer.write('\n    }')
+            grammar_end = writer.offset
+            writer.write(',\n    "result": ')
+            separator = '['
+            for frontier in frontiers:
+                if len(frontier.program_strings) == 0:
+                    continue
+                writer.write(f'{separator}\n        ')
+                tasks[frontier.name] = writer.write_value(frontier.get_best(),
+                                                          2)
+                separator = ','
+            if len(tasks) == 0:
+                writer.write('[]\n}')
+            else:
+                writer.write('\n    ]\n}')
+            writer.flush()
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, json_path)
+
+    stat = os.stat(json_path)
+    index = {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime_ns,
+        'grammar': [grammar_start, grammar_end - grammar_start],
+        'tasks': tasks
     }
-    with open(json_path, 'w') as json_file:
-        try:
-            json.dump(json_dict, json_file, indent=4)
-        except TypeError:
-            os.remove(json_path)
-            raise
+    with open(f'checkpoints/{filename}.index.json', 'w') as index_file:
+        json.dump(index, index_file)
+    return index
+
+
+def json_lookup(filename: str, task: str) -> dict:
+    """Read best results of one task from json file using its index.
+
+    :param filename: File name in checkpoints folder without file extension.
+    :type filename: str
+    :param task: Task name.
+    :type task: str
+    :returns: Best results as in CompactFrontier.get_best(), empty if the
+        file or task does not exist.
+    :rtype: dict
+    """
+    json_path = f'checkpoints/{filename}.json'
+    try:
+        with open(f'checkpoints/{filename}.index.json', 'r') as index_file:
+            index = json.load(index_file)
+        stat = os.stat(json_path)
+    except FileNotFoundError:
+        return {}
+    if (stat.st_size, stat.st_mtime_ns) != (index['size'], index['mtime']):
+        raise ValueError(f'Index of {json_path} is outdated.')
+    if task not in index['tasks']:
+        return {}
+
+    offset, length = index['tasks'][task]
+    with open(json_path, 'rb') as json_file:
+        json_file.seek(offset)
+        return json.loads(json_file.read(length).decode('utf-8'))
 
 
 def json_read(filename: str) -> dict:
@@ -65,3 +495,107 @@ def json_read(filename: str) -> dict:
         return json_dict
     except FileNotFoundError:
         return {}
+
+
+def jsonl_write(stream: IO[str], frontiers: Iterable[CompactFrontier]) -> None:
+    """Write one JSON object per frontier as soon as it is available.
+
+    Each line is flushed, so the stream can be read by downstream tools
+    while frontiers are still being extracted, e.g. from
+    ProgramExtractor.iter_extract().
+
+    :param stream: Text stream to write to, e.g. sys.stdout.
+    :type stream: IO[str]
+    :param frontiers: Extracted and translated frontiers.
+    :type frontiers: Iterable[lapspython.types.CompactFrontier]
+    """
+    for frontier in frontiers:
+        record = {'name': frontier.name}
+        record.update(frontier.get_best())
+        stream.write(json.dumps(record) + '\n')
+        stream.flush()
+
+
+def jsonl_dump(filename: str, frontiers: Iterable[CompactFrontier]) -> None:
+    """Stream frontiers to a JSON Lines file in checkpoints folder.
+
+    :param filename: File name in checkpoints folder without file extension.
+    :type filename: str
+    :param frontiers: Extracted and translated frontiers.
+    :type frontiers: Iterable[lapspython.types.CompactFrontier]
+    """
+    with open(f'checkpoints/{filename}.jsonl', 'w') as jsonl_file:
+        jsonl_write(jsonl_file, frontiers)
+
+
+class ResultsStore:
+    """Best results of many checkpoints, each distinct result stored once.
+
+    Results are grouped by mode and task. Results of the same program found
+    in several checkpoints, e.g. in consecutive iterations, are merged into
+    one record listing all of these checkpoints.
+    """
+
+    def __init__(self, filename: str = 'results') -> None:
+        """Load stored results from JSON file if it exists.
+
+        :param filename: File name in checkpoints folder without extension.
+        :type filename: str, optional
+        """
+        self.path = f'checkpoints/{filename}.json'
+        self.results: dict = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as json_file:
+                self.results = json.load(json_file)
+
+    def __len__(self) -> int:
+        """Return number of stored records."""
+        return sum(len(records) for tasks in self.results.values()
+                   for records in tasks.values())
+
+    def add(self, checkpoint: str, mode: str, results: Iterable[dict]) -> int:
+        """Add best results of a checkpoint, merging known programs.
+
+        :param checkpoint: Checkpoint name the results were extracted from.
+        :type checkpoint: str
+        :param mode: Either 'python' or 'r'.
+        :type mode: str
+        :param results: Dictionaries as written by jsonl_write(), i.e. the
+            task name and the results of CompactFrontier.get_best().
+        :type results: Iterable[dict]
+        :returns: Number of new records.
+        :rtype: int
+        """
+        tasks = self.results.setdefault(mode, {})
+        added = 0
+        for best in results:
+            best = dict(best)
+            records = tasks.setdefault(best.pop('name'), [])
+            record = next((record for record in records
+                           if record['best_program'] == best['best_program']),
+                          None)
+            if record is None:
+                best['checkpoints'] = [checkpoint]
+                records.append(best)
+                added += 1
+            elif checkpoint not in record['checkpoints']:
+                record['checkpoints'].append(checkpoint)
+        return added
+
+    def lookup(self, task: str, mode: str = 'python') -> List[dict]:
+        """Return all distinct records of a task.
+
+        :param task: Task name.
+        :type task: str
+        :param mode: Either 'python' or 'r'.
+        :type mode: str, optional
+        :rtype: List[dict]
+        """
+        return self.results.get(mode, {}).get(task, [])
+
+    def save(self) -> None:
+        """Write results to JSON file."""
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as json_file:
+            json.dump(self.results, json_file, indent=4)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,340 @@
+"""Verify translated programs in sandboxed worker processes."""
+
+import fcntl
+import hashlib
+import json
+import multiprocessing
+import os
+import resource
+import signal
+import time
+from collections import OrderedDict, deque
+from multiprocessing.connection import wait
+from typing import Optional
+
+import psutil
+
+from lapspython.types import ParsedProgramBase
+
+VALID = 'valid'
+INVALID = 'invalid'
+TIMEOUT = 'timeout'
+# The sandbox failed instead of the translation, e.g. it ran out of memory or
+# its worker crashed. Such translations count as failed but are not cached.
+ERROR = 'error'
+
+
+class VerificationTimeoutError(Exception):
+    """Raised inside a worker if an example exceeds its CPU time."""
+
+
+def _raise_timeout(signum, frame):
+    raise VerificationTimeoutError()
+
+
+def _limit_memory(memory_limit: int) -> None:
+    """Limit the address space a worker may allocate on top of its own."""
+    if memory_limit <= 0:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = psutil.Process().memory_info().vms + memory_limit
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def verify_examples(program: ParsedProgramBase, examples: list,
+                    timeout: float) -> str:
+    """Verify a translation with a CPU timer per example.
+
+    The SIGPROF handler raising the timeout is installed for the duration
+    of the call and the previous handler restored afterwards, so this must
+    be called from the main thread.
+
+    :param program: Translated program.
+    :type program: lapspython.types.ParsedProgramBase
+    :param examples: A list of (input, output) tuples.
+    :type examples: list
+    :param timeout: CPU seconds per example, 0 disables the timer.
+    :type timeout: float
+    :returns: VALID, INVALID, TIMEOUT or ERROR.
+    :rtype: str
+    """
+    previous = signal.signal(signal.SIGPROF, _raise_timeout)
+    try:
+        return _verify_timed(program, examples, timeout)
+    finally:
+        signal.signal(signal.SIGPROF, previous)
+
+
+def _verify_timed(program: ParsedProgramBase, examples: list,
+                  timeout: float) -> str:
+    try:
+        for example in examples:
+            signal.setitimer(signal.ITIMER_PROF, timeout)
+            try:
+                if not program.verify_example(example):
+                    return INVALID
+            finally:
+                signal.setitimer(signal.ITIMER_PROF, 0)
+    except VerificationTimeoutError:
+        return TIMEOUT
+    except MemoryError:
+        return ERROR
+    except BaseException:
+        return INVALID
+    return VALID
+
+
+def _serve(connection, timeout: float, memory_limit: int) -> None:
+    """Answer verification requests until the connection is closed."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _limit_memory(memory_limit)
+    while True:
+        try:
+            program, examples = connection.recv()
+        except (EOFError, OSError):
+            break
+        connection.send(verify_examples(program, examples, timeout))
+
+
+class _Worker:
+    """Pre-forked verification process and its end of the pipe."""
+
+    def __init__(self, context, timeout: float, memory_limit: int) -> None:
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_serve,
+            args=(child_connection, timeout, memory_limit),
+            daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+
+    def kill(self) -> None:
+        self.connection.close()
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+
+
+class VerifierPool:
+    """Pool of sandboxed processes verifying translations with timeouts."""
+
+    def __init__(
+        self,
+        workers: int = 2,
+        timeout: float = 1.0,
+        memory_limit: int = 2 ** 30,
+        grace: float = 1.0
+    ) -> None:
+        """Fork worker processes which wait for verification requests.
+
+        :param workers: Number of worker processes.
+        :type workers: int, optional
+        :param timeout: CPU seconds per example before it is aborted.
+        :type timeout: float, optional
+        :param memory_limit: Bytes a worker may allocate, 0 disables limit.
+        :type memory_limit: int, optional
+        :param grace: Wall-clock seconds per request on top of all example
+            timeouts before a worker is considered stuck and killed.
+        :type grace: float, optional
+        """
+        if workers < 1:
+            raise ValueError('workers must be a positive integer.')
+        if timeout <= 0:
+            raise ValueError('timeout must be positive.')
+
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.grace = grace
+        self.recycled = 0
+        self._context = multiprocessing.get_context('fork')
+        self._workers = [self._spawn() for _ in range(workers)]
+
+    def __enter__(self) -> 'VerifierPool':
+        """Return pool for use as context manager."""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Terminate workers when leaving context."""
+        self.close()
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._context, self.timeout, self.memory_limit)
+
+    def _recycle(self, worker: _Worker) -> _Worker:
+        worker.kill()
+        self.recycled += 1
+        new_worker = self._spawn()
+        self._workers[self._workers.index(worker)] = new_worker
+        return new_worker
+
+    def verify(self, batch: list) -> list:
+        """Verify a batch of translations in the worker processes.
+
+        Workers that crash or exceed their wall-clock deadline are replaced.
+        Crashes count as ERROR, exceeded deadlines as TIMEOUT.
+
+        :param batch: A list of (translation, examples) tuples.
+        :type batch: list
+        :returns: VALID, INVALID, TIMEOUT or ERROR for each tuple in batch.
+        :rtype: list
+        """
+        verdicts: list = [ERROR] * len(batch)
+        pending = deque(enumerate(batch))
+        idle = list(self._workers)
+        busy: dict = {}
+
+        while pending or busy:
+            while pending and idle:
+                worker = idle.pop()
+                index, (program, examples) = pending.popleft()
+                try:
+                    worker.connection.send((program, examples))
+                except OSError:
+                    idle.append(self._recycle(worker))
+                    pending.appendleft((index, (program, examples)))
+                    continue
+                budget = self.timeout * max(len(examples), 1) + self.grace
+                deadline = time.monotonic() + budget
+                busy[worker.connection] = (worker, index, deadline)
+
+            next_deadline = min(deadline for _, _, deadline in busy.values())
+            remaining = max(next_deadline - time.monotonic(), 0)
+            for connection in wait(list(busy), remaining):
+                worker, index, _ = busy.pop(connection)
+                try:
+                    verdicts[index] = worker.connection.recv()
+                except (EOFError, OSError):
+                    worker = self._recycle(worker)
+                idle.append(worker)
+
+            now = time.monotonic()
+            for connection, (worker, index, deadline) in list(busy.items()):
+                if now >= deadline:
+                    del busy[connection]
+                    verdicts[index] = TIMEOUT
+                    idle.append(self._recycle(worker))
+
+        return verdicts
+
+    def close(self) -> None:
+        """Terminate all worker processes."""
+        for worker in self._workers:
+            worker.kill()
+        self._workers = []
+
+
+class VerificationCache:
+    """Persistent LRU cache of verdicts keyed by translation and examples."""
+
+    def __init__(
+        self,
+        filename: str = 'verification_cache',
+        max_entries: int = 100000,
+        directory: str = 'checkpoints'
+    ) -> None:
+        """Load cached verdicts from JSON file if it exists.
+
+        :param filename: File name in directory without extension.
+        :type filename: str, optional
+        :param max_entries: Least recently used verdicts beyond this number
+            are evicted.
+        :type max_entries: int, optional
+        :param directory: Folder of the JSON file, created on save.
+        :type directory: str, optional
+        """
+        if max_entries < 1:
+            raise ValueError('max_entries must be a positive integer.')
+
+        self.directory = directory
+        self.path = os.path.join(directory, f'{filename}.json')
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.entries: OrderedDict = OrderedDict()
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as json_file:
+                self.entries.update(json.load(json_file))
+            self._evict()
+
+    def __len__(self) -> int:
+        """Return number of cached verdicts."""
+        return len(self.entries)
+
+    @classmethod
+    def key(cls, translation: ParsedProgramBase, examples: list,
+            mode: str) -> str:
+        """Hash translated source, examples and mode.
+
+        :param translation: Translated program.
+        :type translation: lapspython.types.ParsedProgramBase
+        :param examples: A list of (input, output) tuples.
+        :type examples: list
+        :param mode: Either 'python' or 'r'.
+        :type mode: str
+        :rtype: str
+        """
+        content = '\0'.join((mode, str(translation), repr(examples)))
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def peek(self, translation: ParsedProgramBase, examples: list,
+             mode: str) -> Optional[str]:
+        """Return cached verdict without counting or reordering.
+
+        :returns: VALID, INVALID or None if not cached.
+        :rtype: str, optional
+        """
+        return self.entries.get(self.key(translation, examples, mode))
+
+    def record(self, translation: ParsedProgramBase, examples: list,
+               mode: str, verdict: str) -> None:
+        """Count lookup as hit or miss and store verdict as most recent.
+
+        Only VALID and INVALID are stored, timeouts and errors depend on the
+        sandbox limits.
+
+        :param verdict: VALID, INVALID, TIMEOUT or ERROR.
+        :type verdict: str
+        """
+        key = self.key(translation, examples, mode)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return
+        self.misses += 1
+        if verdict in (VALID, INVALID):
+            self.entries[key] = verdict
+            self._evict()
+
+    def save(self) -> None:
+        """Merge cached verdicts into JSON file.
+
+        Verdicts saved by other processes since this cache was loaded are
+        kept, those of this cache become the most recent ones. Concurrent
+        saves are serialized by a lock file and the JSON file is replaced
+        atomically.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(f'{self.path}.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            entries: OrderedDict = OrderedDict()
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as json_file:
+                    entries.update(json.load(json_file))
+            for key, verdict in self.entries.items():
+                entries.pop(key, None)
+                entries[key] = verdict
+            self.entries = entries
+            self._evict()
+
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as json_file:
+                json.dump(self.entries, json_file)
+            os.replace(tmp_path, self.path)
+
+    def _evict(self) -> None:
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
@@ -1,11 +1,34 @@
 """Unit tests for module lapspython.extraction."""
 
+import os
+
 import pytest
 
+from dreamcoder.grammar import Grammar
+from dreamcoder.program import Abstraction, Application, Index, Invented
 from dreamcoder.type import TypeConstructor
-from lapspython.extraction import GrammarParser, ProgramExtractor
+from lapspython import extraction
+from lapspython.extraction import (GrammarParser, GrammarSnapshot,
+                                   ProgramExtractor)
+from lapspython.translation import Translator
 from lapspython.types import CompactFrontier
 from lapspython.utils import load_checkpoint
+from lapspython.verification import VerifierPool
+
+
+def nested_grammar() -> Grammar:
+    """Extend re2 grammar with inventions calling other inventions."""
+    grammar = load_checkpoint('re2_test').grammars[-1]
+    productions = {str(p): p for _, _, p in grammar.productions}
+    f0 = productions['#(_rsplit _rdot)']
+    flatten = Invented(Abstraction(Application(
+        productions['_rflatten'], Application(f0, Index(0)))))
+    twice = Invented(Abstraction(Application(
+        flatten, Application(flatten, Index(0)))))
+    split = Invented(Abstraction(Application(
+        f0, Application(flatten, Index(0)))))
+    return Grammar.uniform(list(productions.values()) + [twice, split,
+                                                         flatten])
 
 
 class TestGrammarParser:
@@ -100,6 +123,71 @@ class TestGrammarParser:
             assert isinstance(invented.arg_types[0], TypeConstructor)
             assert isinstance(invented.return_type, TypeConstructor)
 
+    def test_invention_levels(self):
+        """Group nested inventions by dependency depth."""
+        grammar = nested_grammar()
+        parsed_invented = GrammarParser(grammar).parsed_grammar.invented
+        for invented in parsed_invented.values():
+            invented.source = ''
+        levels = GrammarParser.invention_levels(parsed_invented)
+        names = [sorted(parsed_invented[h].name for h in level)
+                 for level in levels]
+        assert names == [['f0'], ['f3'], ['f1', 'f2']]
+
+    def test_parse_invented_parallel(self):
+        """Translate nested inventions level by level in parallel."""
+        grammar = nested_grammar()
+        serial = GrammarParser(grammar).parsed_grammar.invented
+        parallel = GrammarParser(grammar, jobs=2).parsed_grammar.invented
+        for handle, invented in serial.items():
+            assert parallel[handle].source == invented.source
+            assert parallel[handle].args == invented.args
+            assert parallel[handle].dependencies == invented.dependencies
+        assert serial['#(lambda (_rflatten (#(_rsplit _rdot) $0)))'].source \
+            == 'f0_1 = f0(arg1)\nreturn "".join(f0_1)'
+
+    def test_parse_incremental(self):
+        """Reuse previous grammar and name new inventions after old ones."""
+        result = load_checkpoint('re2_test')
+        previous = GrammarParser(result.grammars[-1]).parsed_grammar
+        grammar = nested_grammar()
+        grammar.productions.reverse()
+
+        parser = GrammarParser()
+        parsed_grammar = parser.parse(grammar, previous)
+        invented = parsed_grammar.invented
+        f0 = invented['#(_rsplit _rdot)']
+        assert f0.name == 'f0'
+        assert f0 is not previous.invented['#(_rsplit _rdot)']
+        assert f0.source == previous.invented['#(_rsplit _rdot)'].source
+        assert sorted(i.name for i in invented.values()) == \
+            ['f0', 'f1', 'f2', 'f3']
+        assert parsed_grammar.primitives['map'] is previous.primitives['map']
+        fresh = GrammarParser(grammar).parsed_grammar.invented
+        assert fresh['#(_rsplit _rdot)'].name == 'f3'
+
+    def test_parse_primitives(self):
+        """Parse primitives only once and reuse them for another grammar."""
+        grammar = load_checkpoint('re2_test').grammars[-1]
+        parser = GrammarParser()
+        primitives = parser.parse_primitives(grammar)
+        assert set(primitives) == set(parser.parse(grammar).primitives)
+
+        shared = parser.parse_primitives(nested_grammar(), primitives)
+        assert all(shared[name] is primitives[name] for name in shared)
+
+    def test_parse_incremental_invalid_mode(self):
+        """Reject previous grammar parsed for another language."""
+        grammar = load_checkpoint('re2_test').grammars[-1]
+        previous = GrammarParser(grammar, 'r').parsed_grammar
+        with pytest.raises(ValueError, match='different mode'):
+            GrammarParser().parse(grammar, previous)
+
+    def test_invalid_jobs(self):
+        """Construct parser with a non-positive number of jobs."""
+        with pytest.raises(ValueError, match='jobs must be a positive'):
+            GrammarParser(jobs=0)
+
     def test_fix_invented_invalid_keys(self):
         """Override invented primitive from re2 grammar with invalid dict."""
         grammar = load_checkpoint('re2_test').grammars[-1]
@@ -138,6 +226,56 @@ class TestGrammarParser:
         assert override_invented.dependencies == ['new dependencies']
 
 
+class TestGrammarSnapshot:
+    """Run tests for lapspython.extraction.GrammarSnapshot."""
+
+    @pytest.mark.parametrize('mode', ['python', 'r'])
+    def test_save_load(self, tmp_path, monkeypatch, mode):
+        """Reuse snapshot of unchanged grammar."""
+        grammar = load_checkpoint('re2_test').grammars[-1]
+        monkeypatch.chdir(tmp_path)
+        os.mkdir('checkpoints')
+        snapshot = GrammarSnapshot('re2_test', mode)
+        assert snapshot.load(grammar) is None
+
+        parsed_grammar = GrammarParser(grammar, mode).parsed_grammar
+        snapshot.save(grammar, parsed_grammar)
+        loaded = snapshot.load(grammar)
+        assert loaded is not None
+        assert loaded.mode == mode
+        for handle, primitive in parsed_grammar.primitives.items():
+            assert str(loaded.primitives[handle]) == str(primitive)
+            assert loaded.primitives[handle].dependencies == \
+                primitive.dependencies
+        for handle, invented in parsed_grammar.invented.items():
+            assert str(loaded.invented[handle]) == str(invented)
+
+    def test_changed_grammar(self, tmp_path, monkeypatch):
+        """Discard snapshot of a different grammar."""
+        grammar = load_checkpoint('re2_test').grammars[-1]
+        changed_grammar = nested_grammar()
+        monkeypatch.chdir(tmp_path)
+        os.mkdir('checkpoints')
+        snapshot = GrammarSnapshot('re2_test')
+        snapshot.save(grammar, GrammarParser(grammar).parsed_grammar)
+        assert snapshot.load(changed_grammar) is None
+
+    def test_changed_source(self, tmp_path, monkeypatch):
+        """Discard snapshot if a source file changed."""
+        grammar = load_checkpoint('re2_test').grammars[-1]
+        monkeypatch.chdir(tmp_path)
+        os.mkdir('checkpoints')
+        source_path = tmp_path / 'primitives.py'
+        source_path.write_text('def _rdot(): pass\n')
+        monkeypatch.setattr(GrammarSnapshot, 'source_paths',
+                            lambda grammar, mode: {str(source_path)})
+        snapshot = GrammarSnapshot('re2_test')
+        snapshot.save(grammar, GrammarParser(grammar).parsed_grammar)
+        assert snapshot.load(grammar) is not None
+        source_path.write_text('def _rdot(): return None\n')
+        assert snapshot.load(grammar) is None
+
+
 class TestProgramExtractor:
     """Run tests for lapspython.extraction.ProgramExtractor."""
 
@@ -165,7 +303,7 @@ class TestProgramExtractor:
             frontier = compact_result.hit_frontiers[name]
             assert isinstance(frontier, CompactFrontier)
             assert frontier.name == name
-            assert len(frontier.programs) > 0
+            assert len(frontier.program_strings) > 0
 
     def test_extract_miss(self):
         """Extract and validate MISS results."""
@@ -177,4 +315,108 @@ class TestProgramExtractor:
             frontier = compact_result.miss_frontiers[name]
             assert isinstance(frontier, CompactFrontier)
             assert frontier.name == name
-            assert len(frontier.programs) == 0
+            assert len(frontier.program_strings) == 0
+
+    def test_extract_parallel(self):
+        """Translate in worker processes and compare with serial run."""
+        result = load_checkpoint('re2_test')
+        grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+        translator = Translator(grammar)
+        serial = ProgramExtractor(result, translator).compact_result
+        parallel = ProgramExtractor(result, translator, 2).compact_result
+
+        assert list(parallel.hit_frontiers) == list(serial.hit_frontiers)
+        assert list(parallel.miss_frontiers) == list(serial.miss_frontiers)
+        assert parallel.get_best() == serial.get_best()
+
+    def test_iter_extract(self):
+        """Yield MISS frontiers first, then translated HIT frontiers."""
+        result = load_checkpoint('re2_test')
+        grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+        extractor = ProgramExtractor()
+        compact_result = extractor.extract(result, Translator(grammar))
+        for jobs in (1, 2):
+            frontiers = list(extractor.iter_extract(
+                result, Translator(grammar), jobs))
+            names = [frontier.name for frontier in frontiers]
+            assert names == list(compact_result.miss_frontiers) + \
+                list(compact_result.hit_frontiers)
+            best = [frontier.get_best() for frontier in frontiers
+                    if len(frontier.program_strings) > 0]
+            assert best == compact_result.get_best()
+
+    def test_iter_extract_close(self):
+        """Stop parallel extraction after the first HIT frontier."""
+        result = load_checkpoint('re2_test')
+        grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+        frontiers = ProgramExtractor().iter_extract(result,
+                                                    Translator(grammar), 2)
+        hit = next(f for f in frontiers if len(f.program_strings) > 0)
+        assert extraction._SHARED_EXTRACTION is None
+        frontiers.close()
+        assert len(hit.translations) > 0
+
+    def test_extract_top_k(self):
+        """Translate only the most likely programs of each frontier."""
+        result = load_checkpoint('re2_test')
+        grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+        extractor = ProgramExtractor(result, Translator(grammar),
+                                     policy='top-k', top_k=2)
+        for frontier in extractor.compact_result.hit_frontiers.values():
+            translated = len(frontier.translations) + len(frontier.failed)
+            assert translated == min(2, len(frontier.program_strings))
+            assert frontier.skipped == list(frontier.program_strings[2:])
+
+    def test_extract_first_valid(self):
+        """Stop translating a frontier after its first valid translation."""
+        result = load_checkpoint('re2_test')
+        grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+        with VerifierPool(2, 1.0) as verifier:
+            sandboxed = ProgramExtractor(result, Translator(grammar), 2,
+                                         verifier, policy='first-valid')
+        extractor = ProgramExtractor(result, Translator(grammar),
+                                     policy='first-valid')
+        best = ProgramExtractor(result, Translator(grammar)).compact_result \
+            .get_best()
+        for compact_result in (extractor.compact_result,
+                               sandboxed.compact_result):
+            assert compact_result.get_best() == best
+            for frontier in compact_result.hit_frontiers.values():
+                assert len(frontier.translations) == 1
+                skipped = len(frontier.program_strings) - 1
+                assert len(frontier.skipped) == skipped
+
+        counters = sandboxed.compact_result.counters
+        translated = counters['translation cache hits'] + \
+            counters['translation cache misses']
+        assert translated == len(sandboxed.compact_result.hit_frontiers)
+
+    def test_extract_invalid_policy(self):
+        """Construct extractor with unknown policy or non-positive k."""
+        with pytest.raises(ValueError, match='policy must be'):
+            ProgramExtractor(policy='best')
+        with pytest.raises(ValueError, match='top_k must be'):
+            ProgramExtractor(policy='top-k', top_k=0)
+
+    def test_extract_sandboxed_r(self):
+        """Reject sandboxed verification of R translations."""
+        result = load_checkpoint('re2_test')
+        grammar = GrammarParser(result.grammars[-1], 'r').parsed_grammar
+        translator = Translator(grammar)
+        match = 'only supports Python'
+        with VerifierPool(1, 1.0) as verifier, \
+                pytest.raises(ValueError, match=match):
+            ProgramExtractor().iter_extract(result, translator,
+                                            verifier=verifier)
+
+    def test_extract_invalid_jobs(self):
+        """Extract with a non-positive number of jobs."""
+        result = load_checkpoint('re2_test')
+        with pytest.raises(ValueError, match='jobs must be a positive'):
+            ProgramExtractor().extract(result, jobs=0)
+
+    def test_iter_extract_invalid_jobs(self):
+        """Reject a non-positive number of jobs before iterating."""
+        result = load_checkpoint('re2_test')
+        with pytest.raises(ValueError, match='jobs must be a positive'):
+            ProgramExtractor().iter_extract(result, jobs=0)
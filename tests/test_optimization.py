@@ -0,0 +1,137 @@
+"""Unit tests for module lapspython.optimization."""
+
+import pytest
+
+from lapspython.extraction import GrammarParser
+from lapspython.optimization import Optimizer
+from lapspython.translation import Translator
+from lapspython.types import ParsedProgram
+from lapspython.utils import load_checkpoint
+
+
+def optimize(source: str) -> tuple:
+    """Optimize source of a function with argument arg1."""
+    optimizer = Optimizer()
+    translation = ParsedProgram('f', source, ['arg1'], set(), set())
+    optimized = optimizer.optimize(translation)
+    return optimized, optimizer.counts
+
+
+class TestOptimizer:
+    """Run tests for lapspython.optimization.Optimizer."""
+
+    def test_fold_and_propagate(self):
+        """Fold constants and propagate them into lambda functions."""
+        optimized, counts = optimize(
+            "rconcat_1 = 'q' + 'j'\n"
+            "rchar_1 = 'a'\n"
+            'rnot_1 = f"[^{rchar_1}]"\n'
+            'map_1 = list(map(lambda lx: rconcat_1 + rnot_1, arg1))\n'
+            "return ''.join(map_1)"
+        )
+        assert optimized.source == \
+            "return ''.join(list(map(lambda lx: 'qj[^a]', arg1)))"
+        assert (counts['folded'], counts['propagated']) == (3, 3)
+        assert optimized.compile_function()('ab') == 'qj[^a]qj[^a]'
+
+    def test_inline(self):
+        """Inline variables used once into the next statements."""
+        optimized, counts = optimize(
+            'rsplit_1 = arg1[1:]\n'
+            "rappend_1 = rsplit_1 + ['w']\n"
+            "return ''.join(rappend_1)"
+        )
+        assert optimized.source == "return ''.join(arg1[1:] + ['w'])"
+        assert counts['inlined'] == 2
+
+    def test_keep_guarded(self):
+        """Neither inline into lambda functions nor conditional branches."""
+        optimized, counts = optimize(
+            'car_1 = arg1[0]\n'
+            'cdr_1 = arg1[1:]\n'
+            'map_1 = list(map(lambda lx: car_1, arg1))\n'
+            'return cdr_1 if map_1 else arg1'
+        )
+        assert optimized.source.startswith('car_1 = arg1[0]\ncdr_1 = ')
+        assert counts['inlined'] == 1
+
+    def test_keep_comprehension(self):
+        """Only inline into the first iterable of a comprehension."""
+        optimized, counts = optimize(
+            'car_1 = arg1[0]\n'
+            'cdr_1 = arg1[1:]\n'
+            'return [car_1 for y in cdr_1]'
+        )
+        assert optimized.source.startswith('car_1 = arg1[0]\nreturn [')
+        assert 'for y in arg1[1:]' in optimized.source
+        assert counts['inlined'] == 1
+
+    def test_reassign(self):
+        """Stop propagating a variable once it is assigned again."""
+        optimized, _ = optimize(
+            "x = 'a'\n"
+            'x = x + arg1\n'
+            'return x'
+        )
+        assert optimized.compile_function()('abc') == 'aabc'
+
+    def test_keep_list(self):
+        """Keep a list assigned to a variable instead of copying it."""
+        optimized, counts = optimize(
+            'r = []\n'
+            'r.extend(arg1)\n'
+            'return len(r)'
+        )
+        assert optimized.compile_function()('abc') == 3
+        assert counts['propagated'] == 0
+
+    def test_keep_reassigned_operand(self):
+        """Do not inline past an assignment of a variable it loads."""
+        optimized, counts = optimize(
+            "y = arg1 + 'b'\n"
+            "arg1 = 'c'\n"
+            'return y + arg1'
+        )
+        assert optimized.compile_function()('a') == 'abc'
+        assert counts['inlined'] == 0
+
+    def test_eliminate(self):
+        """Remove unused assignments unless they might fail."""
+        optimized, counts = optimize(
+            "rconcat_1 = arg1 + 'v'\n"
+            'car_1 = arg1[0]\n'
+            'return arg1'
+        )
+        assert optimized.source == 'car_1 = arg1[0]\nreturn arg1'
+        assert counts['eliminated'] == 1
+        with pytest.raises(IndexError, match='string index out of range'):
+            optimized.compile_function()('')
+
+    def test_keep_failing_fold(self):
+        """Keep operations on constants that raise an exception."""
+        optimized, counts = optimize("return 'a'[5]")
+        assert optimized.source == "return 'a'[5]"
+        assert counts['folded'] == 0
+
+    def test_translator(self):
+        """Preserve verdicts of all translations of a checkpoint."""
+        result = load_checkpoint('re2_test')
+        parsed_grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+        plain = Translator(parsed_grammar, memoize=False)
+        optimizing = Translator(parsed_grammar, optimize=True)
+        for frontier in result.allFrontiers.values():
+            examples = frontier.task.examples
+            for entry in frontier.entries:
+                translation = plain.translate(entry.program, 'f')
+                optimized = optimizing.translate(entry.program, 'f')
+                assert optimized.verify(examples) == \
+                    translation.verify(examples)
+                assert len(optimized.source) <= len(translation.source)
+        assert optimizing.optimizer.counts['inlined'] > 0
+
+    def test_translator_r(self):
+        """Reject optimization of R translations."""
+        grammar = load_checkpoint('re2_test').grammars[-1]
+        parsed_grammar = GrammarParser(grammar, 'r').parsed_grammar
+        with pytest.raises(ValueError, match='Optimization only supports'):
+            Translator(parsed_grammar, optimize=True)
@@ -1,18 +1,52 @@
 """Unit tests for module lapspython.translation."""
 
+import os
+
 import pytest
 
+from lapspython import pipeline
 from lapspython.pipeline import Pipeline
 from lapspython.types import CompactResult
+from lapspython.utils import json_lookup, load_checkpoint
 
 
 class TestPipeline:
     """Run tests for lapspython.translation.Translator."""
 
+    @pytest.fixture()
+    def _checkpoints(self, tmp_path, monkeypatch):
+        """Link the test checkpoint into a temporary checkpoints folder."""
+        pickle_path = os.path.abspath('checkpoints/re2_test.pickle')
+        monkeypatch.chdir(tmp_path)
+        os.makedirs('checkpoints')
+        os.symlink(pickle_path, 'checkpoints/re2_test.pickle')
+
+    @pytest.mark.usefixtures('_checkpoints')
     def test_from_checkpoint_python(self):
         """Load checkpoint in Python mode."""
         result = Pipeline.from_checkpoint('re2_test')
         assert isinstance(result, CompactResult)
+        assert sorted(os.listdir('checkpoints')) == [
+            're2_test.pickle', 're2_test_python.index.json',
+            're2_test_python.json', 're2_test_python_grammar.pickle',
+            'verification_cache.json', 'verification_cache.json.lock'
+        ]
+
+    @pytest.mark.usefixtures('_checkpoints')
+    def test_from_checkpoint_no_save(self):
+        """Neither write results, verdicts nor grammar without save."""
+        result = Pipeline.from_checkpoint('re2_test', verbose=False,
+                                          save=False)
+        assert len(result.hit_frontiers) == 18
+        assert os.listdir('checkpoints') == ['re2_test.pickle']
+
+    def test_extract_translate_defaults(self, tmp_path, monkeypatch):
+        """Write nothing without a checkpoints folder by default."""
+        result = load_checkpoint('re2_test')
+        monkeypatch.chdir(tmp_path)
+        compact_result = Pipeline.extract_translate(result, verbose=False)
+        assert len(compact_result.hit_frontiers) == 18
+        assert not os.path.exists('checkpoints')
 
     def test_from_checkpoint_r(self):
         """Load checkpoint in R mode."""
@@ -24,3 +58,42 @@ class TestPipeline:
         error_msg = 'mode must be "Python" or "R".'
         with pytest.raises(ValueError, match=error_msg):
             Pipeline.from_checkpoint('re2_test', mode='cpp')
+
+    @pytest.fixture()
+    def _iterations(self, tmp_path, monkeypatch):
+        """Link the test checkpoint twice into a temporary folder."""
+        pickle_path = os.path.abspath('checkpoints/re2_test.pickle')
+        monkeypatch.chdir(tmp_path)
+        os.makedirs('checkpoints/iter')
+        for name in ('re2_1', 're2_2'):
+            os.symlink(pickle_path, f'checkpoints/iter/{name}.pickle')
+
+    @pytest.mark.usefixtures('_iterations')
+    @pytest.mark.parametrize('jobs', [1, 2])
+    def test_from_directory(self, jobs):
+        """Translate all checkpoints of a folder into one results store."""
+        store = Pipeline.from_directory('iter', jobs=jobs)
+        assert store.path == 'checkpoints/iter/results.json'
+        assert os.path.exists(store.path)
+        assert len(store) == 36
+        task = 're2_train_0_if_the_word_ends_with_any_letter_add_w_after_that'
+        record, = store.lookup(task, 'r')
+        assert record['checkpoints'] == ['iter/re2_1', 'iter/re2_2']
+        best = json_lookup('iter/re2_2_r', task)
+        assert best['best_program'] == record['best_program']
+
+    @pytest.mark.usefixtures('_iterations')
+    def test_from_directory_primitives(self, monkeypatch):
+        """Parse primitives before forking unless snapshots are current."""
+        monkeypatch.setattr(pipeline, '_PRIMITIVES', {})
+        Pipeline.from_directory('iter', ('python',), jobs=2)
+        assert len(pipeline._PRIMITIVES) == 1
+        monkeypatch.setattr(pipeline, '_PRIMITIVES', {})
+        Pipeline.from_directory('iter', ('python',), jobs=2)
+        assert pipeline._PRIMITIVES == {}
+
+    def test_from_directory_invalid_mode(self):
+        """Translate folder in invalid mode."""
+        error_msg = 'mode must be "Python" or "R".'
+        with pytest.raises(ValueError, match=error_msg):
+            Pipeline.from_directory(modes=('python', 'cpp'))
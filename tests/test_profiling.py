@@ -0,0 +1,122 @@
+"""Unit tests for module lapspython.profiling."""
+
+import json
+
+import numpy as np
+
+from lapspython.extraction import GrammarParser
+from lapspython.pipeline import Pipeline
+from lapspython.profiling import MethodTimers, Profiler
+from lapspython.stats import TABLE_DTYPE, Statistics
+from lapspython.translation import Translator
+from lapspython.utils import load_checkpoint
+
+
+class TestProfiler:
+    """Run tests for lapspython.profiling.Profiler."""
+
+    def test_stage(self):
+        """Record nested stages with their item counts."""
+        profiler = Profiler()
+        with profiler.stage('outer', 2), profiler.stage('inner') as stage:
+            stage.items = 3
+
+        inner, outer = profiler.stages
+        assert (outer.name, outer.items) == ('outer', 2)
+        assert (inner.name, inner.items) == ('inner', 3)
+        assert outer.wall >= inner.wall >= 0
+        assert outer.peak_rss > 0
+
+    def test_disabled(self):
+        """Neither record stages nor patch methods when disabled."""
+        profiler = Profiler(enabled=False)
+        original = Translator.__dict__['translate']
+        with profiler.stage('stage'), \
+                profiler.instrumented(Translator, 'translate', 'translate'):
+            assert Translator.__dict__['translate'] is original
+        assert profiler.stages == []
+
+    def test_instrumented(self):
+        """Record calls of a class method and restore it afterwards."""
+        profiler = Profiler()
+        original = Statistics.__dict__['attempted']
+        with profiler.instrumented(Statistics, 'attempted', 'attempted',
+                                   lambda args, returned: 5):
+            assert isinstance(Statistics.__dict__['attempted'], classmethod)
+            Statistics.attempted(np.zeros(0, TABLE_DTYPE))
+            Statistics.attempted(np.zeros(0, TABLE_DTYPE))
+        assert Statistics.__dict__['attempted'] is original
+
+        row, = profiler.summary()
+        assert (row['name'], row['calls'], row['items']) == ('attempted', 2,
+                                                             10)
+
+    def test_instrumented_overlapping(self):
+        """Restore method after overlapping patches exit in any order."""
+        first, second = Profiler(), Profiler()
+        original = Statistics.__dict__['attempted']
+        table = np.zeros(0, TABLE_DTYPE)
+        outer = first.instrumented(Statistics, 'attempted', 'attempted')
+        inner = second.instrumented(Statistics, 'attempted', 'attempted')
+        outer.__enter__()
+        inner.__enter__()
+        Statistics.attempted(table)
+        outer.__exit__(None, None, None)
+        Statistics.attempted(table)
+        assert Statistics.__dict__['attempted'] is not original
+        inner.__exit__(None, None, None)
+        assert Statistics.__dict__['attempted'] is original
+
+        assert [row['calls'] for row in first.summary()] == [1]
+        assert [row['calls'] for row in second.summary()] == [2]
+
+    def test_dump_trace(self, tmp_path):
+        """Export stages as Chrome trace events."""
+        profiler = Profiler()
+        with profiler.stage('stage', 1):
+            pass
+
+        path = tmp_path / 'trace.json'
+        profiler.dump_trace(str(path))
+        with open(path, 'r') as json_file:
+            event, = json.load(json_file)['traceEvents']
+        assert (event['name'], event['ph']) == ('stage', 'X')
+        assert event['args']['items'] == 1
+
+    def test_pipeline(self):
+        """Profile stages of the pipeline."""
+        profiler = Profiler()
+        Pipeline.from_checkpoint('re2_test', verbose=False, save=False,
+                                 use_cache=False, profiler=profiler)
+        rows = {row['name']: row for row in profiler.summary()}
+        assert list(rows) == ['checkpoint load', 'grammar parse',
+                              'invention translation', 'program translation',
+                              'verification']
+        assert rows['program translation']['items'] == 75
+        assert rows['verification']['items'] == 75
+
+
+class TestMethodTimers:
+    """Run tests for lapspython.profiling.MethodTimers."""
+
+    def test_enable_disable(self):
+        """Count calls while enabled and restore methods when disabled."""
+        result = load_checkpoint('re2_test')
+        parsed_grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+        translator = Translator(parsed_grammar, memoize=False)
+        frontier = next(f for f in result.allFrontiers.values()
+                        if not f.empty)
+        program = frontier.entries[0].program
+        original = Translator.__dict__['translate']
+
+        timers = MethodTimers(Translator, Translator.TIMED_METHODS)
+        with timers:
+            assert Translator.__dict__['translate'] is not original
+            translator.translate(program, 'first')
+        translator.translate(program, 'second')
+
+        assert Translator.__dict__['translate'] is original
+        assert not timers.enabled
+        assert timers.calls['translate'] == 1
+        assert timers.calls['_resolve'] > 0
+        assert timers.seconds['translate'] > 0
@@ -0,0 +1,173 @@
+"""Unit tests for module lapspython.service."""
+
+import asyncio
+import json
+import os
+import socket
+
+import pytest
+
+from lapspython.service import TranslationService
+from lapspython.verification import INVALID, VALID
+
+PROGRAM = '(lambda (_rflatten (_rappend _w (_rsplit _a $0))))'
+EXAMPLES = [[['demarcate'], 'demarcatew'], [['roisterer'], 'roistererw']]
+
+
+@pytest.fixture(scope='module', autouse=True)
+def _checkpoints(tmp_path_factory):
+    """Store grammar snapshots in a temporary checkpoints folder."""
+    pickle_path = os.path.abspath('checkpoints/re2_test.pickle')
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('service'))
+    os.makedirs('checkpoints')
+    os.symlink(pickle_path, 'checkpoints/re2_test.pickle')
+    yield
+    os.chdir(cwd)
+
+
+@pytest.fixture(scope='module')
+def service(_checkpoints):
+    """Serve re2_test in Python and R."""
+    service = TranslationService.from_checkpoint('re2_test', ('python', 'r'))
+    yield service
+    service.close()
+
+
+def free_port() -> int:
+    """Return a currently unused local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class TestTranslationService:
+    """Run tests for lapspython.service.TranslationService."""
+
+    def test_translate_batch(self, service):
+        """Translate, verify and reject requests of one batch."""
+        responses = service.translate_batch([
+            {'program': PROGRAM, 'name': 'task', 'examples': EXAMPLES},
+            {'program': PROGRAM, 'examples': [[['a'], 'b']]},
+            {'program': PROGRAM, 'mode': 'R', 'examples': EXAMPLES},
+            {'program': '(lambda (_invalid $0))'},
+            {'program': PROGRAM, 'mode': 'cpp'},
+            ['not', 'an', 'object']
+        ])
+        assert responses[0]['name'] == 'task'
+        assert 'def task(arg1):' in responses[0]['source']
+        assert [r.get('verdict') for r in responses[:3]] == [VALID, INVALID,
+                                                             None]
+        assert 'f <- function(arg1)' in responses[2]['source']
+        assert responses[3]['error'].startswith('ParseFailure')
+        assert responses[4]['error'] == 'ValueError: Mode cpp is not served.'
+        assert 'must be an object' in responses[5]['error']
+
+    def test_refuse_examples(self, service):
+        """Refuse to verify examples without a sandboxed verifier."""
+        unsandboxed = TranslationService(service.translators,
+                                         grammar=service.grammar)
+        try:
+            refused, translated = unsandboxed.translate_batch([
+                {'program': PROGRAM, 'examples': EXAMPLES},
+                {'program': PROGRAM}
+            ])
+        finally:
+            unsandboxed.close()
+        assert 'without a timeout' in refused['error']
+        assert translated['verdict'] is None
+
+    def test_invalid_batch_size(self, service):
+        """Construct service with a non-positive batch size."""
+        with pytest.raises(ValueError, match='batch_size must be'):
+            TranslationService(service.translators, batch_size=0)
+
+    def test_unix_socket(self, service, tmp_path):
+        """Batch concurrent requests sent over a Unix socket."""
+        path = str(tmp_path / 'service.sock')
+
+        async def request(payload):
+            reader, writer = await asyncio.open_unix_connection(path)
+            writer.write(json.dumps(payload).encode('utf-8') + b'\n')
+            try:
+                return json.loads(await reader.readline())
+            finally:
+                writer.close()
+
+        async def run():
+            servers = await service.start(socket_path=path)
+            batches = service.batches
+            responses = await asyncio.gather(*(
+                request({'program': PROGRAM, 'name': f'f{i}'})
+                for i in range(8)
+            ))
+            listed = await request([{'program': PROGRAM}, {}])
+            for server in servers:
+                server.close()
+            return responses, listed, service.batches - batches
+
+        responses, listed, batches = asyncio.run(run())
+        assert [r['name'] for r in responses] == [f'f{i}' for i in range(8)]
+        assert batches < 9
+        assert listed[0]['name'] == 'f'
+        assert 'error' in listed[1]
+
+    def test_http(self, service):
+        """Answer HTTP requests on a keep-alive connection."""
+        port = free_port()
+
+        async def request(reader, writer, line, body=b''):
+            writer.write(f'{line}\r\nContent-Length: {len(body)}\r\n\r\n'
+                         .encode('latin-1') + body)
+            status = await reader.readline()
+            length = 0
+            while True:
+                header = await reader.readline()
+                if header.strip() == b'':
+                    break
+                if header.lower().startswith(b'content-length:'):
+                    length = int(header.split(b':')[1])
+            return status.split()[1], json.loads(
+                await reader.readexactly(length))
+
+        async def run():
+            servers = await service.start(port=port)
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            body = json.dumps({'program': PROGRAM}).encode('utf-8')
+            try:
+                return [
+                    await request(reader, writer, 'POST /translate HTTP/1.1',
+                                  body),
+                    await request(reader, writer, 'GET /health HTTP/1.1'),
+                    await request(reader, writer, 'GET /missing HTTP/1.1'),
+                    await request(reader, writer, 'POST /translate HTTP/1.1',
+                                  b'{')
+                ]
+            finally:
+                writer.close()
+                for server in servers:
+                    server.close()
+
+        translated, health, missing, invalid = asyncio.run(run())
+        assert translated[0] == b'200'
+        assert 'def f(arg1):' in translated[1]['source']
+        assert health[1]['modes'] == ['python', 'r']
+        assert missing[0] == b'404'
+        assert invalid[0] == b'400'
+
+    def test_start_without_address(self, service):
+        """Start service without socket path and port."""
+        with pytest.raises(ValueError, match='Either socket_path or port'):
+            asyncio.run(service.start())
+
+    def test_sandboxed(self):
+        """Verify a batch in the sandboxed verifier pool."""
+        service = TranslationService.from_checkpoint('re2_test', timeout=1.0,
+                                                     workers=1)
+        try:
+            response, = service.translate_batch([
+                {'program': PROGRAM, 'examples': EXAMPLES}
+            ])
+        finally:
+            service.close()
+        assert response['verdict'] == VALID
@@ -1,7 +1,10 @@
 """Unit tests for module lapspython.stats."""
 
+from lapspython.extraction import ProgramExtractor
 from lapspython.pipeline import Pipeline
 from lapspython.stats import Statistics
+from lapspython.utils import load_checkpoint
+from lapspython.verification import INVALID
 
 
 class TestStatistics:
@@ -23,3 +26,80 @@ class TestStatistics:
         assert stats['median\t(%)'] == stats['mean\t(%)'] == 100.0
         assert stats['min\t(%)'] == stats['max\t(%)'] == 100.0
         assert stats['std\t(%)'] == 0.0
+
+    def test_untranslated(self):
+        """Count frontiers without translated programs as unsolved tasks."""
+        result = ProgramExtractor(load_checkpoint('re2_test')).compact_result
+
+        stats = Statistics().summarize(result)
+        assert stats['tasks (total)'] == 18
+        assert stats['tasks (solved)'] == 0
+        assert stats['max\t(%)'] == 0.0
+
+    def test_percentage_skipped(self):
+        """Count a frontier whose programs were all skipped as 0 %."""
+        result = ProgramExtractor(load_checkpoint('re2_test')).compact_result
+        frontier = next(iter(result.hit_frontiers.values()))
+        frontier.skipped = list(frontier.program_strings)
+        assert Statistics().percentage_frontier(frontier) == 0.0
+
+    def test_counters(self):
+        """Report translation cache counters of result."""
+        result = Pipeline.from_checkpoint(
+            're2_test', verbose=False, save=False
+        )
+
+        stats = Statistics().summarize(result)
+        hits = stats['translation cache hits']
+        misses = stats['translation cache misses']
+        assert hits + misses == stats['programs']
+
+    def test_skipped(self):
+        """Report skipped translations and exclude them from percentages."""
+        result = Pipeline.from_checkpoint(
+            're2_test', verbose=False, save=False, use_cache=False,
+            policy='first-valid'
+        )
+
+        stats = Statistics().summarize(result)
+        assert stats['programs'] == 75
+        assert stats['translations'] == 18
+        assert stats['translations (skipped)'] == 57
+        assert stats['min\t(%)'] == 100.0
+
+    def test_table(self):
+        """Count programs and verdicts per task in one table."""
+        result = Pipeline.from_checkpoint(
+            're2_test', verbose=False, save=False, use_cache=False,
+            policy='top-k', top_k=2
+        )
+
+        table = Statistics().get_table(result)
+        assert len(table) == 18
+        assert set(table['task']) == set(result.hit_frontiers)
+        assert table['programs'].sum() == 75
+        assert table['valid'].sum() == 34
+        assert table['failed'].sum() == table['timed_out'].sum() == 0
+        assert Statistics().count_skipped(result) == 41
+
+    def test_failure_rates(self):
+        """Attribute failed translations to primitives and inventions."""
+        result = Pipeline.from_checkpoint(
+            're2_test', verbose=False, save=False
+        )
+        rates = Statistics().failure_rates(result)
+        assert rates['failures'].sum() == 0
+        assert '_rsplit' in rates['component']
+
+        frontier = next(f for f in result.hit_frontiers.values()
+                        if '#(_rsplit _rdot)' in f.program_strings[0])
+        frontier.verdicts = (INVALID,) + frontier.verdicts[1:]
+        statistics = Statistics()
+        rates = statistics.failure_rates(result, invented=True)
+        assert rates[0]['component'] == '#(_rsplit _rdot)'
+        assert rates[0]['failures'] == 1
+        assert rates[0]['rate'] == 1 / rates[0]['attempts']
+        rates = statistics.failure_rates(result)
+        assert rates[0]['failures'] == 1
+        assert '_rsplit' not in Statistics.components(
+            frontier.program_strings[0], invented=False)
@@ -1,8 +1,11 @@
 """Unit tests for module lapspython.translation."""
 
-from lapspython.extraction import GrammarParser
+import pytest
+
+from lapspython.extraction import GrammarParser, ProgramExtractor
+from lapspython.stats import Statistics
 from lapspython.translation import Translator
-from lapspython.utils import load_checkpoint
+from lapspython.utils import load_checkpoint, parse_program
 
 
 class TestTranslator:
@@ -21,3 +24,111 @@ class TestTranslator:
         parsed_grammar = GrammarParser(grammar, 'r').parsed_grammar
         translator = Translator(parsed_grammar)
         assert translator.mode == 'r'
+
+    def test_translate_memoized(self):
+        """Reuse translation of identical program under a new name."""
+        result = load_checkpoint('re2_test')
+        parsed_grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+        translator = Translator(parsed_grammar)
+        frontier = next(f for f in result.allFrontiers.values()
+                        if not f.empty)
+        program = frontier.entries[0].program
+
+        first = translator.translate(program, 'first')
+        second = translator.translate(program, 'second')
+        assert (translator.cache_hits, translator.cache_misses) == (1, 1)
+        assert second.name == second.handle == 'second'
+        assert second.source == first.source
+        assert str(second) == str(first).replace('def first', 'def second')
+
+    def test_translate_not_memoized(self):
+        """Translate identical program twice without memoization."""
+        result = load_checkpoint('re2_test')
+        parsed_grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+        translator = Translator(parsed_grammar, memoize=False)
+        frontier = next(f for f in result.allFrontiers.values()
+                        if not f.empty)
+        program = frontier.entries[0].program
+
+        first = translator.translate(program, 'first')
+        second = translator.translate(program, 'first')
+        assert translator.translation_cache == {}
+        assert first is not second
+        assert str(first) == str(second)
+
+    def test_translate_ast_backend(self):
+        """Verify translations generated from abstract syntax trees."""
+        result = load_checkpoint('re2_test')
+        parsed_grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+        translator = Translator(parsed_grammar, backend='ast')
+        compact_result = ProgramExtractor().extract(result, translator)
+        assert Statistics(compact_result).count_translations(
+            compact_result) == 75
+        frontier = next(iter(compact_result.hit_frontiers.values()))
+        assert frontier.translations[0].module is not None
+
+    def test_init_invalid_backend(self):
+        """Reject unknown backends and the ast backend for R."""
+        grammar = load_checkpoint('re2_test').grammars[-1]
+        parsed_grammar = GrammarParser(grammar, 'r').parsed_grammar
+        with pytest.raises(ValueError, match='only supports'):
+            Translator(parsed_grammar, backend='ast')
+        with pytest.raises(ValueError, match='backend must be'):
+            Translator(parsed_grammar, backend='bytecode')
+
+    def test_translate_shared(self):
+        """Translate and execute identical subexpressions once."""
+        grammar = load_checkpoint('re2_test').grammars[-1]
+        parsed_grammar = GrammarParser(grammar).parsed_grammar
+        program = parse_program(
+            '(lambda (if (_rmatch _rvowel (_rtail (_rsplit _rdot $0))) '
+            '(_rflatten (_rsplit _rdot $0)) '
+            '(_rflatten (cons (_rtail (_rsplit _rdot $0)) '
+            '(_rsplit _rvowel $0)))))',
+            grammar
+        )
+        plain = Translator(parsed_grammar, share=False)
+        translation = plain.translate(program, 'f')
+        assert translation.source.count("__regex_split('.'") == 3
+        for backend in ('string', 'ast'):
+            translator = Translator(parsed_grammar, backend=backend)
+            shared = translator.translate(program, 'f')
+            assert shared.source.count("__regex_split('.'") == 1
+            assert shared.source.count('[-1]') == 1
+            assert shared.compile_function()('abc') == 'cabc'
+            assert shared.compile_function()('bca') == 'bca'
+            report = translator.report()
+            assert report['shared subexpressions'] == 2
+            assert report['saved statements'] == 3
+
+    def test_translate_shared_lambda(self):
+        """Share no subexpressions depending on arguments of lambdas."""
+        grammar = load_checkpoint('re2_test').grammars[-1]
+        parsed_grammar = GrammarParser(grammar).parsed_grammar
+        program = parse_program(
+            '(lambda (_rflatten (map (lambda (_rconcat $0 (_rconcat _b _a))) '
+            '(map (lambda (_rconcat $0 (_rconcat _b _a))) '
+            '(_rsplit _rdot $0)))))',
+            grammar
+        )
+        translator = Translator(parsed_grammar)
+        translation = translator.translate(program, 'f')
+        assert translation.source.count("'b' + 'a'") == 1
+        assert translation.source.count('lambda lx: lx + rconcat_1') == 2
+        assert translation.compile_function()('c.d') == 'cbaba.babadbaba'
+        assert translator.report()['shared subexpressions'] == 1
+
+    def test_translate_shared_impure(self):
+        """Translate subexpressions with side effects every time."""
+        grammar = load_checkpoint('re2_test').grammars[-1]
+        parsed_grammar = GrammarParser(grammar).parsed_grammar
+        program = parse_program(
+            '(lambda (_rflatten (cons (_rtail (_rsplit _rdot $0)) '
+            '(_rsplit _rdot $0))))',
+            grammar
+        )
+        translator = Translator(parsed_grammar)
+        translator.purity[parse_program('_rsplit', grammar)] = False
+        translation = translator.translate(program, 'f')
+        assert translation.source.count('__regex_split') == 2
+        assert translator.report()['shared subexpressions'] == 0
@@ -1,13 +1,20 @@
 """Unit tests for module lapspython.types."""
 
+import ast
+import copy
+import os
+import pickle
+
 import pytest
 
 from dreamcoder.type import TypeConstructor
 from lapspython.extraction import GrammarParser, ProgramExtractor
-from lapspython.translation import Translator
-from lapspython.types import (CompactFrontier, CompactResult, ParsedInvented,
-                              ParsedPrimitive, ParsedRInvented,
-                              ParsedRPrimitive, ParsedType)
+from lapspython.translation import Translator, unparse
+from lapspython.types import (CompactFrontier, CompactResult, ModuleIndex,
+                              ParsedInvented, ParsedPrimitive, ParsedProgram,
+                              ParsedRInvented, ParsedRPrimitive, ParsedType,
+                              RSourceIndex, SubstitutionPlan,
+                              TemplateInstantiator, parse_template)
 from lapspython.utils import load_checkpoint
 
 
@@ -107,6 +114,34 @@ class TestParsedPrimitive:
         with pytest.raises(ValueError, match=expected_message):
             pp.resolve_variables(['arg0', 'arg1'], 'return_name')
 
+    def test_resolve_variables_precompiled(self):
+        """Resolve lambdas once and reuse the precomputed plans."""
+        grammar = load_checkpoint('re2_test').grammars[-1]
+        for _, _, primitive in grammar.productions:
+            if str(primitive) == '_rconcat':
+                break
+        pp = ParsedPrimitive(primitive).resolve_lambdas()
+        plan = pp.plans[1]
+        assert plan.segments == ['', ' = ', ' + ', '']
+        assert plan.slots == [2, 0, 1]
+        assert pp.resolve_variables(['s2', 's1'], 'x') == 'x = s2 + s1'
+
+    def test_is_pure(self):
+        """Detect mutation of arguments, but allow it for local variables."""
+        grammar = load_checkpoint('re2_test').grammars[-1]
+        parsed_grammar = GrammarParser(grammar).parsed_grammar
+        primitives = parsed_grammar.primitives
+        assert all(pp.is_pure() for pp in primitives.values())
+        pp = copy.copy(primitives['_rappend'])
+        pp.source = 'l.append(x)\nreturn l'
+        assert not pp.is_pure()
+        pp.source = 'l[-1] += x\nreturn l'
+        assert not pp.is_pure()
+        pp.source = 'print(l)\nreturn l + [x]'
+        assert not pp.is_pure()
+        pp.source = 'y = list(l)\ny.append(x)\nreturn y'
+        assert pp.is_pure()
+
     def test_as_dict(self):
         """Transform parsed primitive to dict."""
         grammar = load_checkpoint('re2_test').grammars[-1]
@@ -122,6 +157,103 @@ class TestParsedPrimitive:
         assert p_dict['dependencies'] == []
 
 
+class TestModuleIndex:
+    """Run tests for lapspython.types.ModuleIndex."""
+
+    def test_shared_index(self):
+        """Index each module once and reuse retrieved sources."""
+        grammar = load_checkpoint('re2_test').grammars[-1]
+        primitives = {str(p): p for _, _, p in grammar.productions}
+        indices: dict = {}
+        rconcat = ParsedPrimitive(primitives['_rconcat'], indices)
+        rmatch = ParsedPrimitive(primitives['_rmatch'], indices)
+        assert len(indices) == 1
+        index = next(iter(indices.values()))
+        assert 're' in index.modules
+        assert '__ismatch' in index.helpers
+        assert primitives['_rconcat'].value in index.sources
+        helper_source = index.source(index.helpers['__ismatch'])
+        assert rmatch.dependencies == {helper_source}
+        assert rconcat.dependencies == set()
+        assert ModuleIndex.lookup(primitives['_rmatch'].value,
+                                  indices) is index
+
+
+class TestRSourceIndex:
+    """Run tests for lapspython.types.RSourceIndex."""
+
+    def test_definition(self):
+        """Index functions, constants and libraries of an R file."""
+        path = 'dreamcoder/domains/re2/re2Primitives.R'
+        index = RSourceIndex.load(path)
+        assert index.libraries == {'glue', 'stringr'}
+        header, source = index.definition('rmatch')
+        assert header == 'rmatch <- function(s1, s2) {\n'
+        assert source == '    return(ismatch(s1, s2))\n'
+        _, source = index.definition('rmatch', with_header=True)
+        assert source == header + '    return(ismatch(s1, s2))\n}\n'
+        assert index.definition('rdot') == ('rdot <- "."\n', '"."\n')
+        with pytest.raises(ValueError, match='Cannot find'):
+            index.definition('s1')
+
+    def test_load_cached(self, tmp_path):
+        """Reuse index until the file is modified."""
+        path = str(tmp_path / 'primitives.R')
+        with open(path, 'w') as r_file:
+            r_file.write('one <- function(x) {\n    return(x)\n}\n')
+        index = RSourceIndex.load(path)
+        assert RSourceIndex.load(path) is index
+
+        with open(path, 'w') as r_file:
+            r_file.write('two <- function(x) {\n    return(x)\n}\n')
+        os.utime(path, ns=(index.mtime + 10 ** 9, index.mtime + 10 ** 9))
+        new_index = RSourceIndex.load(path)
+        assert new_index is not index
+        assert list(new_index.spans) == ['two']
+
+
+class TestSubstitutionPlan:
+    """Run tests for lapspython.types.SubstitutionPlan."""
+
+    def test_instantiate(self):
+        """Fill delimited arguments and f-string fields only."""
+        plan = SubstitutionPlan('return f"[^{s}]" + g(s, f)[s]', ['s', 'f'])
+        output = plan.instantiate(['x', 'h'])
+        assert output == 'return f"[^x]" + g(x, h)[x]'
+
+    def test_instantiate_return(self):
+        """Fill return marker with variable name."""
+        plan = SubstitutionPlan('\x00 = len(s)', ['s'])
+        assert plan.instantiate(['t'], 'n') == 'n = len(t)'
+
+
+class TestTemplateInstantiator:
+    """Run tests for lapspython.types.TemplateInstantiator."""
+
+    def instantiate(self, source: str, return_name: str = '') -> str:
+        """Substitute g for f in source and unparse the result."""
+        instantiator = TemplateInstantiator({'f': ast.Name('g', ast.Load())},
+                                            return_name)
+        statement, = parse_template(source)
+        return unparse(instantiator.visit(statement))
+
+    def test_nested_lambda(self):
+        """Substitute arguments inside nested lambda functions."""
+        output = self.instantiate('return lambda x0: lambda l: '
+                                  'reduce(lambda a, x: f(a)(x), l, x0)', 'r')
+        assert output == 'r = lambda x0: lambda l: reduce(lambda a, x: ' \
+            'g(a)(x), l, x0)'
+
+    def test_shadowed(self):
+        """Keep arguments shadowed by parameters or local variables."""
+        assert self.instantiate('return lambda f: f', 'r') == \
+            'r = lambda f: f'
+        output = self.instantiate('def h(x):\n    y = f(x)\n    return y')
+        assert output == 'def h(x):\n    y = g(x)\n    return y'
+        output = self.instantiate('def h(x):\n    f = x\n    return f')
+        assert output == 'def h(x):\n    f = x\n    return f'
+
+
 class TestParsedRPrimitive:
     """Run tests for lapspython.types.ParsedRType."""
 
@@ -188,6 +320,18 @@ class TestParsedRPrimitive:
         new_source = 'masked <- paste(mask0, mask1, sep = "")'
         assert pp.resolve_variables(new_args, 'masked') == new_source
 
+    def test_is_pure(self):
+        """Detect global assignments and random numbers."""
+        grammar = load_checkpoint('re2_test').grammars[-1]
+        parsed_grammar = GrammarParser(grammar, 'r').parsed_grammar
+        primitives = parsed_grammar.primitives
+        assert all(pp.is_pure() for pp in primitives.values())
+        pp = copy.copy(primitives['_rconcat'])
+        pp.source = 'counter <<- counter + 1\nreturn(paste(s1, s2))'
+        assert not pp.is_pure()
+        pp.source = 'return(paste(sample(s1), s2))'
+        assert not pp.is_pure()
+
 
 class TestParsedInvented:
     """Run tests for lapspython.types.ParsedInvented."""
@@ -245,6 +389,80 @@ class TestParsedRInvented:
         assert output == 'var <- f0(mask0)'
 
 
+class TestParsedProgram:
+    """Run tests for lapspython.types.ParsedProgram."""
+
+    def test_compile_function(self):
+        """Compile translation once and reuse the function."""
+        program = ParsedProgram('concat', 'return s1 + s2', ['s1', 's2'],
+                                set(), set())
+        function = program.compile_function()
+        assert function('a', 'b') == 'ab'
+        assert program.compile_function() is function
+
+    def test_compile_function_changed_source(self):
+        """Recompile function after the translation changed."""
+        program = ParsedProgram('concat', 'return s1 + s2', ['s1', 's2'],
+                                set(), set())
+        function = program.compile_function()
+        program.source = 'return s2 + s1'
+        assert program.compile_function() is not function
+        assert program.compile_function()('a', 'b') == 'ba'
+        renamed = program.rename('swap')
+        assert renamed.compile_function().__name__ == 'swap'
+
+    def test_verify_compiles_once(self, monkeypatch):
+        """Build the source once for all examples."""
+        program = ParsedProgram('concat', 'return s1 + s2', ['s1', 's2'],
+                                set(), set())
+        calls = []
+        source = ParsedProgram.__str__
+        monkeypatch.setattr(ParsedProgram, '__str__',
+                            lambda self: calls.append(self) or source(self))
+        assert program.verify([(('a', 'b'), 'ab'), (('c', 'd'), 'cd')])
+        assert program.verify([(('e', 'f'), 'ef')])
+        assert len(calls) == 1
+
+    def test_verify(self):
+        """Verify compiled translation against examples."""
+        program = ParsedProgram('concat', 'return s1 + s2', ['s1', 's2'],
+                                set(), set())
+        assert program.verify([(('a', 'b'), 'ab'), (('c', 'd'), 'cd')])
+        assert not program.verify([(('a', 'b'), 'ab'), (('c', 'd'), 'dc')])
+
+    def test_verify_exception(self):
+        """Verify translation that raises an exception."""
+        program = ParsedProgram('fail', 'return s1[1]', ['s1'], set(), set())
+        with pytest.raises(BaseException, match='def fail'):
+            program.verify([(('',), '')])
+
+    def test_pickle(self):
+        """Pickle translation without its compiled function."""
+        program = ParsedProgram('concat', 'return s1 + s2', ['s1', 's2'],
+                                set(), set())
+        program.compile_function()
+        unpickled = pickle.loads(pickle.dumps(program))
+        assert str(unpickled) == str(program)
+        assert unpickled.compile_function()('a', 'b') == 'ab'
+
+    def test_pickle_shares_dependencies(self):
+        """Intern dependencies of unpickled translations."""
+        dependency = ''.join(['def helper():\n', '    pass\n'])
+        program = ParsedProgram('f', 'return 1', [], set(), {dependency})
+        first = pickle.loads(pickle.dumps(program))
+        second = pickle.loads(pickle.dumps(program))
+        assert first.dependencies.pop() is second.dependencies.pop()
+
+    def test_slots(self):
+        """Store members in slots and keep them when renamed."""
+        program = ParsedProgram('concat', 'return s1 + s2', ['s1', 's2'],
+                                set(), set())
+        assert not hasattr(program, '__dict__')
+        renamed = program.rename('f')
+        assert renamed.name == 'f'
+        assert renamed.source == program.source
+
+
 class TestParsedGrammar:
     """Run tests for lapspython.types.ParsedGrammar."""
 
@@ -280,16 +498,59 @@ class TestCompactFrontier:
             assert isinstance(frontier, CompactFrontier)
             assert isinstance(frontier.name, str)
             assert isinstance(frontier.annotation, str)
-            assert len(frontier.programs) > 0
+            assert len(frontier.program_strings) > 0
             total_attempts = len(frontier.translations) + len(frontier.failed)
-            assert total_attempts == len(frontier.programs)
+            assert total_attempts == len(frontier.program_strings)
         for frontier in compact_result.miss_frontiers.values():
             assert isinstance(frontier, CompactFrontier)
             assert isinstance(frontier.name, str)
             assert isinstance(frontier.annotation, str)
-            assert len(frontier.programs) == 0
+            assert len(frontier.program_strings) == 0
             assert len(frontier.translations) == 0
 
+    def test_programs(self):
+        """Keep interned program strings and parse them on demand."""
+        result = load_checkpoint('re2_test')
+        frontier = next(f for f in result.allFrontiers.values()
+                        if not f.empty)
+        compact_frontier = CompactFrontier(frontier)
+        assert not hasattr(compact_frontier, '__dict__')
+        assert compact_frontier.examples is frontier.task.examples
+        programs = CompactFrontier.ranked_programs(frontier)
+        program_strings = [str(program) for program in programs]
+        assert program_strings == list(compact_frontier.program_strings)
+        assert {e.program for e in frontier.entries} == set(programs)
+        parsed = compact_frontier.iter_programs(result.grammars[-1])
+        assert [str(program) for program in parsed] == program_strings
+
+    def test_pickle(self):
+        """Restore frontiers with equal members."""
+        result = load_checkpoint('re2_test')
+        frontier = next(iter(result.allFrontiers.values()))
+        compact_frontier = CompactFrontier(frontier)
+        unpickled = pickle.loads(pickle.dumps(compact_frontier))
+        assert unpickled.name == compact_frontier.name
+        assert unpickled.examples == compact_frontier.examples
+        assert unpickled.program_strings == compact_frontier.program_strings
+
+    def test_setstate_legacy(self):
+        """Restore frontiers pickled before verdicts were stored."""
+        result = load_checkpoint('re2_test')
+        frontier = next(f for f in result.allFrontiers.values()
+                        if not f.empty)
+        compact_frontier = CompactFrontier(frontier)
+        state = {name: getattr(compact_frontier, name)
+                 for name in ('annotation', 'name', 'examples',
+                              'translations', 'failed')}
+        state['requested_types'] = frontier.task.request
+        state['programs'] = CompactFrontier.ranked_programs(frontier)
+        restored = CompactFrontier.__new__(CompactFrontier)
+        restored.__setstate__(state)
+        assert restored.program_strings == compact_frontier.program_strings
+        assert not hasattr(restored, 'programs')
+        assert restored.verdicts == ()
+        assert restored.skipped == restored.timed_out == []
+
 
 class TestCompactResult:
     """Run tests for lapspython.types.CompactResult."""
@@ -1,10 +1,25 @@
 """Unit tests for lapspython.utils."""
 
+import io
+import json
+import os
+import pickle
+import subprocess  # noqa: S404
+import sys
+
+import dill
 import pytest
 
 from dreamcoder.dreamcoder import ECResult
+from dreamcoder.utilities import ParseFailure
+from lapspython.extraction import GrammarParser, ProgramExtractor
+from lapspython.translation import Translator
 from lapspython.types import ParsedGrammar
-from lapspython.utils import json_read, load_checkpoint
+from lapspython.utils import (ECResultShim, LazyCheckpoint, Placeholder,
+                              ResultsStore, convert_checkpoint, json_dump,
+                              json_lookup, json_read, json_stream_dump,
+                              jsonl_write, list_checkpoints, load_checkpoint,
+                              parse_program)
 
 
 def test_load_checkpoint_valid():
@@ -13,6 +28,70 @@ def test_load_checkpoint_valid():
     assert isinstance(result, ECResult)
 
 
+def test_load_checkpoint_default():
+    """Load the full ECResult unless a light checkpoint is requested."""
+    script = (
+        'from lapspython.utils import load_checkpoint\n'
+        'result = load_checkpoint("re2_test")\n'
+        'print(type(result).__module__, type(result).__name__)\n'
+    )
+    output = subprocess.check_output(  # noqa: S603
+        [sys.executable, '-c', script], universal_newlines=True)
+    assert output.strip() == 'dreamcoder.dreamcoder ECResult'
+
+
+def test_parse_program():
+    """Parse programs with the primitives of their grammar only."""
+    result = load_checkpoint('re2_test')
+    grammar = result.grammars[-1]
+    for frontier in result.allFrontiers.values():
+        for entry in frontier.entries:
+            assert parse_program(str(entry.program), grammar) == entry.program
+    with pytest.raises(ParseFailure, match='_unknown'):
+        parse_program('(lambda (_unknown $0))', grammar)
+
+
+def test_load_checkpoint_light():
+    """Load checkpoint without importing torch and dreamcoder.dreamcoder."""
+    script = (
+        'import sys\n'
+        'from lapspython.pipeline import Pipeline\n'
+        'from lapspython.utils import ECResultShim, load_checkpoint\n'
+        'result = load_checkpoint("re2_test", light=True)\n'
+        'assert isinstance(result, ECResultShim)\n'
+        'assert len(result.allFrontiers) == 982\n'
+        'print(sorted(m for m in ("torch", "dreamcoder.dreamcoder")\n'
+        '             if m in sys.modules))\n'
+    )
+    output = subprocess.check_output(  # noqa: S603
+        [sys.executable, '-c', script], universal_newlines=True)
+    assert output.strip() == '[]'
+
+
+def test_pickle_light():
+    """Refuse to pickle shims and placeholders of light checkpoints."""
+    placeholder = type('Tensor', (Placeholder,), {'__module__': 'torch'})
+    with pytest.raises(pickle.PicklingError, match='torch.Tensor'):
+        pickle.dumps(placeholder(1, 2))
+    with pytest.raises(pickle.PicklingError, match='light=False'):
+        dill.dumps([ECResultShim()])
+
+
+def test_legacy_modules(tmp_path):
+    """Resolve old module paths before modules of the same name."""
+    (tmp_path / 'grammar.py').write_text('')
+    script = (
+        'import sys\n'
+        f'sys.path.insert(0, {str(tmp_path)!r})\n'
+        'import dreamcoder\n'
+        'import grammar\n'
+        'print(grammar.__name__)\n'
+    )
+    output = subprocess.check_output(  # noqa: S603
+        [sys.executable, '-c', script], universal_newlines=True)
+    assert output.strip() == 'dreamcoder.grammar'
+
+
 def test_load_checkpoint_invalid():
     """Try to load non-existent checkpoint."""
     msg = r".+ No such file or directory: 'checkpoints/invalid.pickle'"
@@ -20,8 +99,87 @@ def test_load_checkpoint_invalid():
         load_checkpoint('invalid')
 
 
-def test_json_read_valid():
+def test_convert_checkpoint(tmp_path, monkeypatch):
+    """Load only accessed sections of converted checkpoint."""
+    pickle_path = os.path.abspath('checkpoints/re2_test.pickle')
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('checkpoints')
+    os.symlink(pickle_path, 'checkpoints/re2_test.pickle')
+    assert not LazyCheckpoint.is_current('re2_test')
+
+    index = convert_checkpoint('re2_test')
+    assert {'grammars', 'allFrontiers', 'taskLanguage'} <= set(
+        index['sections'])
+    result = load_checkpoint('re2_test', lazy=True)
+    assert isinstance(result, LazyCheckpoint)
+    assert 'allFrontiers' not in vars(result)
+    assert len(result.allFrontiers) == 982
+    assert 'allFrontiers' in vars(result)
+    assert 'models' not in vars(result)
+    assert len(result.grammars) == 4
+
+    os.remove('checkpoints/re2_test.pickle')
+    assert LazyCheckpoint.is_current('re2_test')
+
+
+def test_lazy_checkpoint_invalid(tmp_path, monkeypatch):
+    """Access missing section and read file in wrong format."""
+    pickle_path = os.path.abspath('checkpoints/re2_test.pickle')
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('checkpoints')
+    os.symlink(pickle_path, 'checkpoints/re2_test.pickle')
+    convert_checkpoint('re2_test')
+    with pytest.raises(AttributeError, match='has no invalid'):
+        LazyCheckpoint('re2_test').invalid
+
+    os.symlink(pickle_path, 'checkpoints/invalid.sections')
+    with pytest.raises(ValueError, match='not a sectioned checkpoint'):
+        LazyCheckpoint('invalid')
+
+
+def test_list_checkpoints(tmp_path, monkeypatch):
+    """List checkpoints of a folder without grammar snapshots."""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('checkpoints/iter')
+    for filename in ('b.pickle', 'a.pickle', 'a_python_grammar.pickle',
+                     'a_r_grammar.pickle', 'a_python.json'):
+        with open(f'checkpoints/iter/{filename}', 'w'):
+            pass
+    assert list_checkpoints('iter') == ['iter/a', 'iter/b']
+
+
+def test_results_store(tmp_path, monkeypatch):
+    """Merge results of the same program found in several checkpoints."""
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('checkpoints')
+    first = {'name': 'task', 'annotation': '', 'best_program': 'a',
+             'best_valid_translation': None, 'best_invalid_translation': None}
+    second = dict(first, best_program='b')
+
+    store = ResultsStore()
+    assert store.add('it1', 'python', [first]) == 1
+    assert store.add('it2', 'python', [first, second]) == 1
+    assert store.add('it2', 'r', [first]) == 1
+    store.save()
+
+    store = ResultsStore()
+    assert len(store) == 3
+    records = store.lookup('task')
+    assert [r['checkpoints'] for r in records] == [['it1', 'it2'], ['it2']]
+    assert 'name' not in records[0]
+    assert store.lookup('task', 'r')[0]['best_program'] == 'a'
+    assert store.lookup('missing') == []
+
+
+def test_json_read_valid(tmp_path, monkeypatch):
     """Load valid JSON."""
+    result = load_checkpoint('re2_test')
+    grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+    extractor = ProgramExtractor(result, Translator(grammar))
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('checkpoints')
+    json_dump('re2_test_python', grammar, extractor.compact_result)
+
     json_dict = json_read('re2_test_python')
     assert list(json_dict.keys()) == ['grammar', 'result']
     assert isinstance(json_dict['grammar'], ParsedGrammar)
@@ -31,3 +189,76 @@ def test_json_read_valid():
 def test_json_read_invalid():
     """Load non-existent JSON."""
     assert json_read('invalid') == {}
+
+
+@pytest.mark.parametrize('chunk_size', [1, 64])
+def test_json_stream_dump(tmp_path, monkeypatch, chunk_size):
+    """Stream the same JSON as dumped at once and index its entries."""
+    result = load_checkpoint('re2_test')
+    grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+    frontiers = list(ProgramExtractor().iter_extract(result,
+                                                     Translator(grammar)))
+    hits = [f.get_best() for f in frontiers if len(f.program_strings) > 0]
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('checkpoints')
+
+    index = json_stream_dump('result', grammar, frontiers, chunk_size)
+    with open('checkpoints/result.json', 'r') as json_file:
+        streamed = json_file.read()
+    expected = {'grammar': grammar.as_dict(), 'result': hits}
+    assert streamed == json.dumps(expected, indent=4)
+    assert len(index['tasks']) == len(hits)
+
+    json_stream_dump('empty', ParsedGrammar({}, {}), [])
+    with open('checkpoints/empty.json', 'r') as json_file:
+        expected = {'grammar': {'primitives': {}, 'invented': {}},
+                    'result': []}
+        assert json_file.read() == json.dumps(expected, indent=4)
+
+
+def test_json_stream_dump_invalid_chunk_size():
+    """Stream with invalid chunk size."""
+    error_msg = 'chunk_size must be a positive integer.'
+    with pytest.raises(ValueError, match=error_msg):
+        json_stream_dump('invalid', ParsedGrammar({}, {}), [], 0)
+
+
+def test_json_lookup(tmp_path, monkeypatch):
+    """Read results of single tasks using the index."""
+    result = load_checkpoint('re2_test')
+    grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+    frontiers = list(ProgramExtractor().iter_extract(result,
+                                                     Translator(grammar)))
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('checkpoints')
+    assert json_lookup('result', 'task') == {}
+
+    json_stream_dump('result', grammar, frontiers)
+    for frontier in frontiers:
+        best = json_lookup('result', frontier.name)
+        if len(frontier.program_strings) > 0:
+            assert best == frontier.get_best()
+        else:
+            assert best == {}
+
+    with open('checkpoints/result.json', 'a') as json_file:
+        json_file.write('\n')
+    with pytest.raises(ValueError, match='is outdated'):
+        json_lookup('result', frontiers[-1].name)
+
+
+def test_jsonl_write():
+    """Write one JSON object per extracted frontier."""
+    result = load_checkpoint('re2_test')
+    grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+    frontiers = ProgramExtractor().iter_extract(result, Translator(grammar))
+    stream = io.StringIO()
+    jsonl_write(stream, frontiers)
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(records) == len(result.allFrontiers)
+    hits = [r for r in records if r['best_program'] is not None]
+    assert len(hits) == 18
+    assert all(r['best_valid_translation'] is not None for r in hits)
+    assert set(records[0]) == {'name', 'annotation', 'best_program',
+                               'best_valid_translation',
+                               'best_invalid_translation'}
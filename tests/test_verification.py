@@ -0,0 +1,189 @@
+"""Unit tests for module lapspython.verification."""
+
+import os
+import signal
+
+import pytest
+
+from lapspython.extraction import GrammarParser, ProgramExtractor
+from lapspython.translation import Translator
+from lapspython.types import ParsedProgram
+from lapspython.utils import load_checkpoint
+from lapspython.verification import (ERROR, INVALID, TIMEOUT, VALID,
+                                     VerificationCache, VerifierPool,
+                                     verify_examples)
+
+EXAMPLES = [(('a', 'b'), 'ab'), (('c', 'd'), 'cd')]
+
+
+def concat(source: str) -> ParsedProgram:
+    """Construct a translation with the arguments of _rconcat."""
+    return ParsedProgram('concat', source, ['s1', 's2'], set(), set())
+
+
+def test_verify_examples():
+    """Verify translations in this process."""
+    assert verify_examples(concat('return s1 + s2'), EXAMPLES, 1) == VALID
+    assert verify_examples(concat('return s2 + s1'), EXAMPLES, 1) == INVALID
+    assert verify_examples(concat('return s1[2]'), EXAMPLES, 1) == INVALID
+
+
+def test_verify_examples_timeout():
+    """Abort a loop in this process and restore the SIGPROF handler."""
+    previous = signal.getsignal(signal.SIGPROF)
+    loop = concat('while True:\n    pass')
+    assert verify_examples(loop, EXAMPLES, 0.2) == TIMEOUT
+    assert signal.getsignal(signal.SIGPROF) == previous
+
+
+class TestVerifierPool:
+    """Run tests for lapspython.verification.VerifierPool."""
+
+    def test_invalid_workers(self):
+        """Construct pool without workers."""
+        with pytest.raises(ValueError, match='workers must be a positive'):
+            VerifierPool(0)
+
+    def test_verify(self):
+        """Verify a batch of valid and invalid translations."""
+        batch = [
+            (concat('return s1 + s2'), EXAMPLES),
+            (concat('return s2 + s1'), EXAMPLES),
+            (concat('return s1[2]'), EXAMPLES)
+        ]
+        with VerifierPool(2) as pool:
+            assert pool.verify(batch) == [VALID, INVALID, INVALID]
+            assert pool.recycled == 0
+
+    def test_verify_timeout(self):
+        """Abort translation that loops forever."""
+        batch = [
+            (concat('while True:\n    pass'), EXAMPLES),
+            (concat('return s1 + s2'), EXAMPLES)
+        ]
+        with VerifierPool(1, timeout=0.2) as pool:
+            assert pool.verify(batch) == [TIMEOUT, VALID]
+
+    def test_verify_memory_limit(self):
+        """Abort translation that exceeds the memory limit."""
+        batch = [(concat('return [0] * 10 ** 10'), EXAMPLES)]
+        with VerifierPool(1, memory_limit=2 ** 28) as pool:
+            assert pool.verify(batch) == [ERROR]
+
+    def test_verify_crash(self):
+        """Replace a worker killed by the translation."""
+        batch = [
+            (concat('import os\nos._exit(1)'), EXAMPLES),
+            (concat('return s1 + s2'), EXAMPLES)
+        ]
+        with VerifierPool(1) as pool:
+            assert pool.verify(batch) == [ERROR, VALID]
+            assert pool.recycled == 1
+
+    def test_extract_re2(self):
+        """Verify extracted re2 translations in the sandbox."""
+        result = load_checkpoint('re2_test')
+        grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+        translator = Translator(grammar)
+        serial = ProgramExtractor(result, translator).compact_result
+        with VerifierPool(2) as pool:
+            extractor = ProgramExtractor(result, translator, verifier=pool)
+        sandboxed = extractor.compact_result
+
+        assert sandboxed.get_best() == serial.get_best()
+        for frontier in sandboxed.hit_frontiers.values():
+            assert frontier.timed_out == []
+
+
+class TestVerificationCache:
+    """Run tests for lapspython.verification.VerificationCache."""
+
+    filename = 'test_verification_cache'
+
+    @pytest.fixture(autouse=True)
+    def _checkpoints(self, tmp_path, monkeypatch):
+        """Write cache files into a temporary checkpoints folder."""
+        pickle_path = os.path.abspath('checkpoints/re2_test.pickle')
+        monkeypatch.chdir(tmp_path)
+        os.makedirs('checkpoints')
+        os.symlink(pickle_path, 'checkpoints/re2_test.pickle')
+
+    def test_invalid_max_entries(self):
+        """Construct cache without capacity."""
+        with pytest.raises(ValueError, match='max_entries must be'):
+            VerificationCache(self.filename, 0)
+
+    def test_record(self):
+        """Count hits and misses of recorded verdicts."""
+        cache = VerificationCache(self.filename)
+        program = concat('return s1 + s2')
+        assert cache.peek(program, EXAMPLES, 'python') is None
+        cache.record(program, EXAMPLES, 'python', VALID)
+        assert cache.peek(program, EXAMPLES, 'python') == VALID
+        assert cache.peek(program, EXAMPLES, 'r') is None
+        assert cache.peek(program, EXAMPLES[:1], 'python') is None
+        cache.record(program, EXAMPLES, 'python', VALID)
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    @pytest.mark.parametrize('verdict', [TIMEOUT, ERROR])
+    def test_record_sandbox_verdict(self, verdict):
+        """Do not store verdicts that depend on sandbox limits."""
+        cache = VerificationCache(self.filename)
+        cache.record(concat('return s1 + s2'), EXAMPLES, 'python', verdict)
+        assert len(cache) == 0
+
+    def test_evict(self):
+        """Evict least recently used verdict."""
+        cache = VerificationCache(self.filename, 2)
+        first = concat('return s1 + s2')
+        second = concat('return s2 + s1')
+        third = concat('return s1')
+        cache.record(first, EXAMPLES, 'python', VALID)
+        cache.record(second, EXAMPLES, 'python', INVALID)
+        cache.record(first, EXAMPLES, 'python', VALID)
+        cache.record(third, EXAMPLES, 'python', INVALID)
+        assert len(cache) == 2
+        assert cache.peek(first, EXAMPLES, 'python') == VALID
+        assert cache.peek(second, EXAMPLES, 'python') is None
+
+    def test_save(self):
+        """Load verdicts saved by previous cache."""
+        cache = VerificationCache(self.filename)
+        cache.record(concat('return s1 + s2'), EXAMPLES, 'python', VALID)
+        cache.save()
+        loaded = VerificationCache(self.filename)
+        assert loaded.entries == cache.entries
+
+    def test_save_directory(self):
+        """Create the folder of the cache on save."""
+        cache = VerificationCache(self.filename, directory='checkpoints/new')
+        cache.record(concat('return s1 + s2'), EXAMPLES, 'python', VALID)
+        cache.save()
+        assert os.path.exists(f'checkpoints/new/{self.filename}.json')
+
+    def test_save_merge(self):
+        """Keep verdicts saved concurrently by another cache."""
+        first = VerificationCache(self.filename)
+        second = VerificationCache(self.filename)
+        first.record(concat('return s1 + s2'), EXAMPLES, 'python', VALID)
+        second.record(concat('return s2 + s1'), EXAMPLES, 'python', INVALID)
+        first.save()
+        second.save()
+        loaded = VerificationCache(self.filename)
+        assert len(loaded) == 2
+        assert list(loaded.entries) == list(second.entries)
+
+    def test_extract_re2(self):
+        """Skip verification of cached translations."""
+        result = load_checkpoint('re2_test')
+        grammar = GrammarParser(result.grammars[-1]).parsed_grammar
+        translator = Translator(grammar)
+        cache = VerificationCache(self.filename)
+        first = ProgramExtractor(result, translator, cache=cache)
+        assert cache.hits == 0
+        assert cache.misses == len(cache) > 0
+
+        second = ProgramExtractor(result, translator, cache=cache)
+        assert cache.hits == cache.misses
+        assert second.compact_result.get_best() == \
+            first.compact_result.get_best()